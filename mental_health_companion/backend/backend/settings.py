@@ -1,9 +1,14 @@
 from pathlib import Path
 import os
+import sys
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Shared packages (llm_router) live one level up, next to the companion app
+sys.path.append(str(BASE_DIR.parent))
+
 # Load environment variables from .env file
 load_dotenv(BASE_DIR / '.env')
 
@@ -14,6 +19,7 @@ DEBUG = True
 ALLOWED_HOSTS = ['*']
 
 INSTALLED_APPS = [
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -23,6 +29,7 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework.authtoken',
     'corsheaders',
+    'channels',
     'authentication',
     'chat',
     'mood',
@@ -60,6 +67,41 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
+ASGI_APPLICATION = 'backend.asgi.application'
+
+# Channel layer for WebSocket chat streaming (in-memory is fine for local runs)
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Bounded LRU + TTL cache of Gemini chat replies
+    'ai_responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ai-responses',
+        'TIMEOUT': int(os.environ.get('AI_RESPONSE_CACHE_TTL', 600)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('AI_RESPONSE_CACHE_SIZE', 1000)),
+        },
+    },
+    # Per-user versioned cache of dashboard analytics (mood.analytics_cache);
+    # use a shared backend when running several worker processes
+    'analytics': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'analytics',
+        'TIMEOUT': int(os.environ.get('ANALYTICS_CACHE_TTL', 300)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('ANALYTICS_CACHE_SIZE', 5000)),
+        },
+    },
+}
+AI_RESPONSE_CACHE = 'ai_responses'
+ANALYTICS_CACHE = 'analytics'
 
 DATABASES = {
     'default': {
@@ -96,7 +138,128 @@ REST_FRAMEWORK = {
 
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['X-Has-Newer', 'X-Has-Older', 'Idempotent-Replayed', 'Retry-After']
 
 # API Keys
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
 NEWS_API_KEY = os.environ.get('NEWS_API_KEY', '')
+
+# Gemini provider (created once per process, see chat.providers)
+GEMINI_MODEL = os.environ.get('GEMINI_MODEL', 'models/gemini-2.0-flash')
+GEMINI_TRANSPORT = os.environ.get('GEMINI_TRANSPORT', '')  # grpc (default) or rest
+GEMINI_API_ENDPOINT = os.environ.get('GEMINI_API_ENDPOINT', '')
+GEMINI_TIMEOUT = float(os.environ.get('GEMINI_TIMEOUT', 20))
+GEMINI_GENERATION_CONFIG = {
+    'temperature': 0.8,
+    'max_output_tokens': 150,
+    'top_p': 0.9,
+}
+# Circuit breaker around Gemini calls; the per-call timeout adapts to the
+# observed p95 latency between min_timeout and GEMINI_TIMEOUT
+GEMINI_CIRCUIT_BREAKER = {
+    'window': 20,
+    'min_calls': 5,
+    'failure_rate': 0.5,
+    'slow_call_seconds': 10.0,
+    'open_seconds': 30.0,
+    'half_open_probes': 1,
+    'min_timeout': 2.0,
+    'timeout_multiplier': 1.5,
+}
+# Provider routing (see llm_router): short turns go to fast_model when set,
+# and slow primary calls are hedged to OpenAI when OPENAI_API_KEY is set
+OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
+OPENAI_MODEL = os.environ.get('OPENAI_MODEL', 'gpt-4o-mini')
+AI_ROUTING = {
+    'fast_model': os.environ.get('GEMINI_FAST_MODEL', ''),
+    'short_turn_tokens': 40,
+    'hedge': True,
+    'hedge_quantile': 0.9,
+    'min_hedge_delay': 0.5,
+    'max_hedge_delay': 8.0,
+}
+# Bearer token required by /metrics (empty: the endpoint is disabled)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Record provider calls to, or replay them from, a JSON cassette (see
+# llm_router.cassette). Replay needs no network; latency overrides the
+# recorded timings, latency_scale stretches them, failure_rate injects errors.
+LLM_CASSETTE = {
+    'mode': os.environ.get('LLM_CASSETTE_MODE', ''),
+    'path': os.environ.get('LLM_CASSETTE', ''),
+}
+if LLM_CASSETTE['mode'] == 'replay':
+    LLM_CASSETTE.update({
+        'latency': float(os.environ['LLM_REPLAY_LATENCY']) if os.environ.get('LLM_REPLAY_LATENCY') else None,
+        'latency_scale': float(os.environ.get('LLM_REPLAY_LATENCY_SCALE', 1.0)),
+        'failure_rate': float(os.environ.get('LLM_REPLAY_FAILURE_RATE', 0.0)),
+        'seed': int(os.environ.get('LLM_REPLAY_SEED', 0)),
+    })
+
+# Open the Gemini connection in the background when the app starts
+GEMINI_WARMUP = os.environ.get('GEMINI_WARMUP', 'False') == 'True'
+
+# Max number of Gemini calls the async chat views run in parallel
+AI_THREAD_POOL_SIZE = int(os.environ.get('AI_THREAD_POOL_SIZE', 200))
+
+# Load shedding in front of Gemini: turns beyond max_concurrent queue for up
+# to max_wait seconds (max_queue deep), otherwise get a fallback reply
+AI_ADMISSION = {
+    'max_concurrent': int(os.environ.get('AI_MAX_CONCURRENT', 50)),
+    'max_queue': int(os.environ.get('AI_MAX_QUEUE', 100)),
+    'max_wait': float(os.environ.get('AI_MAX_WAIT', 2.0)),
+}
+
+# Per-user token bucket in front of the AI call paths: `burst` messages at
+# once, refilled at `per_minute`. Kept in `cache`, which must be shared
+# (e.g. Redis) for the limit to hold across workers. per_minute=0 disables it.
+AI_RATE_LIMIT = {
+    'per_minute': float(os.environ.get('AI_RATE_LIMIT_PER_MINUTE', 20)),
+    'burst': int(os.environ.get('AI_RATE_LIMIT_BURST', 5)),
+    'cache': 'default',
+}
+
+# Queue mode: send_message saves the user message and returns 202 with a turn
+# id; `manage.py run_turn_workers` makes the Gemini calls and clients fetch the
+# reply from /api/chat/turns/<id>/?wait=<seconds>
+CHAT_TURN_QUEUE = os.environ.get('CHAT_TURN_QUEUE', 'False') == 'True'
+CHAT_TURN_WORKERS = {
+    'workers': int(os.environ.get('CHAT_TURN_WORKERS', 4)),
+    'poll_interval': 0.5,
+    # A running turn not finished within lease_seconds is handed to another worker
+    'lease_seconds': 120,
+    'max_attempts': 3,
+}
+# Longest a client may hold a long-poll request open
+CHAT_TURN_POLL_MAX = 30
+
+# Number of most recent messages (including the new one) loaded per chat turn
+CHAT_HISTORY_WINDOW = int(os.environ.get('CHAT_HISTORY_WINDOW', 7))
+
+# Keyset page size for GET /api/chat/sessions/<id>/?after_id=&before_id=
+CHAT_MESSAGE_PAGE_SIZE = 50
+CHAT_MESSAGE_PAGE_MAX = 200
+
+# Rolling session summary: fold aged-out messages in batches of this size
+CHAT_SUMMARY_BATCH = int(os.environ.get('CHAT_SUMMARY_BATCH', 4))
+CHAT_SUMMARY_MAX_CHARS = int(os.environ.get('CHAT_SUMMARY_MAX_CHARS', 1200))
+
+# Estimated input-token budget for each Gemini chat prompt
+CHAT_PROMPT_TOKEN_BUDGET = int(os.environ.get('CHAT_PROMPT_TOKEN_BUDGET', 1500))
+
+# Longest window GET /api/mood/trends/?days= may ask for
+MOOD_TRENDS_MAX_DAYS = 730
+
+# Per-user mood drift detection (mood.models.MoodDrift): fast and slow EWMAs
+# of mood valence; a drop of the fast one below the slow baseline by
+# min_drop and z standard deviations writes a MoodDriftEvent
+MOOD_DRIFT = {
+    'fast_alpha': 0.2,
+    'slow_alpha': 0.02,
+    'min_observations': 5,
+    'min_drop': float(os.environ.get('MOOD_DRIFT_MIN_DROP', 0.5)),
+    'z': 2.5,
+    # After this long without a mood, the fast average restarts from the baseline
+    'stale_days': 14,
+}
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.urls import path, include
+from chat import views as chat_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -8,4 +9,5 @@ urlpatterns = [
     path('api/mood/', include('mood.urls')),
     path('api/news/', include('news.urls')),
     path('api/journal/', include('journal.urls')),
+    path('metrics', chat_views.metrics, name='metrics'),
 ]
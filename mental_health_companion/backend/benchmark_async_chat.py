@@ -0,0 +1,79 @@
+import os
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test.utils import override_settings
+from chat.ai_service import get_ai_response, aget_ai_response
+from chat.fake_gemini import FakeGeminiServer
+from llm_router.metrics import metrics
+
+HISTORY = [
+    {'sender': 'bot', 'content': "Hello! I'm here to support you. How can I help you today?"},
+    {'sender': 'user', 'content': "Work has been really stressful this week."},
+]
+
+def fallback_replies():
+    return sum(count for (app, _), count in metrics.fallbacks.items() if app == 'chat')
+
+def run_sync(turns, workers):
+    """Blocking calls capped by the number of WSGI workers; returns (seconds, fallback replies)"""
+    fallbacks = fallback_replies()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda i: get_ai_response('stressed', f"Message {i}", HISTORY), range(turns)))
+    return time.perf_counter() - start, fallback_replies() - fallbacks
+
+async def run_async(turns):
+    """All turns in flight at once on the event loop; returns (seconds, fallback replies)"""
+    fallbacks = fallback_replies()
+    start = time.perf_counter()
+    await asyncio.gather(*(aget_ai_response('stressed', f"Message {i}", HISTORY) for i in range(turns)))
+    return time.perf_counter() - start, fallback_replies() - fallbacks
+
+def report(name, turns, elapsed, fallbacks):
+    """Print throughput of model replies only: canned fallbacks are instant and would inflate it"""
+    answered = turns - fallbacks
+    print(f"{name}: {elapsed:.2f}s -> {answered / elapsed:.1f} model replies/s ({fallbacks} fallback replies)")
+    return answered / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent chat-turn throughput against a fake Gemini server")
+    parser.add_argument('--latency', type=float, default=1.0, help="Fake Gemini latency in seconds")
+    parser.add_argument('--turns', type=int, default=200, help="Number of concurrent chat turns")
+    parser.add_argument('--workers', type=int, default=4, help="Sync (WSGI) worker count for the baseline")
+    args = parser.parse_args()
+    
+    print("🧪 Async chat pipeline benchmark")
+    print("=" * 50)
+    print(f"Fake Gemini latency: {args.latency}s | Turns: {args.turns} | Sync workers: {args.workers}")
+    
+    with FakeGeminiServer(latency=args.latency) as server:
+        # Admit every turn: the default admission limits would shed part of the
+        # async run to instant fallback replies and skew the comparison
+        fake_gemini = override_settings(
+            GEMINI_API_KEY='fake', GEMINI_TRANSPORT='rest', GEMINI_API_ENDPOINT=server.url,
+            AI_ADMISSION={'max_concurrent': args.turns, 'max_queue': args.turns, 'max_wait': 10 * args.latency + 5},
+        )
+        fake_gemini.enable()
+        
+        print()
+        before = report(f"Before (sync, {args.workers} workers)", args.turns, *run_sync(args.turns, args.workers))
+        
+        # Start the async run cold so it cannot be served from the response cache
+        caches[settings.AI_RESPONSE_CACHE].clear()
+        after = report("After  (async, 1 process)", args.turns, *asyncio.run(run_async(args.turns)))
+        
+        print(f"\nSpeedup: {after / before:.1f}x ({server.requests} upstream calls)")
+        fake_gemini.disable()
+
+if __name__ == "__main__":
+    main()
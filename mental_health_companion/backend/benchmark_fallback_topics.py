@@ -0,0 +1,73 @@
+import os
+import time
+import random
+import argparse
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from chat.ai_service import detect_topic
+
+MESSAGES = [
+    "I have been feeling really low since the meeting with my boss this morning",
+    "My parents keep arguing and I don't know what to do about it anymore",
+    "I can't sleep at night and I'm exhausted all the time lately",
+    "We won the contest at the fair and everyone was so happy for us",
+    "Honestly nothing in particular, just a strange and heavy kind of day",
+    "The bills keep piling up and I'm scared about my debt this month",
+    "I went to the doctor because the pain in my back is getting worse",
+    "My girlfriend and I had a long talk about where our relationship is going",
+]
+
+# The keyword lists as they were before the compiled matcher, frozen so the
+# baseline does not scan the inflections FALLBACK_TOPICS lists today
+ORIGINAL_TOPICS = [
+    ('work', ['work', 'job', 'boss', 'colleague', 'office', 'meeting']),
+    ('family', ['family', 'parent', 'sibling', 'child', 'mom', 'dad', 'mother', 'father']),
+    ('relationships', ['friend', 'relationship', 'partner', 'boyfriend', 'girlfriend', 'dating']),
+    ('school', ['school', 'study', 'exam', 'test', 'homework', 'college', 'university']),
+    ('sleep', ['tired', 'exhausted', 'sleep', 'insomnia']),
+    ('money', ['money', 'financial', 'bills', 'debt', 'expensive']),
+    ('health', ['health', 'sick', 'doctor', 'hospital', 'pain']),
+]
+
+def substring_topic(message):
+    """The original lookup: lower() then one any(word in text) scan per topic"""
+    message_lower = message.lower()
+    for topic, words in ORIGINAL_TOPICS:
+        if any(word in message_lower for word in words):
+            return topic
+    return None
+
+def bench(fn, messages):
+    start = time.perf_counter()
+    for message in messages:
+        fn(message)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Fallback topic detection: substring scans vs compiled matcher")
+    parser.add_argument('--messages', type=int, default=200_000, help="Number of messages to classify")
+    parser.add_argument('--repeat', type=int, default=5, help="Take the best of this many runs")
+    args = parser.parse_args()
+    
+    random.seed(0)
+    messages = [random.choice(MESSAGES) for _ in range(args.messages)]
+    
+    print("🧪 Fallback topic matcher benchmark")
+    print("=" * 50)
+    
+    before = min(bench(substring_topic, messages) for _ in range(args.repeat))
+    after = min(bench(detect_topic, messages) for _ in range(args.repeat))
+    print(f"Before (substring scans):  {before * 1e9 / args.messages:,.0f} ns/message")
+    print(f"After  (compiled matcher): {after * 1e9 / args.messages:,.0f} ns/message")
+    print(f"\nSpeedup: {before / after:.1f}x")
+    
+    changed = [m for m in MESSAGES if substring_topic(m) != detect_topic(m)]
+    for message in changed:
+        print(f"🔁 Topic changed for '{message}': {substring_topic(message)} -> {detect_topic(message)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import os
+import time
+import random
+import argparse
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from mood.mood_analyzer import analyze_batch
+
+SENTENCES = [
+    "Today started slowly and I spent most of the morning catching up on emails.",
+    "I felt really good after my walk, the sun was out and the park was quiet.",
+    "Work has been so busy lately and I'm exhausted by the time I get home.",
+    "I keep worrying about the presentation next week and I can't focus.",
+    "Called my sister in the evening and we talked for almost an hour.",
+    "Honestly I feel a bit down, nothing specific, just a heavy kind of day.",
+    "The traffic made me furious, I was late again and my boss noticed.",
+    "We had dinner with friends and it was a wonderful, cheerful night.",
+    "I said goodbye to my old apartment today, which was strange.",
+    "There is so much pressure to get everything done before the holidays.",
+    "I made a list of three things I'm grateful for before bed.",
+    "My chest felt tight this afternoon, I think it was panic again.",
+]
+
+# The keywords as they were before the compiled analyzer, frozen so the
+# baseline does not scan the derived forms MOOD_KEYWORDS lists today
+ORIGINAL_KEYWORDS = {
+    'happy': ['happy', 'joy', 'excited', 'great', 'wonderful', 'amazing', 'good', 'cheerful'],
+    'sad': ['sad', 'depressed', 'down', 'unhappy', 'miserable', 'crying', 'tears'],
+    'anxious': ['anxious', 'worried', 'nervous', 'panic', 'fear', 'scared', 'stress'],
+    'angry': ['angry', 'mad', 'furious', 'irritated', 'frustrated', 'annoyed'],
+    'stressed': ['stressed', 'overwhelmed', 'pressure', 'tired', 'exhausted', 'busy'],
+}
+
+def substring_mood(text):
+    """The original analyzer: one substring test per mood keyword"""
+    text_lower = text.lower()
+    mood_scores = {mood: 0 for mood in ORIGINAL_KEYWORDS}
+    for mood, keywords in ORIGINAL_KEYWORDS.items():
+        for keyword in keywords:
+            if keyword in text_lower:
+                mood_scores[mood] += 1
+    max_mood = max(mood_scores, key=mood_scores.get)
+    return max_mood if mood_scores[max_mood] > 0 else 'neutral'
+
+def best_of(repeat, fn):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Mood analyzer: substring scans vs whole-word keyword analyzer")
+    parser.add_argument('--texts', type=int, default=100_000, help="Number of journal-sized texts")
+    parser.add_argument('--sentences', type=int, default=8, help="Sentences per text")
+    parser.add_argument('--repeat', type=int, default=3, help="Take the best of this many runs")
+    args = parser.parse_args()
+
+    random.seed(0)
+    texts = [' '.join(random.choices(SENTENCES, k=args.sentences)) for _ in range(args.texts)]
+
+    print("🧪 Mood analyzer benchmark")
+    print("=" * 50)
+    print(f"{args.texts:,} texts of ~{sum(map(len, texts)) // len(texts)} characters")
+
+    before, old = best_of(args.repeat, lambda: [substring_mood(text) for text in texts])
+    after, new = best_of(args.repeat, lambda: analyze_batch(texts))
+    print(f"Before (substring scans):  {before:.2f}s ({before * 1e6 / args.texts:.1f} µs/text)")
+    print(f"After  (analyze_batch):    {after:.2f}s ({after * 1e6 / args.texts:.1f} µs/text)")
+    print(f"\nSpeedup: {before / after:.1f}x")
+
+    changed = sum(a != b for a, b in zip(old, new))
+    print(f"🔁 {changed:,} texts changed mood (whole words and derived forms: 'goodbye' is no longer 'good', 'worrying' is now anxious)")
+
+if __name__ == "__main__":
+    main()
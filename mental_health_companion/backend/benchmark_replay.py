@@ -0,0 +1,153 @@
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+DEFAULT_CASSETTE = Path(__file__).resolve().parent / 'cassettes' / 'conversations.json'
+
+parser = argparse.ArgumentParser(description="Drive full conversations through recorded or replayed AI providers")
+parser.add_argument('--cassette', default=str(DEFAULT_CASSETTE), help="Cassette JSON file")
+parser.add_argument('--record', action='store_true', help="Call the real providers and record them to the cassette")
+parser.add_argument('--fake-gemini', type=float, metavar='LATENCY',
+                    help="Record the backend against the local fake Gemini server instead of the real API")
+parser.add_argument('--latency', type=float, help="Replay every call with this fixed latency in seconds")
+parser.add_argument('--latency-scale', type=float, default=1.0, help="Multiply the recorded latencies")
+parser.add_argument('--failure-rate', type=float, default=0.0, help="Fraction of replayed calls that fail")
+parser.add_argument('--seed', type=int, default=0, help="Seed for failure injection")
+parser.add_argument('--app', choices=['backend', 'companion', 'both'], default='both')
+parser.add_argument('--repeat', type=int, default=3, help="Times each conversation is run")
+args = parser.parse_args()
+
+# The providers read these when they are first created
+os.environ['LLM_CASSETTE'] = args.cassette
+os.environ['LLM_CASSETTE_MODE'] = 'record' if args.record else 'replay'
+if not args.record:
+    # Replay needs no credentials; the key only switches off the no-key fallback
+    os.environ.setdefault('GEMINI_API_KEY', 'replay')
+    os.environ['LLM_REPLAY_LATENCY'] = '' if args.latency is None else str(args.latency)
+    os.environ['LLM_REPLAY_LATENCY_SCALE'] = str(args.latency_scale)
+    os.environ['LLM_REPLAY_FAILURE_RATE'] = str(args.failure_rate)
+    os.environ['LLM_REPLAY_SEED'] = str(args.seed)
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test.utils import override_settings
+from llm_router import Router, get_cassette
+from chat.ai_service import get_ai_response
+from chat.fake_gemini import FakeGeminiServer
+from chat.providers import get_chat_router
+
+CONVERSATIONS = [
+    ('happy', [
+        "Hi! I'm feeling really good today because I got a promotion at work!",
+        "It means I'll be leading a team now, which is both exciting and a bit scary.",
+        "I'm most excited about mentoring junior developers and helping them grow.",
+        "Actually, I'm a bit worried about managing people who are older than me.",
+    ]),
+    ('anxious', [
+        "I have three exams next week and I can't stop thinking about them.",
+        "Every time I sit down to study my heart starts racing.",
+        "My parents expect me to get top marks and I don't want to let them down.",
+        "Maybe I should make a schedule? I don't even know where to start.",
+    ]),
+    ('sad', [
+        "My best friend moved to another city and I feel really alone.",
+        "We used to talk every day and now it's once a week at most.",
+        "I know it's silly but weekends feel empty without her.",
+    ]),
+]
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+def run_backend():
+    latencies = []
+    replies = []
+    for mood, messages in CONVERSATIONS:
+        history = [{'sender': 'bot', 'content': f"Hello! I'm here to support you. I understand you're feeling {mood}."}]
+        for message in messages:
+            history.append({'sender': 'user', 'content': message})
+            start = time.perf_counter()
+            reply = get_ai_response(mood, message, history[-settings.CHAT_HISTORY_WINDOW:])
+            latencies.append(time.perf_counter() - start)
+            replies.append(reply)
+            history.append({'sender': 'bot', 'content': reply})
+    return latencies, replies
+
+def run_companion():
+    from companion.ai import generate_response
+    latencies = []
+    replies = []
+    for _, messages in CONVERSATIONS:
+        history = []
+        for message in messages:
+            start = time.perf_counter()
+            reply = generate_response(message, history)
+            latencies.append(time.perf_counter() - start)
+            replies.append(reply)
+            history += [{'role': 'user', 'content': message}, {'role': 'assistant', 'content': reply}]
+    return latencies, replies
+
+def report(name, runs, recorded):
+    latencies = [latency for run in runs for latency in run[0]]
+    replies = [reply for run in runs for reply in run[1]]
+    fallbacks = sum(reply not in recorded for reply in replies) if recorded is not None else 0
+    print(f"\n{name}: {len(latencies)} turns")
+    print(f"  p50 {percentile(latencies, 0.5) * 1000:.0f} ms | p90 {percentile(latencies, 0.9) * 1000:.0f} ms"
+          f" | max {max(latencies) * 1000:.0f} ms")
+    if recorded is not None:
+        print(f"  Fallback replies: {fallbacks}")
+
+def main():
+    cassette = get_cassette(args.cassette)
+    if not args.record and not cassette.entries:
+        print(f"❌ {args.cassette} has no recorded calls; run with --record first")
+        sys.exit(1)
+    
+    mode = "Recording" if args.record else "Replaying"
+    print(f"🧪 {mode} provider calls ({args.cassette})")
+    print("=" * 50)
+    if not args.record:
+        latency = f"{args.latency}s fixed" if args.latency is not None else f"recorded x{args.latency_scale}"
+        print(f"Latency: {latency} | Failure rate: {args.failure_rate:.0%} | Seed: {args.seed}")
+    
+    fake_gemini = None
+    if args.record and args.fake_gemini is not None:
+        fake_gemini = FakeGeminiServer(latency=args.fake_gemini).__enter__()
+        override_settings(GEMINI_API_KEY='fake', GEMINI_TRANSPORT='rest', GEMINI_API_ENDPOINT=fake_gemini.url).enable()
+        # The companion's own providers need real keys; record its turns through the backend's Gemini instead
+        import companion.ai
+        companion.ai._router = Router(get_chat_router().primary)
+    
+    runners = {'backend': run_backend, 'companion': run_companion}
+    apps = list(runners) if args.app == 'both' else [args.app]
+    repeat = 1 if args.record else args.repeat
+    recorded = None if args.record else {entry['response'] for entry in cassette.entries}
+    try:
+        for app in apps:
+            runs = []
+            for _ in range(repeat):
+                # Each run starts cold: no cached replies, recordings served from the start
+                caches[settings.AI_RESPONSE_CACHE].clear()
+                cassette.rewind()
+                runs.append(runners[app]())
+            report(app, runs, recorded)
+    finally:
+        if fake_gemini is not None:
+            fake_gemini.__exit__(None, None, None)
+    
+    print(f"\nRouting: {get_chat_router().snapshot()}")
+    if args.record:
+        cassette.flush()
+        print(f"✅ {len(cassette.entries)} calls saved to {args.cassette}")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,12 @@
 from django.contrib import admin
-from .models import ChatSession, Message
+from .models import ChatSession, CrisisFlag, Message
 
 admin.site.register(ChatSession)
 admin.site.register(Message)
+
+@admin.register(CrisisFlag)
+class CrisisFlagAdmin(admin.ModelAdmin):
+    list_display = ('matched_phrase', 'session', 'message', 'reviewed', 'created_at')
+    list_filter = ('reviewed', 'created_at')
+    list_editable = ('reviewed',)
+    readonly_fields = ('session', 'message', 'matched_phrase', 'created_at')
@@ -0,0 +1,156 @@
+"""Admission control and per-user rate limiting for Gemini chat turns.
+
+At most `max_concurrent` turns call Gemini at once and at most `max_queue`
+more wait for a slot. A turn is shed straight away, and served from the
+friendly fallback replies, when the queue is full or when the expected wait
+(from the recent average call time) is longer than `max_wait`. A turn that
+is still queued after `max_wait` is shed as well.
+
+Queued turns are granted slots round-robin across users, so one user with
+many turns in flight cannot starve everyone else. In front of that, each
+user has a token bucket (AI_RATE_LIMIT) and turns over the limit are
+rejected before they reach the queue.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from llm_router import TokenBucket
+
+class _Waiter:
+    __slots__ = ('granted',)
+    
+    def __init__(self):
+        self.granted = False
+
+class AdmissionController:
+    def __init__(self, max_concurrent=50, max_queue=100, max_wait=2.0, clock=time.monotonic):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.clock = clock
+        self._cond = threading.Condition()
+        # user -> queued waiters, in round-robin order
+        self._queues = OrderedDict()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self.avg_service_time = None
+    
+    def _expected_wait(self):
+        if not self.avg_service_time:
+            return 0.0
+        return (self.waiting + 1) * self.avg_service_time / self.max_concurrent
+    
+    def _dispatch(self):
+        """Hand free slots to queued turns, one user at a time"""
+        granted = False
+        while self.active < self.max_concurrent and self._queues:
+            user, waiters = next(iter(self._queues.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                self._queues.move_to_end(user)
+            else:
+                del self._queues[user]
+            waiter.granted = True
+            self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+    
+    def acquire(self, user=None):
+        """Wait for a slot; returns False if the turn should be shed instead"""
+        with self._cond:
+            if self.active < self.max_concurrent and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if self.waiting >= self.max_queue or self._expected_wait() > self.max_wait:
+                self.shed += 1
+                return False
+            
+            waiter = _Waiter()
+            self._queues.setdefault(user, deque()).append(waiter)
+            self.waiting += 1
+            deadline = self.clock() + self.max_wait
+            while not waiter.granted:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    waiters = self._queues[user]
+                    waiters.remove(waiter)
+                    if not waiters:
+                        del self._queues[user]
+                    self.waiting -= 1
+                    self.shed += 1
+                    return False
+                self._cond.wait(remaining)
+            return True
+    
+    def release(self, service_time):
+        with self._cond:
+            self.active -= 1
+            if self.avg_service_time is None:
+                self.avg_service_time = service_time
+            else:
+                self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * service_time
+            self._dispatch()
+    
+    def snapshot(self):
+        with self._cond:
+            return {
+                'active': self.active,
+                'waiting': self.waiting,
+                'waiting_users': len(self._queues),
+                'admitted': self.admitted,
+                'shed': self.shed,
+                'avg_service_time': round(self.avg_service_time, 4) if self.avg_service_time else None,
+            }
+
+_controller = None
+_controller_lock = threading.Lock()
+
+def get_admission_controller():
+    """Return the process-wide AdmissionController configured by AI_ADMISSION"""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(**settings.AI_ADMISSION)
+    return _controller
+
+_rate_limiter = None
+
+def get_rate_limiter():
+    """Return the per-user TokenBucket configured by AI_RATE_LIMIT, or None when disabled"""
+    global _rate_limiter
+    config = settings.AI_RATE_LIMIT
+    if not config['per_minute']:
+        return None
+    if _rate_limiter is None:
+        with _controller_lock:
+            if _rate_limiter is None:
+                _rate_limiter = TokenBucket(
+                    caches[config['cache']], config['per_minute'] / 60, config['burst'], prefix='chat-ai'
+                )
+    return _rate_limiter
+
+def check_rate_limit(user_id):
+    """Spend one token for `user_id`; returns (allowed, retry_after_seconds)"""
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return True, 0.0
+    return limiter.consume(f'user:{user_id}')
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    global _controller, _rate_limiter
+    if setting == 'AI_ADMISSION':
+        _controller = None
+    elif setting == 'AI_RATE_LIMIT':
+        _rate_limiter = None
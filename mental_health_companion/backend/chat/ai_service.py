@@ -1,45 +1,21 @@
-import google.generativeai as genai
 from django.conf import settings
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+import asyncio
 import logging
 import random
+import re
+import threading
+import time
+from llm_router.metrics import metrics
+from . import response_cache
+from .admission import get_admission_controller
+from .circuit_breaker import CircuitOpenError
+from .providers import get_chat_router, get_gemini_provider
+from .prompts import MOOD_PROMPTS, build_prompt, estimate_tokens
 
 logger = logging.getLogger(__name__)
 
-# Configure Gemini API
-genai.configure(api_key=settings.GEMINI_API_KEY)
-
-MOOD_PROMPTS = {
-    'happy': """You are a warm, friendly, and supportive mental health companion. The user is feeling happy! 
-    Respond with genuine enthusiasm and joy. Use emojis, exclamation points, and positive language. 
-    Help them celebrate their happiness and reflect on what's bringing them joy. 
-    Ask engaging questions about their positive experiences. Keep responses under 150 words and very conversational.""",
-    
-    'sad': """You are a compassionate, gentle, and caring mental health companion. The user is feeling sad. 
-    Respond with deep empathy, warmth, and understanding. Use soft, comforting language. 
-    Validate their feelings completely and offer gentle support. Let them know they're not alone. 
-    Ask caring questions to help them express their feelings. Keep responses under 150 words and very nurturing.""",
-    
-    'anxious': """You are a calming, reassuring, and patient mental health companion. The user is feeling anxious. 
-    Respond with a soothing, peaceful tone. Use calming language and gentle reassurance. 
-    Help them feel grounded and safe. Offer simple, practical coping strategies. 
-    Remind them that anxiety is temporary and they can get through this. Keep responses under 150 words and very supportive.""",
-    
-    'angry': """You are an understanding, non-judgmental, and patient mental health companion. The user is feeling angry. 
-    Respond with complete acceptance and understanding. Validate their anger as normal and okay. 
-    Help them process these feelings safely without judgment. Use calm, steady language. 
-    Ask gentle questions to help them explore what's underneath the anger. Keep responses under 150 words and very accepting.""",
-    
-    'stressed': """You are a supportive, understanding, and helpful mental health companion. The user is feeling stressed. 
-    Respond with empathy and practical support. Acknowledge how overwhelming stress can feel. 
-    Offer gentle relaxation techniques and perspective. Use encouraging, hopeful language. 
-    Help them break things down into manageable pieces. Keep responses under 150 words and very encouraging.""",
-    
-    'neutral': """You are a friendly, warm, and engaging mental health companion. 
-    Respond with genuine interest and care. Use a conversational, approachable tone. 
-    Help them explore their feelings and thoughts in a safe space. Ask open-ended questions. 
-    Be curious about their experiences and show that you truly care. Keep responses under 150 words and very personable."""
-}
-
 # Fallback responses when OpenAI is unavailable
 FALLBACK_RESPONSES = {
     'happy': [
@@ -108,30 +84,75 @@ FRIENDLY_FALLBACK_RESPONSES = {
     ]
 }
 
+# Topics we reflect back in fallback replies, highest priority first. Every
+# form that should match is listed, since only whole words count.
+FALLBACK_TOPICS = [
+    ('work', ['work', 'works', 'worked', 'working', 'workplace', 'job', 'jobs', 'boss', 'bosses',
+              'colleague', 'colleagues', 'office', 'offices', 'meeting', 'meetings'],
+     "I hear that work has been on your mind. {reply} What's been happening at work that's affecting you? 💼"),
+    ('family', ['family', 'families', 'parent', 'parents', 'parenting', 'sibling', 'siblings', 'child', 'children',
+                'mom', 'moms', 'dad', 'dads', 'mother', 'mothers', 'father', 'fathers'],
+     "Family situations can bring up so many emotions. {reply} Tell me more about what's going on with your family. 👨‍👩‍👧‍👦"),
+    ('relationships', ['friend', 'friends', 'friendship', 'friendships', 'relationship', 'relationships',
+                       'partner', 'partners', 'boyfriend', 'boyfriends', 'girlfriend', 'girlfriends', 'dating'],
+     "Relationships can be both wonderful and challenging. {reply} What's been happening in your relationships? 💕"),
+    ('school', ['school', 'schools', 'schoolwork', 'study', 'studies', 'studied', 'studying', 'exam', 'exams',
+                'test', 'tests', 'homework', 'college', 'university', 'universities'],
+     "School can be so demanding and stressful. {reply} What's been the most challenging part of your studies? 📚"),
+    ('sleep', ['tired', 'exhausted', 'sleep', 'sleeping', 'sleepless', 'slept', 'insomnia'],
+     "Being tired can make everything feel harder. {reply} How has your sleep been lately? 😴"),
+    ('money', ['money', 'financial', 'financially', 'finances', 'bill', 'bills', 'debt', 'debts', 'expensive'],
+     "Financial stress can be really overwhelming. {reply} What's been weighing on you financially? 💰"),
+    ('health', ['health', 'healthy', 'sick', 'sickness', 'doctor', 'doctors', 'hospital', 'hospitals',
+                'pain', 'painful'],
+     "Health concerns can be so scary and stressful. {reply} How are you taking care of yourself? 🏥"),
+]
+
+# Every topic word mapped to its topic's priority. Messages are split into
+# words once and intersected with this table, so only whole words count
+# ("test" and "tests" match, "contest" does not).
+_TOPIC_WORDS = {
+    word: index
+    for index, (_, words, _) in reversed(list(enumerate(FALLBACK_TOPICS)))
+    for word in words
+}
+_TOPIC_WORD_SET = frozenset(_TOPIC_WORDS)
+# Runs of Unicode letters and digits, so "boss," "doctor's" and "mom’s" split cleanly
+_WORD_RE = re.compile(r"\w+")
+# Fast path for ASCII messages, equivalent to _WORD_RE there: one bytes
+# translate lowercases letters and turns every non-word byte into a space
+_ASCII_WORD_CHARS = bytes(range(ord('0'), ord('9') + 1)) + b'_' + bytes(range(ord('a'), ord('z') + 1))
+_ASCII_TOKENIZE = bytes(
+    byte + 32 if ord('A') <= byte <= ord('Z') else byte if byte in _ASCII_WORD_CHARS else ord(' ')
+    for byte in range(256)
+)
+_ASCII_TOPIC_WORDS = {word.encode(): index for word, index in _TOPIC_WORDS.items()}
+_ASCII_TOPIC_WORD_SET = frozenset(_ASCII_TOPIC_WORDS)
+
+def detect_topic(message):
+    """Return the highest-priority fallback topic mentioned in `message`, or None"""
+    if message.isascii():
+        words, topics = _ASCII_TOPIC_WORD_SET, _ASCII_TOPIC_WORDS
+        hits = words.intersection(message.encode().translate(_ASCII_TOKENIZE).split())
+    else:
+        words, topics = _TOPIC_WORD_SET, _TOPIC_WORDS
+        hits = words.intersection(_WORD_RE.findall(message.lower()))
+    if not hits:
+        return None
+    return FALLBACK_TOPICS[min(map(topics.__getitem__, hits))][0]
+
+_TOPIC_TEMPLATES = {topic: template for topic, _, template in FALLBACK_TOPICS}
+
 def get_friendly_fallback_response(mood, message):
     """Get a very friendly contextual fallback response that feels personalized"""
     mood_key = mood.lower() if mood.lower() in FRIENDLY_FALLBACK_RESPONSES else 'neutral'
     base_responses = FRIENDLY_FALLBACK_RESPONSES[mood_key]
     
-    # Make response contextual and personalized based on their actual message
-    message_lower = message.lower()
-    
     # Try to reflect back what they said to show we're listening
     if len(message.split()) > 3:  # If they gave us enough to work with
-        if any(word in message_lower for word in ['work', 'job', 'boss', 'colleague', 'office', 'meeting']):
-            return f"I hear that work has been on your mind. {random.choice(base_responses)} What's been happening at work that's affecting you? 💼"
-        elif any(word in message_lower for word in ['family', 'parent', 'sibling', 'child', 'mom', 'dad', 'mother', 'father']):
-            return f"Family situations can bring up so many emotions. {random.choice(base_responses)} Tell me more about what's going on with your family. 👨‍👩‍👧‍👦"
-        elif any(word in message_lower for word in ['friend', 'relationship', 'partner', 'boyfriend', 'girlfriend', 'dating']):
-            return f"Relationships can be both wonderful and challenging. {random.choice(base_responses)} What's been happening in your relationships? 💕"
-        elif any(word in message_lower for word in ['school', 'study', 'exam', 'test', 'homework', 'college', 'university']):
-            return f"School can be so demanding and stressful. {random.choice(base_responses)} What's been the most challenging part of your studies? 📚"
-        elif any(word in message_lower for word in ['tired', 'exhausted', 'sleep', 'insomnia']):
-            return f"Being tired can make everything feel harder. {random.choice(base_responses)} How has your sleep been lately? 😴"
-        elif any(word in message_lower for word in ['money', 'financial', 'bills', 'debt', 'expensive']):
-            return f"Financial stress can be really overwhelming. {random.choice(base_responses)} What's been weighing on you financially? 💰"
-        elif any(word in message_lower for word in ['health', 'sick', 'doctor', 'hospital', 'pain']):
-            return f"Health concerns can be so scary and stressful. {random.choice(base_responses)} How are you taking care of yourself? 🏥"
+        topic = detect_topic(message)
+        if topic is not None:
+            return _TOPIC_TEMPLATES[topic].format(reply=random.choice(base_responses))
     
     # If we can't find specific context, give a more general but still personalized response
     if mood_key == 'happy':
@@ -147,73 +168,185 @@ def get_friendly_fallback_response(mood, message):
     else:
         return f"Thank you for sharing with me. {random.choice(base_responses)} What's been on your mind today? 💭"
 
-def get_ai_response(mood, message, conversation_history=None):
-    """Generate friendly AI therapist response using Google Gemini"""
+class FallbackReply(Exception):
+    """The turn gets a friendly fallback reply instead of a model reply, because of `reason`"""
+    
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+def _fallback(mood, message, reason):
+    metrics.record_fallback('chat', reason)
+    return get_friendly_fallback_response(mood, message)
+
+def _generate_response(mood, message, conversation_history=None, summary=""):
+    """Call Gemini and return the reply; raises FallbackReply when the fallback should be used"""
+    try:
+        prompt = build_prompt(mood, message, conversation_history, summary)
+        # Short turns may go to the fast model; slow calls are hedged to the backup provider
+        text = get_chat_router().complete(
+            [{'role': 'user', 'content': prompt.text}], size=estimate_tokens(message)
+        )
+    except CircuitOpenError:
+        logger.info("Gemini circuit is open, using fallback")
+        raise FallbackReply('circuit_open')
+    except Exception as e:
+        logger.error(f"Gemini API Error: {type(e).__name__} - {e}")
+        raise FallbackReply('provider_error')
+    
+    if text and len(text.strip()) > 10:
+        return text.strip()
+    logger.warning("Gemini returned empty or very short response, using fallback")
+    raise FallbackReply('short_response')
+
+def _admitted_response(mood, message, conversation_history=None, summary="", user=None):
+    """_generate_response behind admission control"""
+    admission = get_admission_controller()
+    if not admission.acquire(user):
+        logger.warning("Gemini backlog is full, shedding turn to fallback")
+        raise FallbackReply('shed')
+    start = time.monotonic()
+    try:
+        return _generate_response(mood, message, conversation_history, summary)
+    finally:
+        admission.release(time.monotonic() - start)
+
+def get_ai_response(mood, message, conversation_history=None, summary="", user=None):
+    """Generate friendly AI therapist response using Google Gemini.
+    
+    `user` identifies who the turn is for, so queued turns are admitted fairly
+    and cached replies are only reused for the same user.
+    """
     
     # Check if API key is set
     if not settings.GEMINI_API_KEY:
         logger.warning("Gemini API key is not set, using friendly fallback responses")
-        return get_friendly_fallback_response(mood, message)
+        return _fallback(mood, message, 'no_api_key')
     
+    # Identical turns share one cached or in-flight Gemini call
+    key = response_cache.response_cache_key(mood, message, conversation_history, summary, user)
     try:
-        # Initialize the Gemini model with working model
-        model = genai.GenerativeModel('models/gemini-2.0-flash')
-        
-        # Get mood-specific prompt
-        system_prompt = MOOD_PROMPTS.get(mood.lower(), MOOD_PROMPTS['neutral'])
-        
-        # Build conversation context
-        conversation_context = ""
-        if conversation_history and len(conversation_history) > 1:
-            # Get the last 6 messages (3 exchanges) for better context, excluding the current message
-            recent_history = conversation_history[-7:-1] if len(conversation_history) > 6 else conversation_history[:-1]
-            for msg in recent_history:
-                role = "User" if msg['sender'] == 'user' else "Assistant"
-                conversation_context += f"{role}: {msg['content']}\n"
-        
-        # Create a more dynamic and personalized prompt
-        full_prompt = f"""
-{system_prompt}
-
-Context: You are chatting with someone who selected "{mood}" as their current mood.
-
-{f"Previous conversation context:\n{conversation_context}" if conversation_context else "This is the start of a new conversation."}
-
-User just said: "{message}"
-
-Instructions:
-- Build on our previous conversation naturally
-- Respond directly to what they said with genuine understanding
-- Reference previous topics if relevant to show you remember
-- Match their energy level and mood appropriately  
-- Ask thoughtful follow-up questions about their specific situation
-- Use their exact words when reflecting back to show you're listening
-- Be conversational and natural, like a caring friend who remembers what they shared
-- Use emojis sparingly but meaningfully
-- Keep response under 120 words
-- Make each response unique and personalized to their message and our conversation history
-
-Respond now:
-"""
-        
-        # Generate response with safety settings
-        response = model.generate_content(
-            full_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.8,
-                max_output_tokens=150,
-                top_p=0.9,
-            )
+        return response_cache.cached_ai_response(
+            key, lambda: _admitted_response(mood, message, conversation_history, summary, user)
         )
-        
-        if response.text and len(response.text.strip()) > 10:
-            return response.text.strip()
-        else:
-            logger.warning("Gemini returned empty or very short response, using fallback")
-            return get_friendly_fallback_response(mood, message)
-            
+    except FallbackReply as e:
+        return _fallback(mood, message, e.reason)
+
+def stream_ai_response(mood, message, conversation_history=None, summary="", user=None):
+    """Yield the Gemini response in chunks as they are generated.
+    
+    Falls back to a single friendly fallback chunk when the API key is missing,
+    the stream fails before producing any text, or the reply is too short.
+    """
+    if not settings.GEMINI_API_KEY:
+        logger.warning("Gemini API key is not set, using friendly fallback responses")
+        yield _fallback(mood, message, 'no_api_key')
+        return
+    
+    key = response_cache.response_cache_key(mood, message, conversation_history, summary, user)
+    cached = response_cache.get_cached(key)
+    if cached is not None:
+        yield cached
+        return
+    
+    admission = get_admission_controller()
+    if not admission.acquire(user):
+        logger.warning("Gemini backlog is full, shedding turn to fallback")
+        yield _fallback(mood, message, 'shed')
+        return
+    
+    produced = ""
+    reason = 'short_response'
+    start = time.monotonic()
+    try:
+        prompt = build_prompt(mood, message, conversation_history, summary)
+        # closing() ends the provider stream at once if our consumer stops reading
+        with closing(get_gemini_provider().stream(prompt.text)) as chunks:
+            for text in chunks:
+                if text:
+                    produced += text
+                    yield text
+    except CircuitOpenError:
+        logger.info("Gemini circuit is open, using fallback")
+        reason = 'circuit_open'
     except Exception as e:
-        logger.error(f"Gemini API Error: {type(e).__name__} - {e}")
-        # For debugging, let's see what the actual error is
-        print(f"DEBUG: Gemini API Error: {e}")
-        return get_friendly_fallback_response(mood, message)
+        logger.error(f"Gemini streaming error: {type(e).__name__} - {e}")
+        reason = 'provider_error'
+        if produced:
+            # Keep whatever was already shown to the user
+            return
+    finally:
+        admission.release(time.monotonic() - start)
+    
+    if len(produced.strip()) <= 10:
+        logger.warning("Gemini stream did not produce a usable response, using fallback")
+        yield _fallback(mood, message, reason)
+    else:
+        response_cache.store(key, produced.strip())
+
+# Bounded pool for running blocking Gemini calls from async views
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_ai_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.AI_THREAD_POOL_SIZE,
+                    thread_name_prefix='gemini',
+                )
+    return _executor
+
+SUMMARY_PROMPT = """You maintain a short running summary of a supportive chat between a user and a mental health companion.
+Update the summary with the new messages below. Keep the facts, feelings and topics the user shared that would help
+continue the conversation later. Write in third person about "the user", at most {max_words} words, no preamble.
+
+Current summary:
+{summary}
+
+New messages:
+{transcript}
+
+Updated summary:"""
+
+def _extractive_summary(summary, messages, max_chars):
+    """Cheap summary used when Gemini is unavailable: keep what the user said"""
+    said = [msg['content'].strip() for msg in messages if msg['sender'] == 'user']
+    if said:
+        summary = f"{summary} The user said: " + " / ".join(s[:120] for s in said)
+    return summary.strip()[-max_chars:]
+
+def summarize_conversation(summary, messages):
+    """Fold `messages` (oldest first) into the running `summary`"""
+    max_chars = settings.CHAT_SUMMARY_MAX_CHARS
+    if not settings.GEMINI_API_KEY:
+        return _extractive_summary(summary, messages, max_chars)
+    
+    transcript = "\n".join(
+        f"{'User' if msg['sender'] == 'user' else 'Assistant'}: {msg['content']}" for msg in messages
+    )
+    try:
+        text = get_gemini_provider().generate(
+            SUMMARY_PROMPT.format(summary=summary or "(empty)", transcript=transcript, max_words=max_chars // 6),
+            generation_config={'temperature': 0.2, 'max_output_tokens': max_chars // 3},
+        )
+        if text and text.strip():
+            return text.strip()[:max_chars]
+    except CircuitOpenError:
+        logger.info("Gemini circuit is open, using extractive summary")
+    except Exception as e:
+        logger.error(f"Gemini summary error: {type(e).__name__} - {e}")
+    return _extractive_summary(summary, messages, max_chars)
+
+async def aget_ai_response(mood, message, conversation_history=None, summary="", user=None):
+    """Async version of get_ai_response for ASGI views.
+    
+    The blocking Gemini call runs on a bounded thread pool so the event loop
+    can keep serving other requests while the model is generating.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_ai_executor(), get_ai_response, mood, message, conversation_history, summary, user
+    )
@@ -1,5 +1,12 @@
+import threading
 from django.apps import AppConfig
+from django.conf import settings
 
 class ChatConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chat'
+    
+    def ready(self):
+        if settings.GEMINI_WARMUP and settings.GEMINI_API_KEY:
+            from .providers import warm_up_gemini
+            threading.Thread(target=warm_up_gemini, name='gemini-warmup', daemon=True).start()
@@ -0,0 +1,127 @@
+"""Circuit breaker with a rolling error/latency window and adaptive timeout.
+
+While the breaker is open, calls are rejected straight away so the chat views
+can use the friendly fallback instead of waiting on a failing provider. After
+`open_seconds` a limited number of half-open probes decide whether to close
+it again. The per-call timeout tracks the p95 latency of recent successes.
+"""
+import math
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open"""
+
+class CircuitBreaker:
+    def __init__(self, window=20, min_calls=5, failure_rate=0.5, slow_call_seconds=10.0,
+                 open_seconds=30.0, half_open_probes=1, min_timeout=2.0, max_timeout=20.0,
+                 timeout_multiplier=1.5, clock=time.monotonic):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.clock = clock
+        
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)  # (failed, latency)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self.rejected = 0
+    
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+    
+    def _current_state(self):
+        if self._state == OPEN and self.clock() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+        return self._state
+    
+    def allow_request(self):
+        """Return True if a call may go to the provider now"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            self.rejected += 1
+            return False
+    
+    def record_success(self, latency):
+        self._record(latency > self.slow_call_seconds, latency)
+    
+    def record_failure(self, latency):
+        self._record(True, latency)
+    
+    def record_cancelled(self):
+        """The caller gave up on the call: free its half-open probe slot without judging the provider"""
+        with self._lock:
+            if self._current_state() == HALF_OPEN:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+    
+    def _record(self, failed, latency):
+        with self._lock:
+            state = self._current_state()
+            if state == HALF_OPEN:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+                if failed:
+                    self._trip()
+                else:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                    self._outcomes.append((False, latency))
+                return
+            
+            self._outcomes.append((failed, latency))
+            if state == CLOSED and len(self._outcomes) >= self.min_calls:
+                failures = sum(1 for failed, _ in self._outcomes if failed)
+                if failures / len(self._outcomes) >= self.failure_rate:
+                    self._trip()
+    
+    def _trip(self):
+        self._state = OPEN
+        self._opened_at = self.clock()
+    
+    def _p95(self):
+        latencies = sorted(latency for failed, latency in self._outcomes if not failed)
+        if len(latencies) < self.min_calls:
+            return None
+        return latencies[math.ceil(0.95 * len(latencies)) - 1]
+    
+    def current_timeout(self):
+        """Timeout for the next call: p95 of recent successes times the multiplier, clamped"""
+        with self._lock:
+            p95 = self._p95()
+        if p95 is None:
+            return self.max_timeout
+        return min(max(p95 * self.timeout_multiplier, self.min_timeout), self.max_timeout)
+    
+    def snapshot(self):
+        with self._lock:
+            state = self._current_state()
+            failures = sum(1 for failed, _ in self._outcomes if failed)
+            calls = len(self._outcomes)
+            p95 = self._p95()
+        return {
+            'state': state,
+            'calls_in_window': calls,
+            'failure_rate': round(failures / calls, 4) if calls else 0.0,
+            'p95_latency': round(p95, 4) if p95 is not None else None,
+            'timeout': round(self.current_timeout(), 4),
+            'rejected': self.rejected,
+        }
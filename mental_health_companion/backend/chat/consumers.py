@@ -0,0 +1,118 @@
+import math
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from llm_router import CRISIS_RESPONSE, detect_crisis
+from llm_router.metrics import metrics as llm_metrics
+from .admission import check_rate_limit
+from .models import ChatSession
+from .serializers import MessageSerializer
+from .ai_service import stream_ai_response
+from .summary import schedule_summary_update
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """Persistent per-session socket that streams bot replies chunk by chunk.
+    
+    Client sends: {"message": "..."}
+    Server sends: {"type": "user_message", "message": {...}}
+                  {"type": "chunk", "content": "..."}  (repeated)
+                  {"type": "bot_message", "message": {...}}
+                  {"type": "error", "error": "...", "retry_after": 12}  (when rate limited)
+    """
+    
+    async def connect(self):
+        user = self.scope.get('user')
+        if not user or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        
+        self.session = await self.get_session(self.scope['url_route']['kwargs']['session_id'], user)
+        if self.session is None:
+            await self.close(code=4404)
+            return
+        
+        self.group_name = f'chat_session_{self.session.id}'
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+    
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+    
+    async def receive_json(self, content, **kwargs):
+        user_message = (content or {}).get('message', '')
+        if not user_message:
+            await self.send_json({'type': 'error', 'error': 'Message is required'})
+            return
+        
+        # Crisis language gets the resources in one message, without the AI call
+        crisis_phrase = detect_crisis(user_message)
+        if crisis_phrase:
+            llm_metrics.record_fallback('chat', 'crisis')
+            user_msg, bot_msg = await self.save_crisis_turn(user_message, crisis_phrase)
+            await self.broadcast({'type': 'chat.user_message', 'message': MessageSerializer(user_msg).data})
+            await self.broadcast({'type': 'chat.bot_message', 'message': MessageSerializer(bot_msg).data})
+            schedule_summary_update(self.session.id)
+            return
+        
+        allowed, retry_after = await sync_to_async(check_rate_limit)(self.scope['user'].id)
+        if not allowed:
+            await self.send_json({'type': 'error', 'error': 'Too many messages', 'retry_after': math.ceil(retry_after)})
+            return
+        
+        user_msg, history = await self.save_user_message(user_message)
+        await self.broadcast({'type': 'chat.user_message', 'message': MessageSerializer(user_msg).data})
+        
+        # Pull chunks off the blocking Gemini stream without holding the event loop
+        stream = stream_ai_response(self.session.mood, user_message, history, self.session.summary,
+                                    self.scope['user'].id)
+        next_chunk = sync_to_async(next, thread_sensitive=False)
+        chunks = []
+        while True:
+            chunk = await next_chunk(stream, None)
+            if chunk is None:
+                break
+            chunks.append(chunk)
+            await self.broadcast({'type': 'chat.chunk', 'content': chunk})
+        
+        bot_msg = await self.save_bot_message(''.join(chunks).strip())
+        await self.broadcast({'type': 'chat.bot_message', 'message': MessageSerializer(bot_msg).data})
+        schedule_summary_update(self.session.id)
+    
+    async def broadcast(self, event):
+        await self.channel_layer.group_send(self.group_name, event)
+    
+    # Group event handlers
+    async def chat_user_message(self, event):
+        await self.send_json({'type': 'user_message', 'message': event['message']})
+    
+    async def chat_chunk(self, event):
+        await self.send_json({'type': 'chunk', 'content': event['content']})
+    
+    async def chat_bot_message(self, event):
+        await self.send_json({'type': 'bot_message', 'message': event['message']})
+    
+    # Database helpers
+    @database_sync_to_async
+    def get_session(self, session_id, user):
+        try:
+            return ChatSession.objects.get(id=session_id, user=user)
+        except ChatSession.DoesNotExist:
+            return None
+    
+    @database_sync_to_async
+    def save_user_message(self, content):
+        # Refresh so the prompt uses the latest rolling summary
+        self.session.refresh_from_db(fields=['summary'])
+        message, = self.session.add_messages(('user', content))
+        history = list(self.session.history_window())[::-1]
+        return message, history
+    
+    @database_sync_to_async
+    def save_bot_message(self, content):
+        return self.session.add_messages(('bot', content))[0]
+    
+    @database_sync_to_async
+    def save_crisis_turn(self, content, crisis_phrase):
+        user_msg, bot_msg, _ = self.session.record_crisis_turn(content, CRISIS_RESPONSE, crisis_phrase)
+        return user_msg, bot_msg
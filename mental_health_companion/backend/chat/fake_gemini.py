@@ -0,0 +1,101 @@
+"""Local stand-in for the Gemini REST API used by benchmarks and tests.
+
+Point the shared provider at it with:
+
+    @override_settings(GEMINI_API_KEY='fake', GEMINI_TRANSPORT='rest',
+                       GEMINI_API_ENDPOINT=server.url)
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = "I'm really glad you shared that with me. What has been on your mind the most today?"
+
+def _candidate(text):
+    return {
+        'candidates': [{
+            'content': {'role': 'model', 'parts': [{'text': text}]},
+            'finishReason': 'STOP',
+            'index': 0,
+        }]
+    }
+
+class FakeGeminiServer:
+    """Threaded HTTP server answering generateContent with a fixed delay.
+    
+    Set `mode` to 'fail' to answer with HTTP 500, or to 'stall' to hold each
+    request for `stall_seconds` before answering.
+    """
+    
+    def __init__(self, latency=0.5, reply=DEFAULT_REPLY, host='127.0.0.1', port=0,
+                 mode='ok', stall_seconds=30.0):
+        self.latency = latency
+        self.reply = reply
+        self.mode = mode
+        self.stall_seconds = stall_seconds
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+    
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *exc):
+        self.stop()
+    
+    def _make_handler(self):
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                self.rfile.read(length)
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.stall_seconds if server.mode == 'stall' else server.latency)
+                if server.mode == 'fail':
+                    self._reply(500, {'error': {'code': 500, 'message': 'fake failure', 'status': 'INTERNAL'}})
+                    return
+                if ':countTokens' in self.path:
+                    payload = {'totalTokens': len(server.reply.split())}
+                elif ':streamGenerateContent' in self.path:
+                    words = server.reply.split(' ')
+                    payload = [
+                        _candidate(' '.join(words[i:i + 4]) + (' ' if i + 4 < len(words) else ''))
+                        for i in range(0, len(words), 4)
+                    ]
+                else:
+                    payload = _candidate(server.reply)
+                self._reply(200, payload)
+            
+            def _reply(self, code, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        return Handler
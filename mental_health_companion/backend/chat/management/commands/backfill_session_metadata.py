@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Substr
+from chat.models import PREVIEW_LENGTH, ChatSession, Message
+
+class Command(BaseCommand):
+    help = "Recompute message_count, last_message_preview and last_activity_at for chat sessions"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Sessions updated per transaction")
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        session_messages = Message.objects.filter(session=OuterRef('pk')).order_by()
+        count = session_messages.values('session').annotate(count=Count('id')).values('count')
+        latest = session_messages.values('session').annotate(latest=Max('timestamp')).values('latest')
+        preview = Message.objects.filter(session=OuterRef('pk')).order_by('-timestamp', '-id').annotate(
+            preview=Substr('content', 1, PREVIEW_LENGTH)
+        ).values('preview')[:1]
+        
+        updated = 0
+        last_id = 0
+        while True:
+            ids = list(
+                ChatSession.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                updated += ChatSession.objects.filter(id__in=ids).update(
+                    message_count=Coalesce(Subquery(count), 0),
+                    last_message_preview=Coalesce(Subquery(preview), Value('')),
+                    last_activity_at=Coalesce(Subquery(latest), F('created_at')),
+                )
+            last_id = ids[-1]
+        
+        self.stdout.write(self.style.SUCCESS(f"Backfilled metadata for {updated} chat sessions"))
@@ -0,0 +1,58 @@
+import multiprocessing
+import signal
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+def run_worker(poll_interval, once):
+    """Worker process entry point; imported lazily so spawned children can set Django up first"""
+    # Spawned children (the default on Windows and macOS) start from a fresh interpreter
+    django.setup()
+    from chat.turn_queue import run_worker
+    return run_worker(poll_interval, once)
+
+class Command(BaseCommand):
+    help = "Run worker processes that generate AI replies for queued chat turns (CHAT_TURN_QUEUE)"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.CHAT_TURN_WORKERS['workers'],
+                            help="Worker processes, i.e. the maximum number of concurrent AI calls")
+        parser.add_argument('--poll-interval', type=float, default=settings.CHAT_TURN_WORKERS['poll_interval'],
+                            help="Seconds an idle worker waits before polling the queue again")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty")
+    
+    def handle(self, *args, **options):
+        workers = options['workers']
+        poll_interval = options['poll_interval']
+        once = options['once']
+        
+        if workers <= 1:
+            processed = run_worker(poll_interval, once)
+            self.stdout.write(self.style.SUCCESS(f"Processed {processed} chat turns"))
+            return
+        
+        # Children must not inherit the parent's database connections
+        connections.close_all()
+        # The platform's default start method: 'fork' is not available on Windows
+        processes = [
+            multiprocessing.Process(target=run_worker, args=(poll_interval, once), name=f'turn-worker-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {workers} chat turn workers")
+        
+        signal.signal(signal.SIGTERM, lambda *_: self._stop(processes))
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            self._stop(processes)
+        self.stdout.write(self.style.SUCCESS("Chat turn workers stopped"))
+    
+    def _stop(self, processes):
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
@@ -0,0 +1,21 @@
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.authtoken.models import Token
+
+@database_sync_to_async
+def get_user_for_token(key):
+    try:
+        return Token.objects.select_related('user').get(key=key).user
+    except Token.DoesNotExist:
+        return AnonymousUser()
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """Authenticate WebSocket connections with a DRF token passed as ?token=<key>"""
+    
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        key = query.get('token', [None])[0]
+        scope['user'] = await get_user_for_token(key) if key else AnonymousUser()
+        return await super().__call__(scope, receive, send)
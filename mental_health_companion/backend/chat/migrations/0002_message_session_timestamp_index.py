@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['session', 'timestamp'], name='chat_msg_session_ts_idx'),
+        ),
+    ]
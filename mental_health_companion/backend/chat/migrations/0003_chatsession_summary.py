@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_message_session_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsession',
+            name='summary',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='summary_until_id',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_chatsession_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(fields=['user', '-updated_at', '-id'], name='chat_session_user_upd_idx'),
+        ),
+    ]
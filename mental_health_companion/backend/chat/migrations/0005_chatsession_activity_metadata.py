@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:29
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_chatsession_user_updated_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='chatsession',
+            options={'ordering': ['-last_activity_at', '-id']},
+        ),
+        migrations.RemoveIndex(
+            model_name='chatsession',
+            name='chat_session_user_upd_idx',
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(fields=['user', '-last_activity_at', '-id'], name='chat_session_user_act_idx'),
+        ),
+    ]
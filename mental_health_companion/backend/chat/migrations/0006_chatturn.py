@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_chatsession_activity_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatTurn',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(blank=True, max_length=255, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('bot_message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='chat.message')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='turns', to='chat.chatsession')),
+                ('user_message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='chat.message')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='chatturn',
+            constraint=models.UniqueConstraint(fields=('session', 'idempotency_key'), name='chat_turn_session_key_uniq'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_chatturn'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatturn',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chatturn',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatturn',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='done', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='chatturn',
+            name='bot_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='chat.message'),
+        ),
+        migrations.AddIndex(
+            model_name='chatturn',
+            index=models.Index(fields=['status', 'id'], name='chat_turn_status_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_chatturn_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrisisFlag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('matched_phrase', models.CharField(max_length=50)),
+                ('reviewed', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='crisis_flags', to='chat.message')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='crisis_flags', to='chat.chatsession')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['reviewed', '-created_at'], name='chat_crisis_review_idx')],
+            },
+        ),
+    ]
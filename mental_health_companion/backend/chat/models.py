@@ -1,14 +1,160 @@
-from django.db import models
+import logging
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_LENGTH = 100
 
 class ChatSession(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     mood = models.CharField(max_length=50)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Rolling summary of messages that have aged out of the history window
+    summary = models.TextField(blank=True)
+    summary_until_id = models.BigIntegerField(default=0)
+    # Denormalized activity metadata, maintained by add_messages()
+    message_count = models.PositiveIntegerField(default=0)
+    last_message_preview = models.CharField(max_length=PREVIEW_LENGTH, blank=True)
+    last_activity_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
-        ordering = ['-updated_at']
+        ordering = ['-last_activity_at', '-id']
+        indexes = [
+            models.Index(fields=['user', '-last_activity_at', '-id'], name='chat_session_user_act_idx'),
+        ]
+    
+    def add_messages(self, *messages):
+        """Create (sender, content) messages and update the session metadata in one transaction"""
+        # No savepoint when nested: a failure here aborts the caller's transaction too
+        with transaction.atomic(savepoint=False):
+            created = Message.objects.bulk_create(
+                Message(session=self, sender=sender, content=content) for sender, content in messages
+            )
+            last = created[-1]
+            ChatSession.objects.filter(pk=self.pk).update(
+                message_count=F('message_count') + len(created),
+                last_message_preview=last.content[:PREVIEW_LENGTH],
+                last_activity_at=last.timestamp,
+            )
+        return created
+    
+    async def aadd_messages(self, *messages):
+        return await sync_to_async(self.add_messages)(*messages)
+    
+    def record_turn(self, user_content, bot_content, idempotency_key=None, crisis_phrase=None):
+        """Persist a user/bot exchange, and its idempotency key, in one transaction.
+        
+        Returns (user_message, bot_message, replayed). If another request
+        already stored a turn under the same key, nothing is written and that
+        turn's messages are returned with replayed=True. A `crisis_phrase`
+        also flags the user message for follow-up.
+        """
+        try:
+            with transaction.atomic():
+                user_msg, bot_msg = self.add_messages(('user', user_content), ('bot', bot_content))
+                if idempotency_key:
+                    ChatTurn.objects.create(session=self, idempotency_key=idempotency_key,
+                                            user_message=user_msg, bot_message=bot_msg)
+                if crisis_phrase:
+                    CrisisFlag.objects.create(session=self, message=user_msg, matched_phrase=crisis_phrase)
+        except IntegrityError:
+            if not idempotency_key:
+                raise
+            turn = self.find_turn(idempotency_key)
+            return turn.user_message, turn.bot_message, True
+        return user_msg, bot_msg, False
+    
+    async def arecord_turn(self, user_content, bot_content, idempotency_key=None, crisis_phrase=None):
+        return await sync_to_async(self.record_turn)(user_content, bot_content, idempotency_key, crisis_phrase)
+    
+    def record_crisis_turn(self, user_content, bot_content, crisis_phrase, idempotency_key=None):
+        """record_turn() for a crisis exchange, which must reach the user even if saving it fails.
+        
+        On a database error the exchange is logged and returned as unsaved
+        messages, so the caller can still send the crisis resources.
+        """
+        try:
+            return self.record_turn(user_content, bot_content, idempotency_key, crisis_phrase)
+        except Exception as e:
+            logger.error(f"Could not save crisis turn for session {self.pk}: {e}", exc_info=True)
+            now = timezone.now()
+            return (Message(session=self, sender='user', content=user_content, timestamp=now),
+                    Message(session=self, sender='bot', content=bot_content, timestamp=now), False)
+    
+    async def arecord_crisis_turn(self, user_content, bot_content, crisis_phrase, idempotency_key=None):
+        return await sync_to_async(self.record_crisis_turn)(user_content, bot_content, crisis_phrase, idempotency_key)
+    
+    def enqueue_turn(self, user_content, idempotency_key=None, running=False):
+        """Save the user message and a pending ChatTurn for the queue workers.
+        
+        With `running` the caller claims the turn itself: it generates the
+        reply inline and saves it with complete_turn(). Either way the user
+        message is stored before any AI call, and a retry under the same key
+        finds this turn instead of calling the AI again. Returns (turn,
+        replayed), with the same idempotency handling as record_turn().
+        """
+        status, claimed_at = (ChatTurn.RUNNING, timezone.now()) if running else (ChatTurn.PENDING, None)
+        try:
+            with transaction.atomic():
+                user_msg, = self.add_messages(('user', user_content))
+                turn = ChatTurn.objects.create(session=self, idempotency_key=idempotency_key, user_message=user_msg,
+                                               status=status, claimed_at=claimed_at, attempts=int(running))
+        except IntegrityError:
+            if not idempotency_key:
+                raise
+            return self.find_turn(idempotency_key), True
+        return turn, False
+    
+    async def aenqueue_turn(self, user_content, idempotency_key=None, running=False):
+        return await sync_to_async(self.enqueue_turn)(user_content, idempotency_key, running)
+    
+    def complete_turn(self, turn, bot_content):
+        """Save the bot reply for a running turn and mark it done.
+        
+        Only the claim that started the turn (turn.claimed_at) may finish it.
+        Returns the bot message, or None if the turn was reclaimed or failed
+        in the meantime, in which case nothing is written.
+        """
+        with transaction.atomic():
+            bot_message, = self.add_messages(('bot', bot_content))
+            # One conditional UPDATE both checks the claim and stores the reply
+            finished = ChatTurn.objects.filter(
+                id=turn.id, status=ChatTurn.RUNNING, claimed_at=turn.claimed_at
+            ).update(status=ChatTurn.DONE, bot_message=bot_message)
+            if not finished:
+                transaction.set_rollback(True)
+                return None
+        turn.status, turn.bot_message = ChatTurn.DONE, bot_message
+        return bot_message
+    
+    async def acomplete_turn(self, turn, bot_content):
+        return await sync_to_async(self.complete_turn)(turn, bot_content)
+    
+    def find_turn(self, idempotency_key):
+        return (ChatTurn.objects.select_related('user_message', 'bot_message')
+                .filter(session=self, idempotency_key=idempotency_key).first())
+    
+    async def afind_turn(self, idempotency_key):
+        return await sync_to_async(self.find_turn)(idempotency_key)
+    
+    def history_window(self, limit=None, until_id=None):
+        """Newest-first sender/content rows for the last `limit` messages.
+        
+        Served from the (session, timestamp) index with a LIMIT, so the cost
+        does not depend on how long the session is. Callers reverse the rows
+        to get chronological order. `until_id` ends the window at that message.
+        """
+        if limit is None:
+            limit = settings.CHAT_HISTORY_WINDOW
+        messages = self.messages.all()
+        if until_id is not None:
+            messages = messages.filter(id__lte=until_id)
+        return messages.order_by('-timestamp', '-id').values('sender', 'content')[:limit]
 
 class Message(models.Model):
     SENDER_CHOICES = [
@@ -23,3 +169,54 @@ class Message(models.Model):
     
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['session', 'timestamp'], name='chat_msg_session_ts_idx'),
+        ]
+
+class ChatTurn(models.Model):
+    """A user/bot exchange, keyed by the client's Idempotency-Key.
+    
+    In queue mode (CHAT_TURN_QUEUE) the turn is created pending with only the
+    user message, and a run_turn_workers process fills in bot_message.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    
+    session = models.ForeignKey(ChatSession, related_name='turns', on_delete=models.CASCADE)
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True)
+    user_message = models.ForeignKey(Message, related_name='+', on_delete=models.CASCADE)
+    bot_message = models.ForeignKey(Message, related_name='+', on_delete=models.CASCADE, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=DONE)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'idempotency_key'], name='chat_turn_session_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'id'], name='chat_turn_status_idx'),
+        ]
+
+class CrisisFlag(models.Model):
+    """A user message that matched the crisis lexicon and got the crisis resources instead of an AI reply"""
+    session = models.ForeignKey(ChatSession, related_name='crisis_flags', on_delete=models.CASCADE)
+    message = models.ForeignKey(Message, related_name='crisis_flags', on_delete=models.CASCADE)
+    matched_phrase = models.CharField(max_length=50)
+    reviewed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['reviewed', '-created_at'], name='chat_crisis_review_idx'),
+        ]
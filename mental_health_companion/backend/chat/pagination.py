@@ -0,0 +1,8 @@
+from rest_framework.pagination import CursorPagination
+
+class SessionCursorPagination(CursorPagination):
+    """Keyset pagination over a user's sessions, most recently active first"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-last_activity_at', '-id')
@@ -0,0 +1,147 @@
+"""Prompt assembly for Gemini chat turns.
+
+The static part of every prompt (mood system prompt, context line and
+instructions) is compiled once per mood at import time. Each call then only
+adds the summary, the history lines that fit the token budget and the new
+message, and reports how big the result is.
+"""
+import logging
+from collections import namedtuple
+from django.conf import settings
+from llm_router.metrics import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+MOOD_PROMPTS = {
+    'happy': """You are a warm, friendly, and supportive mental health companion. The user is feeling happy! 
+    Respond with genuine enthusiasm and joy. Use emojis, exclamation points, and positive language. 
+    Help them celebrate their happiness and reflect on what's bringing them joy. 
+    Ask engaging questions about their positive experiences. Keep responses under 150 words and very conversational.""",
+    
+    'sad': """You are a compassionate, gentle, and caring mental health companion. The user is feeling sad. 
+    Respond with deep empathy, warmth, and understanding. Use soft, comforting language. 
+    Validate their feelings completely and offer gentle support. Let them know they're not alone. 
+    Ask caring questions to help them express their feelings. Keep responses under 150 words and very nurturing.""",
+    
+    'anxious': """You are a calming, reassuring, and patient mental health companion. The user is feeling anxious. 
+    Respond with a soothing, peaceful tone. Use calming language and gentle reassurance. 
+    Help them feel grounded and safe. Offer simple, practical coping strategies. 
+    Remind them that anxiety is temporary and they can get through this. Keep responses under 150 words and very supportive.""",
+    
+    'angry': """You are an understanding, non-judgmental, and patient mental health companion. The user is feeling angry. 
+    Respond with complete acceptance and understanding. Validate their anger as normal and okay. 
+    Help them process these feelings safely without judgment. Use calm, steady language. 
+    Ask gentle questions to help them explore what's underneath the anger. Keep responses under 150 words and very accepting.""",
+    
+    'stressed': """You are a supportive, understanding, and helpful mental health companion. The user is feeling stressed. 
+    Respond with empathy and practical support. Acknowledge how overwhelming stress can feel. 
+    Offer gentle relaxation techniques and perspective. Use encouraging, hopeful language. 
+    Help them break things down into manageable pieces. Keep responses under 150 words and very encouraging.""",
+    
+    'neutral': """You are a friendly, warm, and engaging mental health companion. 
+    Respond with genuine interest and care. Use a conversational, approachable tone. 
+    Help them explore their feelings and thoughts in a safe space. Ask open-ended questions. 
+    Be curious about their experiences and show that you truly care. Keep responses under 150 words and very personable."""
+}
+INSTRUCTIONS = """Instructions:
+- Build on our previous conversation naturally
+- Respond directly to what they said with genuine understanding
+- Reference previous topics if relevant to show you remember
+- Match their energy level and mood appropriately  
+- Ask thoughtful follow-up questions about their specific situation
+- Use their exact words when reflecting back to show you're listening
+- Be conversational and natural, like a caring friend who remembers what they shared
+- Use emojis sparingly but meaningfully
+- Keep response under 120 words
+- Make each response unique and personalized to their message and our conversation history
+
+Respond now:
+"""
+
+BuiltPrompt = namedtuple('BuiltPrompt', ['text', 'tokens', 'history_messages', 'dropped_messages'])
+
+def _compile_prefix(mood, system_prompt):
+    return f"""
+{system_prompt}
+
+Context: You are chatting with someone who selected "{mood}" as their current mood.
+
+"""
+
+# Static prompt parts, compiled once per mood
+PREFIXES = {mood: _compile_prefix(mood, prompt) for mood, prompt in MOOD_PROMPTS.items()}
+PREFIX_TOKENS = {mood: estimate_tokens(prefix) for mood, prefix in PREFIXES.items()}
+INSTRUCTION_TOKENS = estimate_tokens(INSTRUCTIONS)
+NEW_CONVERSATION = "This is the start of a new conversation."
+# Used when the budget left no room for any of the earlier messages
+EARLIER_MESSAGES_OMITTED = "This conversation is ongoing; earlier messages are not shown."
+# Room for the summary header plus the longest context header
+CONTEXT_HEADER_TOKENS = estimate_tokens("Summary of earlier conversation:") + max(
+    estimate_tokens("Previous conversation context:"), estimate_tokens(EARLIER_MESSAGES_OMITTED)
+)
+
+def _prefix(mood):
+    if mood in PREFIXES:
+        return PREFIXES[mood], PREFIX_TOKENS[mood]
+    # Moods outside MOOD_PROMPTS keep their label but use the neutral system prompt
+    prefix = _compile_prefix(mood, MOOD_PROMPTS.get(mood.lower(), MOOD_PROMPTS['neutral']))
+    return prefix, estimate_tokens(prefix)
+
+def build_prompt(mood, message, conversation_history=None, summary="", token_budget=None):
+    """Assemble the prompt for a turn within `token_budget` estimated tokens.
+    
+    `conversation_history` ends with the current message, as returned by
+    ChatSession.history_window(). The oldest history lines are dropped first,
+    then the summary is shortened, until the prompt fits the budget.
+    """
+    token_budget = token_budget or settings.CHAT_PROMPT_TOKEN_BUDGET
+    prefix, prefix_tokens = _prefix(mood)
+    user_line = f'User just said: "{message}"\n\n'
+    
+    # Previous messages only, capped to the history window
+    previous = []
+    if conversation_history and len(conversation_history) > 1:
+        previous = conversation_history[:-1][-(settings.CHAT_HISTORY_WINDOW - 1):]
+    lines = [
+        f"{'User' if msg['sender'] == 'user' else 'Assistant'}: {msg['content']}\n"
+        for msg in previous
+    ]
+    line_tokens = [estimate_tokens(line) for line in lines]
+    ongoing = bool(previous or summary)
+    
+    fixed = prefix_tokens + INSTRUCTION_TOKENS + CONTEXT_HEADER_TOKENS + estimate_tokens(user_line)
+    available = token_budget - fixed
+    summary_tokens = estimate_tokens(summary) if summary else 0
+    
+    # Drop the oldest history first, then shorten the summary
+    dropped = 0
+    history_tokens = sum(line_tokens)
+    while dropped < len(lines) and history_tokens + summary_tokens > available:
+        history_tokens -= line_tokens[dropped]
+        dropped += 1
+    lines = lines[dropped:]
+    if summary and history_tokens + summary_tokens > available:
+        room = max(available - history_tokens, 0)
+        summary = summary[-room * 4:] if room else ""
+        summary_tokens = estimate_tokens(summary)
+        # Short words and punctuation cost more than 4 characters per token
+        while summary_tokens > room:
+            summary = summary[len(summary) * (summary_tokens - room) // summary_tokens + 1:]
+            summary_tokens = estimate_tokens(summary)
+    
+    if lines:
+        context_block = "Previous conversation context:\n" + "".join(lines)
+    elif ongoing:
+        context_block = EARLIER_MESSAGES_OMITTED
+    else:
+        context_block = NEW_CONVERSATION
+    if summary:
+        context_block = f"Summary of earlier conversation:\n{summary}\n\n{context_block}"
+    
+    text = f"{prefix}{context_block}\n\n{user_line}{INSTRUCTIONS}"
+    tokens = fixed + history_tokens + summary_tokens
+    logger.info(
+        "Gemini prompt: mood=%s tokens=%d budget=%d history=%d dropped=%d",
+        mood, tokens, token_budget, len(lines), dropped,
+    )
+    return BuiltPrompt(text, tokens, len(lines), dropped)
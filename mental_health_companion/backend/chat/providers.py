@@ -0,0 +1,196 @@
+"""Process-wide Gemini client.
+
+The GenerativeServiceClient (and with it the gRPC channel or the pooled
+keep-alive HTTP session for the REST transport) is created once per process
+and reused for every chat turn instead of being rebuilt per message. Every
+call goes through the provider's circuit breaker.
+"""
+import logging
+import threading
+import time
+import google.ai.generativelanguage as glm
+import google.generativeai as genai
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from llm_router import OpenAIProvider, Router, cassette_provider
+from llm_router.metrics import estimate_tokens, metrics
+from llm_router.providers import messages_to_prompt
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+class GeminiProvider:
+    """One configured Gemini model plus its transport, shared across requests"""
+    
+    def __init__(self, api_key, model_name, transport=None, api_endpoint=None,
+                 timeout=None, generation_config=None, breaker=None):
+        client_options = {'api_key': api_key}
+        if api_endpoint:
+            client_options['api_endpoint'] = api_endpoint
+        self.client = glm.GenerativeServiceClient(transport=transport, client_options=client_options)
+        self.model_name = model_name
+        self.name = f'gemini:{model_name}'
+        self.timeout = timeout
+        self.generation_config = glm.GenerationConfig(**(generation_config or {}))
+        self.breaker = breaker or CircuitBreaker(max_timeout=timeout or 60.0)
+    
+    @classmethod
+    def from_settings(cls, model_name=None):
+        return cls(
+            api_key=settings.GEMINI_API_KEY,
+            model_name=model_name or settings.GEMINI_MODEL,
+            transport=settings.GEMINI_TRANSPORT or None,
+            api_endpoint=settings.GEMINI_API_ENDPOINT or None,
+            timeout=settings.GEMINI_TIMEOUT,
+            generation_config=settings.GEMINI_GENERATION_CONFIG,
+            breaker=CircuitBreaker(max_timeout=settings.GEMINI_TIMEOUT, **settings.GEMINI_CIRCUIT_BREAKER),
+        )
+    
+    def _request(self, prompt, generation_config=None):
+        config = glm.GenerationConfig(**generation_config) if generation_config else self.generation_config
+        return glm.GenerateContentRequest(
+            model=self.model_name,
+            contents=[glm.Content(role='user', parts=[glm.Part(text=prompt)])],
+            generation_config=config,
+        )
+    
+    def _admit(self):
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        return time.monotonic()
+    
+    def generate(self, prompt, generation_config=None):
+        """Return the full reply text for `prompt`"""
+        start = self._admit()
+        try:
+            # No client-side retries: the breaker and the fallback reply handle failures
+            response = self.client.generate_content(
+                self._request(prompt, generation_config),
+                retry=None,
+                timeout=self.breaker.current_timeout(),
+            )
+            text = genai.types.GenerateContentResponse.from_response(response).text
+        except Exception as e:
+            self._record(start, prompt, error=e)
+            raise
+        self._record(start, prompt, text)
+        return text
+    
+    def stream(self, prompt, generation_config=None):
+        """Yield reply text chunks for `prompt` as Gemini produces them"""
+        start = self._admit()
+        produced = []
+        try:
+            iterator = self.client.stream_generate_content(
+                self._request(prompt, generation_config),
+                retry=None,
+                timeout=self.breaker.current_timeout(),
+            )
+            for chunk in genai.types.GenerateContentResponse.from_iterator(iterator):
+                produced.append(chunk.text)
+                yield chunk.text
+        except GeneratorExit as e:
+            # The consumer stopped reading (e.g. the socket closed) before the stream ended
+            self._record(start, prompt, ''.join(produced), error=e, cancelled=True)
+            raise
+        except Exception as e:
+            self._record(start, prompt, ''.join(produced), error=e)
+            raise
+        self._record(start, prompt, ''.join(produced))
+    
+    def _record(self, start, prompt, text='', error=None, cancelled=False):
+        """Feed the call's outcome to the circuit breaker and the LLM metrics"""
+        latency = time.monotonic() - start
+        if cancelled:
+            self.breaker.record_cancelled()
+        elif error is None:
+            self.breaker.record_success(latency)
+        else:
+            self.breaker.record_failure(latency)
+        # This API version reports no token usage, so sizes are estimated
+        metrics.record_call(self.name, latency, estimate_tokens(prompt), estimate_tokens(text), error)
+    
+    def complete(self, messages, max_tokens=None):
+        """llm_router provider interface"""
+        generation_config = None
+        if max_tokens:
+            generation_config = {**settings.GEMINI_GENERATION_CONFIG, 'max_output_tokens': max_tokens}
+        return self.generate(messages_to_prompt(messages), generation_config)
+    
+    def warm_up(self):
+        """Open the connection ahead of the first chat turn with a cheap token count"""
+        self.client.count_tokens(
+            glm.CountTokensRequest(
+                model=self.model_name,
+                contents=[glm.Content(role='user', parts=[glm.Part(text='hello')])],
+            ),
+            timeout=self.timeout,
+        )
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def get_gemini_provider():
+    """Return the shared GeminiProvider, creating it from settings on first use"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = GeminiProvider.from_settings()
+    return _provider
+
+def reset_gemini_provider():
+    global _provider, _router
+    with _provider_lock:
+        _provider = None
+        _router = None
+
+_router = None
+
+def get_chat_router():
+    """Return the shared Router: Gemini primary, optional fast model and OpenAI hedge.
+    
+    With LLM_CASSETTE set, every provider records to or replays from the cassette.
+    """
+    global _router
+    if _router is None:
+        primary = get_gemini_provider()
+        with _provider_lock:
+            if _router is None:
+                options = dict(settings.AI_ROUTING)
+                # A hedged turn holds two pool threads, so leave room for every admitted turn to hedge
+                options.setdefault('max_workers', 2 * settings.AI_ADMISSION['max_concurrent'])
+                fast_model = options.pop('fast_model', '')
+                
+                def wrap(name, factory):
+                    return cassette_provider(name, factory, **settings.LLM_CASSETTE)
+                
+                hedge = None
+                if options.pop('hedge', True) and settings.OPENAI_API_KEY:
+                    hedge = wrap(f'openai:{settings.OPENAI_MODEL}', _openai_hedge)
+                fast = None
+                if fast_model:
+                    fast = wrap(f'gemini:{fast_model}', lambda: GeminiProvider.from_settings(model_name=fast_model))
+                _router = Router(wrap(primary.name, lambda: primary), fast=fast, hedge=hedge, **options)
+    return _router
+
+def _openai_hedge():
+    try:
+        return OpenAIProvider(settings.OPENAI_API_KEY, settings.OPENAI_MODEL, timeout=settings.GEMINI_TIMEOUT)
+    except RuntimeError as e:
+        logger.info(f"OpenAI hedge provider unavailable: {e}")
+        return None
+
+def warm_up_gemini():
+    """Create the provider and open its connection; failures are only logged"""
+    try:
+        get_gemini_provider().warm_up()
+        logger.info("Gemini provider warmed up")
+    except Exception as e:
+        logger.warning(f"Gemini warm-up failed: {type(e).__name__} - {e}")
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting.startswith(('GEMINI_', 'OPENAI_', 'AI_ROUTING', 'LLM_CASSETTE')):
+        reset_gemini_provider()
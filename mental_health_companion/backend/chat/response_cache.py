@@ -0,0 +1,114 @@
+"""Response cache and single-flight coalescing for Gemini chat turns.
+
+Identical turns (same user, mood, message, recent history and summary) are
+served from the `ai_responses` cache alias, which is a bounded LRU with a TTL.
+When identical turns arrive at the same time, only one of them calls Gemini and
+the others wait for its result. Keys are per user, so a reply is never served
+to someone else whose conversation happens to read the same.
+"""
+import hashlib
+import json
+import threading
+from django.conf import settings
+from django.core.cache import caches
+
+_stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'stores': 0}
+_stats_lock = threading.Lock()
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+def _normalize(text):
+    return " ".join((text or "").split()).casefold()
+
+def response_cache_key(mood, message, conversation_history=None, summary="", user=None):
+    """Hash of the normalized inputs that determine a reply, scoped to `user`"""
+    message = _normalize(message)
+    previous = [
+        (msg['sender'], _normalize(msg['content']))
+        for msg in (conversation_history or [])[:-1]
+    ]
+    # A double-clicked send leaves a copy of the same message in the history
+    while previous and previous[-1] == ('user', message):
+        previous.pop()
+    payload = json.dumps([user, _normalize(mood), message, previous, _normalize(summary)])
+    return 'ai-response:' + hashlib.sha256(payload.encode()).hexdigest()
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+    
+    def do(self, key, fn):
+        """Run fn() once per in-flight key; returns (result, shared)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+_flight = SingleFlight()
+
+def get_cached(key):
+    value = caches[settings.AI_RESPONSE_CACHE].get(key)
+    _count('hits' if value is not None else 'misses')
+    return value
+
+def store(key, value):
+    caches[settings.AI_RESPONSE_CACHE].set(key, value)
+    _count('stores')
+
+def cached_ai_response(key, compute):
+    """Return the cached reply for `key`, or compute it once for all concurrent callers.
+    
+    `compute` returns the reply text, or None (or raises) when the caller
+    should fall back; errors reach every coalesced caller and nothing is cached.
+    """
+    value = get_cached(key)
+    if value is not None:
+        return value
+    
+    def compute_and_store():
+        result = compute()
+        if result is not None:
+            store(key, result)
+        return result
+    
+    value, shared = _flight.do(key, compute_and_store)
+    if shared:
+        _count('coalesced')
+    return value
+
+def response_cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    stats['saved_calls'] = stats['hits'] + stats['coalesced']
+    return stats
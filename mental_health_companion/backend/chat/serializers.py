@@ -14,3 +14,12 @@ class ChatSessionSerializer(serializers.ModelSerializer):
         model = ChatSession
         fields = ('id', 'mood', 'created_at', 'updated_at', 'messages')
         read_only_fields = ('id', 'created_at', 'updated_at')
+
+class ChatSessionListSerializer(serializers.ModelSerializer):
+    """Sidebar view of a session: no nested messages, just count and preview"""
+    last_message = serializers.CharField(source='last_message_preview', read_only=True)
+    
+    class Meta:
+        model = ChatSession
+        fields = ('id', 'mood', 'created_at', 'updated_at', 'last_activity_at', 'message_count', 'last_message')
+        read_only_fields = fields
@@ -0,0 +1,64 @@
+import logging
+import threading
+from django.conf import settings
+from django.db import close_old_connections
+from .models import ChatSession, Message
+from .ai_service import summarize_conversation, get_ai_executor
+
+logger = logging.getLogger(__name__)
+
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+def update_session_summary(session_id):
+    """Fold messages that have left the history window into ChatSession.summary.
+    
+    Only runs once at least CHAT_SUMMARY_BATCH messages have aged out, and
+    writes with a compare-and-set on summary_until_id so concurrent updates
+    for the same session cannot clobber each other.
+    """
+    session = ChatSession.objects.filter(id=session_id).values('summary', 'summary_until_id').first()
+    if session is None:
+        return False
+    
+    # Oldest message still inside the window; everything before it has aged out
+    boundary = list(
+        Message.objects.filter(session_id=session_id)
+        .order_by('-timestamp', '-id')
+        .values_list('id', flat=True)[settings.CHAT_HISTORY_WINDOW - 1:settings.CHAT_HISTORY_WINDOW]
+    )
+    if not boundary:
+        return False
+    
+    aged_out = list(
+        Message.objects.filter(
+            session_id=session_id,
+            id__gt=session['summary_until_id'],
+            id__lt=boundary[0],
+        ).order_by('id').values('id', 'sender', 'content')
+    )
+    if len(aged_out) < settings.CHAT_SUMMARY_BATCH:
+        return False
+    
+    summary = summarize_conversation(session['summary'], aged_out)
+    return ChatSession.objects.filter(
+        id=session_id, summary_until_id=session['summary_until_id']
+    ).update(summary=summary, summary_until_id=aged_out[-1]['id']) == 1
+
+def _run_update(session_id):
+    try:
+        update_session_summary(session_id)
+    except Exception:
+        logger.exception("Updating summary for chat session %s failed", session_id)
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(session_id)
+        close_old_connections()
+
+def schedule_summary_update(session_id):
+    """Run update_session_summary in the background, at most once per session at a time"""
+    with _in_flight_lock:
+        if session_id in _in_flight:
+            return
+        _in_flight.add(session_id)
+    get_ai_executor().submit(_run_update, session_id)
@@ -0,0 +1,1049 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+from unittest import mock
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import DatabaseError, connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from authentication.models import User
+from llm_router import CRISIS_RESPONSE, Cassette, Router, TokenBucket, detect_crisis
+from llm_router import providers as llm_providers
+from llm_router.metrics import metrics
+from mood.models import MoodEntry
+from .admission import AdmissionController
+from .circuit_breaker import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+from .ai_service import FallbackReply, detect_topic, get_ai_response, get_friendly_fallback_response
+from .fake_gemini import FakeGeminiServer
+from .middleware import TokenAuthMiddleware
+from .models import ChatSession, ChatTurn, CrisisFlag, Message
+from .prompts import EARLIER_MESSAGES_OMITTED, NEW_CONVERSATION, build_prompt, estimate_tokens
+from .providers import get_chat_router, get_gemini_provider
+from .response_cache import SingleFlight
+from .routing import websocket_urlpatterns
+from .summary import update_session_summary
+from .turn_queue import _claim, claim_next_turn, process_turn, run_worker
+
+@override_settings(CHAT_HISTORY_WINDOW=7)
+class HistoryWindowTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='sam', email='sam@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def make_session(self, size):
+        session = ChatSession.objects.create(user=self.user, mood='neutral')
+        Message.objects.bulk_create(
+            Message(session=session, sender='user' if i % 2 else 'bot', content=f"message {i}")
+            for i in range(size)
+        )
+        return session
+    
+    def send_turn(self, session):
+        """Run one turn and return (queries, peak bytes, history passed to the AI)"""
+        captured = {}
+        
+        async def fake_ai(mood, message, history, summary='', user=None):
+            captured['history'] = history
+            return "Thanks for telling me more about that."
+        
+        with mock.patch('chat.views.aget_ai_response', fake_ai), \
+                mock.patch('chat.views.schedule_summary_update'), \
+                CaptureQueriesContext(connection) as queries:
+            tracemalloc.start()
+            response = self.client.post(
+                f'/api/chat/sessions/{session.id}/message/', {'message': 'hello'}, format='json'
+            )
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        self.assertEqual(response.status_code, 200)
+        return len(queries), peak, captured['history']
+    
+    def test_turn_cost_is_flat_in_session_length(self):
+        small_queries, small_peak, small_history = self.send_turn(self.make_session(10))
+        large_queries, large_peak, large_history = self.send_turn(self.make_session(100_000))
+        
+        self.assertEqual(small_queries, large_queries)
+        self.assertLess(large_peak, small_peak * 2)
+        self.assertEqual(len(small_history), 7)
+        self.assertEqual(len(large_history), 7)
+        self.assertEqual(large_history[-1], {'sender': 'user', 'content': 'hello'})
+        self.assertEqual(large_history[0]['content'], 'message 99994')
+    
+    def test_history_query_is_limited(self):
+        session = self.make_session(10)
+        with CaptureQueriesContext(connection) as queries:
+            list(session.history_window())
+        self.assertIn('LIMIT 7', queries[0]['sql'])
+    
+    @override_settings(CHAT_HISTORY_WINDOW=1)
+    def test_window_of_one_sends_only_the_new_message(self):
+        _, _, history = self.send_turn(self.make_session(10))
+        self.assertEqual(history, [{'sender': 'user', 'content': 'hello'}])
+
+
+
+@override_settings(CHAT_HISTORY_WINDOW=7)
+class PromptBuilderTests(TestCase):
+    def setUp(self):
+        self.history = [
+            {'sender': 'user' if i % 2 else 'bot', 'content': f"message {i} " + "about my week " * 5}
+            for i in range(6)
+        ] + [{'sender': 'user', 'content': 'what should I do?'}]
+        self.full = build_prompt('sad', 'what should I do?', self.history, token_budget=10_000)
+    
+    def test_oldest_history_is_dropped_to_fit_the_budget(self):
+        self.assertEqual((self.full.history_messages, self.full.dropped_messages), (6, 0))
+        line_tokens = estimate_tokens("Assistant: " + self.history[0]['content'] + "\n")
+        
+        prompt = build_prompt('sad', 'what should I do?', self.history, token_budget=self.full.tokens - line_tokens)
+        self.assertLessEqual(prompt.tokens, self.full.tokens - line_tokens)
+        self.assertEqual((prompt.history_messages, prompt.dropped_messages), (5, 1))
+        self.assertNotIn('message 0', prompt.text)
+        self.assertIn('message 5', prompt.text)
+    
+    def test_summary_is_shortened_after_all_history_is_dropped(self):
+        summary = "The user talked about exams. " * 20 + "Most recently they mentioned their sister."
+        # Room for about ten summary tokens and none of the history lines
+        budget = build_prompt('sad', 'what should I do?', self.history[-1:]).tokens + 10
+        prompt = build_prompt('sad', 'what should I do?', self.history, summary, token_budget=budget)
+        
+        self.assertLessEqual(prompt.tokens, budget)
+        self.assertEqual((prompt.history_messages, prompt.dropped_messages), (0, 6))
+        self.assertIn('their sister.', prompt.text)
+        self.assertNotIn(summary, prompt.text)
+    
+    def test_only_a_session_without_messages_is_a_new_conversation(self):
+        first = build_prompt('sad', 'hi', [{'sender': 'user', 'content': 'hi'}])
+        self.assertIn(NEW_CONVERSATION, first.text)
+        
+        trimmed = build_prompt('sad', 'what should I do?', self.history, token_budget=1)
+        self.assertEqual(trimmed.history_messages, 0)
+        self.assertNotIn(NEW_CONVERSATION, trimmed.text)
+        self.assertIn(EARLIER_MESSAGES_OMITTED, trimmed.text)
+
+class AsyncChatViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='sam', email='sam@example.com', password='pw')
+        self.token = Token.objects.create(user=self.user)
+        self.client = AsyncClient()
+    
+    def post(self, url, data):
+        return self.client.post(url, data, content_type='application/json',
+                                headers={'Authorization': f'Token {self.token.key}'})
+    
+    async def test_create_session_records_mood_and_greets(self):
+        response = await self.post('/api/chat/sessions/create/', {'mood': 'anxious'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['mood'], 'anxious')
+        self.assertEqual(len(response.json()['messages']), 1)
+        self.assertTrue(await MoodEntry.objects.filter(user=self.user, mood='anxious').aexists())
+    
+    async def test_turns_wait_on_the_ai_concurrently(self):
+        sessions = [await ChatSession.objects.acreate(user=self.user, mood='neutral') for _ in range(2)]
+        in_flight = []
+        both_waiting = asyncio.Event()
+        
+        async def fake_ai(mood, message, history, summary='', user=None):
+            in_flight.append(message)
+            if len(in_flight) == 2:
+                both_waiting.set()
+            # Only returns once the other turn is also waiting on the AI
+            await asyncio.wait_for(both_waiting.wait(), timeout=5)
+            return f"Reply to {message}"
+        
+        with mock.patch('chat.views.aget_ai_response', fake_ai), mock.patch('chat.views.schedule_summary_update'):
+            responses = await asyncio.gather(*(
+                self.post(f'/api/chat/sessions/{session.id}/message/', {'message': f'turn {i}'})
+                for i, session in enumerate(sessions)
+            ))
+        self.assertEqual([r.status_code for r in responses], [200, 200])
+        self.assertEqual(sorted(in_flight), ['turn 0', 'turn 1'])
+        self.assertEqual([r.json()['bot_message']['content'] for r in responses], ['Reply to turn 0', 'Reply to turn 1'])
+
+@override_settings(CHAT_HISTORY_WINDOW=7)
+class TurnPersistenceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='sam', email='sam@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.session = ChatSession.objects.create(user=self.user, mood='anxious')
+        self.calls = []
+        
+        async def fake_ai(mood, message, history, summary='', user=None):
+            self.calls.append(message)
+            return "Let's take a slow breath together."
+        
+        for target, replacement in (('chat.views.aget_ai_response', fake_ai),
+                                    ('chat.views.schedule_summary_update', mock.DEFAULT)):
+            patcher = mock.patch(target, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def send(self, key=None):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post(f'/api/chat/sessions/{self.session.id}/message/',
+                                {'message': 'exam tomorrow'}, format='json', **headers)
+    
+    def test_reply_is_saved_with_its_turn(self):
+        response = self.send()
+        self.assertEqual(response.status_code, 200)
+        turn = ChatTurn.objects.get()
+        self.assertEqual((turn.status, turn.bot_message_id), (ChatTurn.DONE, response.data['bot_message']['id']))
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.message_count, 2)
+    
+    def test_user_message_is_saved_before_the_ai_call(self):
+        async def failing_ai(mood, message, history, summary='', user=None):
+            self.calls.append(await self.session.messages.acount())
+            raise RuntimeError("AI executor is shut down")
+        
+        with mock.patch('chat.views.aget_ai_response', failing_ai), self.assertRaises(RuntimeError):
+            self.send(key='turn-3')
+        self.assertEqual(self.calls, [1])
+        turn = ChatTurn.objects.get(idempotency_key='turn-3')
+        self.assertEqual((turn.status, turn.user_message.content), (ChatTurn.FAILED, 'exam tomorrow'))
+    
+    def test_retry_during_the_first_attempt_waits_instead_of_calling_ai(self):
+        turn, _ = self.session.enqueue_turn('exam tomorrow', 'turn-4', running=True)
+        retry = self.send(key='turn-4')
+        self.assertEqual(self.calls, [])
+        self.assertEqual(retry.status_code, 202)
+        self.assertEqual(retry['Location'], f'/api/chat/turns/{turn.id}/')
+        self.assertEqual(self.session.messages.count(), 1)
+    
+    def test_completing_a_turn_updates_it_once(self):
+        turn, _ = self.session.enqueue_turn('exam tomorrow', running=True)
+        with CaptureQueriesContext(connection) as queries:
+            bot_message = self.session.complete_turn(turn, "You've prepared well.")
+        turn_updates = [q for q in queries if q['sql'].startswith('UPDATE "chat_chatturn"')]
+        self.assertEqual(len(turn_updates), 1)
+        turn.refresh_from_db()
+        self.assertEqual((turn.status, turn.bot_message_id), (ChatTurn.DONE, bot_message.id))
+        
+        # A turn that lost its claim keeps no reply
+        lost, _ = self.session.enqueue_turn('and a quiz', running=True)
+        ChatTurn.objects.filter(id=lost.id).update(status=ChatTurn.FAILED)
+        self.assertIsNone(self.session.complete_turn(lost, "Too late."))
+        self.assertFalse(self.session.messages.filter(content="Too late.").exists())
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.message_count, 3)
+    
+    def test_retried_turn_is_replayed_without_calling_ai(self):
+        first = self.send(key='turn-1')
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.send(key='turn-1')
+        
+        self.assertEqual(self.calls, ['exam tomorrow'])
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data['bot_message'], first.data['bot_message'])
+        self.assertEqual(self.session.messages.count(), 2)
+    
+    def test_concurrent_duplicate_key_keeps_the_first_turn(self):
+        first = self.send(key='turn-2')
+        user_msg, bot_msg, replayed = self.session.record_turn('exam tomorrow', 'different reply', 'turn-2')
+        self.assertTrue(replayed)
+        self.assertEqual(bot_msg.id, first.data['bot_message']['id'])
+        self.assertEqual(self.session.messages.count(), 2)
+
+
+@override_settings(CHAT_TURN_QUEUE=True, GEMINI_API_KEY='')
+class TurnQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='sam', email='sam@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.session = ChatSession.objects.create(user=self.user, mood='sad')
+    
+    def send(self, text):
+        return self.client.post(f'/api/chat/sessions/{self.session.id}/message/', {'message': text}, format='json')
+    
+    def test_turn_is_queued_then_answered_by_worker(self):
+        with mock.patch('chat.views.aget_ai_response') as ai:
+            queued = self.send('I feel low today')
+        ai.assert_not_called()
+        self.assertEqual(queued.status_code, 202)
+        self.assertEqual(queued.data['status'], ChatTurn.PENDING)
+        self.assertEqual(queued['Location'], f"/api/chat/turns/{queued.data['turn_id']}/")
+        self.assertEqual(self.client.get(queued['Location']).status_code, 202)
+        
+        with mock.patch('chat.turn_queue.get_ai_response', return_value="I'm here with you.") as ai:
+            self.assertEqual(run_worker(once=True), 1)
+        history = ai.call_args.args[2]
+        self.assertEqual(history[-1], {'sender': 'user', 'content': 'I feel low today'})
+        
+        done = self.client.get(queued['Location'], {'wait': 5})
+        self.assertEqual(done.status_code, 200)
+        self.assertEqual(done.data['status'], ChatTurn.DONE)
+        self.assertEqual(done.data['bot_message']['content'], "I'm here with you.")
+    
+    def test_invalid_wait_is_rejected(self):
+        queued = self.send('I feel low today')
+        for wait in ('nan', 'inf', '-1', 'abc'):
+            self.assertEqual(self.client.get(queued['Location'], {'wait': wait}).status_code, 400, wait)
+    
+    def test_one_running_turn_per_session_and_expired_leases_are_reclaimed(self):
+        self.send('first')
+        self.send('second')
+        first = claim_next_turn()
+        self.assertEqual(first.user_message.content, 'first')
+        self.assertIsNone(claim_next_turn())
+        
+        ChatTurn.objects.filter(id=first.id).update(claimed_at=first.claimed_at - timedelta(hours=1))
+        reclaimed = claim_next_turn()
+        self.assertEqual(reclaimed.id, first.id)
+        self.assertEqual(reclaimed.attempts, 2)
+        # The worker that lost the lease cannot finish the turn
+        self.assertFalse(process_turn(first))
+        self.assertTrue(process_turn(reclaimed))
+        self.assertEqual(self.session.messages.filter(sender='bot').count(), 1)
+    
+    def test_only_the_oldest_pending_turn_of_each_session_is_claimed(self):
+        other = ChatSession.objects.create(user=self.user, mood='happy')
+        first, _ = self.session.enqueue_turn('first')
+        second, _ = self.session.enqueue_turn('second')
+        elsewhere, _ = other.enqueue_turn('elsewhere')
+        
+        self.assertEqual(claim_next_turn().id, first.id)
+        self.assertEqual(claim_next_turn().id, elsewhere.id)
+        self.assertIsNone(claim_next_turn())
+        # A worker that lost the race for `first` cannot take `second` while `first` runs
+        self.assertEqual(_claim(second.id, self.session.id, timezone.now()), 0)
+    
+    def test_turn_that_keeps_timing_out_fails_after_max_attempts(self):
+        queued = self.send('are you there?')
+        max_attempts = settings.CHAT_TURN_WORKERS['max_attempts']
+        ChatTurn.objects.filter(id=queued.data['turn_id']).update(
+            status=ChatTurn.RUNNING, attempts=max_attempts, claimed_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertIsNone(claim_next_turn())
+        
+        failed = self.client.get(queued['Location'])
+        self.assertEqual(failed.status_code, 503)
+        self.assertEqual(failed.data['status'], ChatTurn.FAILED)
+        self.assertEqual(failed.data['user_message']['content'], 'are you there?')
+        self.assertTrue(failed.data['error'])
+
+class SingleFlightTests(TestCase):
+    def run_concurrently(self, fn, callers=5):
+        """Call flight.do('key', fn) from `callers` threads while fn is still running"""
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        results = []
+        
+        def leader_fn():
+            started.set()
+            release.wait(5)
+            return fn()
+        
+        def call():
+            try:
+                results.append(flight.do('key', leader_fn))
+            except Exception as e:
+                results.append(e)
+        
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.1)  # let the followers reach the wait
+        release.set()
+        for thread in threads:
+            thread.join()
+        return results
+    
+    def test_concurrent_callers_share_one_call(self):
+        calls = []
+        results = self.run_concurrently(lambda: calls.append(1) or "One reply for everyone.")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results, key=lambda r: r[1]),
+                         [("One reply for everyone.", False)] + [("One reply for everyone.", True)] * 4)
+    
+    def test_leader_exception_reaches_every_caller(self):
+        error = RuntimeError("Gemini is down")
+        
+        def fail():
+            raise error
+        
+        self.assertEqual(self.run_concurrently(fail), [error] * 5)
+
+@override_settings(GEMINI_API_KEY='fake')
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        caches[settings.AI_RESPONSE_CACHE].clear()
+        self.calls = []
+        
+        def fake_generate(mood, message, conversation_history=None, summary="", user=None):
+            self.calls.append(user)
+            return f"A thoughtful reply for user {user}."
+        
+        patcher = mock.patch('chat.ai_service._admitted_response', fake_generate)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.admin = APIClient()
+        self.admin.force_authenticate(User.objects.create_user(
+            username='admin', email='admin@example.com', password='pw', is_staff=True
+        ))
+    
+    def stats(self):
+        return self.admin.get('/api/chat/ai/stats/').data['response_cache']
+    
+    def test_hits_misses_and_stores_are_counted(self):
+        before = self.stats()
+        first = get_ai_response('sad', "I can't sleep", user=1)
+        self.assertEqual(get_ai_response('sad', "  i can't   SLEEP ", user=1), first)
+        after = self.stats()
+        
+        self.assertEqual(self.calls, [1])
+        for name, delta in (('hits', 1), ('misses', 1), ('stores', 1), ('saved_calls', 1)):
+            self.assertEqual(after[name] - before[name], delta, name)
+    
+    def test_replies_are_not_shared_across_users(self):
+        self.assertEqual(get_ai_response('sad', "I can't sleep", user=1), "A thoughtful reply for user 1.")
+        self.assertEqual(get_ai_response('sad', "I can't sleep", user=2), "A thoughtful reply for user 2.")
+        self.assertEqual(self.calls, [1, 2])
+    
+    def test_fallback_replies_are_not_cached(self):
+        with mock.patch('chat.ai_service._admitted_response', side_effect=FallbackReply('provider_error')):
+            get_ai_response('sad', "I can't sleep", user=1)
+        self.assertEqual(get_ai_response('sad', "I can't sleep", user=1), "A thoughtful reply for user 1.")
+    
+    def test_stats_are_staff_only(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='sam', email='sam@example.com', password='pw'))
+        self.assertEqual(client.get('/api/chat/ai/stats/').status_code, 403)
+    
+    @override_settings(GEMINI_API_KEY='')
+    def test_stats_without_an_api_key_report_no_provider(self):
+        with mock.patch('chat.views.get_gemini_provider', side_effect=AssertionError("provider built")):
+            response = self.admin.get('/api/chat/ai/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['gemini_breaker'])
+        self.assertIsNone(response.data['routing'])
+        self.assertIn('active', response.data['admission'])
+
+@override_settings(CHAT_HISTORY_WINDOW=4, CHAT_SUMMARY_BATCH=2, GEMINI_API_KEY='')
+class RollingSummaryTests(TestCase):
+    def test_aged_out_messages_are_folded_once(self):
+        user = User.objects.create_user(username='sam', email='sam@example.com', password='pw')
+        session = ChatSession.objects.create(user=user, mood='sad')
+        messages = [
+            Message.objects.create(session=session, sender='user' if i % 2 else 'bot', content=f"message {i}")
+            for i in range(7)
+        ]
+        
+        self.assertTrue(update_session_summary(session.id))
+        session.refresh_from_db()
+        self.assertEqual(session.summary_until_id, messages[2].id)
+        self.assertIn('message 1', session.summary)
+        
+        # Nothing new has aged out yet
+        self.assertFalse(update_session_summary(session.id))
+
+
+class FallbackTopicTests(TestCase):
+    def test_topics_match_whole_words_only(self):
+        self.assertIsNone(detect_topic("We won the contest at the fair"))
+        self.assertIsNone(detect_topic("The networking event was fun"))
+        self.assertEqual(detect_topic("Two tests and my homework, ugh."), 'school')
+        self.assertEqual(detect_topic("My PARENTS keep fighting"), 'family')
+        self.assertEqual(detect_topic("The doctor's office called"), 'work')
+        self.assertEqual(detect_topic("My mom’s birthday is coming up"), 'family')
+        self.assertEqual(detect_topic("Studying late… again"), 'school')
+        # ASCII and non-ASCII messages split into the same words
+        self.assertEqual(detect_topic("my_boss said\tstudy-time!"), 'school')
+        self.assertEqual(detect_topic("my_boss said\tstudy-time… "), 'school')
+    
+    def test_highest_priority_topic_wins(self):
+        self.assertEqual(detect_topic("I'm tired and my mom is sick"), 'family')
+        self.assertEqual(detect_topic("Paying bills while studying"), 'school')
+    
+    def test_fallback_reply_reflects_topic(self):
+        reply = get_friendly_fallback_response('stressed', "so many bills and debt this month")
+        self.assertTrue(reply.startswith("Financial stress can be really overwhelming."))
+        reply = get_friendly_fallback_response('stressed', "we won the contest today")
+        self.assertTrue(reply.startswith("It sounds like you have a lot on your plate"))
+
+class CrisisFastPathTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='sam', email='sam@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.session = ChatSession.objects.create(user=self.user, mood='sad')
+        patcher = mock.patch('chat.views.schedule_summary_update')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_lexicon_matches_whole_phrases(self):
+        self.assertEqual(detect_crisis("Sometimes I want to KILL  myself"), 'kill  myself')
+        self.assertEqual(detect_crisis("I've been self-harming again"), 'self-harming')
+        self.assertEqual(detect_crisis("feeling suicidal."), 'suicidal')
+        self.assertIsNone(detect_crisis("I use pesticide in the garden"))
+        self.assertIsNone(detect_crisis("My skills myself are improving"))
+        self.assertIsNone(detect_crisis("exam tomorrow"))
+    
+    @override_settings(AI_RATE_LIMIT={'per_minute': 60, 'burst': 1, 'cache': 'default'})
+    def test_crisis_message_skips_ai_and_rate_limit_and_is_flagged(self):
+        url = f'/api/chat/sessions/{self.session.id}/message/'
+        with mock.patch('chat.views.aget_ai_response', return_value='Tell me more.') as ai:
+            self.client.post(url, {'message': 'hi'}, format='json')
+            response = self.client.post(url, {'message': "I don't want to live, I want to end my life"}, format='json')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['crisis'])
+        self.assertEqual(response.data['bot_message']['content'], CRISIS_RESPONSE)
+        self.assertEqual(ai.call_count, 1)
+        flag = CrisisFlag.objects.get()
+        self.assertEqual((flag.matched_phrase, flag.message_id), ('end my life', response.data['user_message']['id']))
+    
+    def test_crisis_resources_are_sent_even_if_the_turn_cannot_be_saved(self):
+        url = f'/api/chat/sessions/{self.session.id}/message/'
+        with mock.patch.object(ChatSession, 'record_turn', side_effect=DatabaseError("disk full")), \
+                self.assertLogs('chat.models', 'ERROR'):
+            response = self.client.post(url, {'message': "I want to end my life"}, format='json')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['crisis'])
+        self.assertEqual(response.data['bot_message']['content'], CRISIS_RESPONSE)
+        self.assertFalse(Message.objects.exists())
+
+class GeminiProviderSingletonTests(TestCase):
+    @override_settings(GEMINI_API_KEY='fake', GEMINI_TRANSPORT='rest')
+    def test_one_provider_per_process_until_settings_change(self):
+        seen = []
+        threads = [threading.Thread(target=lambda: seen.append(get_gemini_provider())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        provider = get_gemini_provider()
+        self.assertTrue(all(p is provider for p in seen))
+        self.assertIs(get_chat_router().primary, provider)
+        
+        with override_settings(GEMINI_MODEL='models/gemini-test'):
+            changed = get_gemini_provider()
+            self.assertIsNot(changed, provider)
+            self.assertEqual(changed.model_name, 'models/gemini-test')
+        self.assertEqual(get_gemini_provider().model_name, settings.GEMINI_MODEL)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+class CircuitBreakerTests(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(
+            window=10, min_calls=4, failure_rate=0.5, slow_call_seconds=5.0, open_seconds=30.0,
+            min_timeout=1.0, max_timeout=20.0, timeout_multiplier=2.0, clock=self.clock,
+        )
+    
+    def test_opens_on_errors_and_recovers_through_half_open_probe(self):
+        for _ in range(2):
+            self.breaker.record_success(0.5)
+        for _ in range(2):
+            self.breaker.record_failure(0.5)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow_request())
+        
+        self.clock.now += 30
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())  # only one probe at a time
+        self.breaker.record_success(0.5)
+        self.assertEqual(self.breaker.state, CLOSED)
+    
+    def test_failed_probe_reopens(self):
+        for _ in range(4):
+            self.breaker.record_failure(0.1)
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure(0.1)
+        self.assertEqual(self.breaker.state, OPEN)
+    
+    def test_slow_calls_count_as_failures(self):
+        for _ in range(4):
+            self.breaker.record_success(6.0)
+        self.assertEqual(self.breaker.state, OPEN)
+    
+    def test_cancelled_probe_frees_its_slot(self):
+        for _ in range(4):
+            self.breaker.record_failure(0.1)
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_cancelled()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow_request())
+    
+    def test_timeout_tracks_p95_latency(self):
+        self.assertEqual(self.breaker.current_timeout(), 20.0)
+        for latency in (0.2, 0.4, 0.6, 0.8, 1.5):
+            self.breaker.record_success(latency)
+        self.assertEqual(self.breaker.current_timeout(), 3.0)
+
+class CircuitBreakerFakeProviderTests(TestCase):
+    def setUp(self):
+        self.server = FakeGeminiServer(latency=0.0).start()
+        self.addCleanup(self.server.stop)
+        settings = override_settings(
+            GEMINI_API_KEY='fake', GEMINI_TRANSPORT='rest', GEMINI_API_ENDPOINT=self.server.url,
+            GEMINI_TIMEOUT=0.5,
+            GEMINI_CIRCUIT_BREAKER={'window': 10, 'min_calls': 3, 'open_seconds': 60, 'min_timeout': 0.2},
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+    
+    def test_failing_provider_trips_breaker_and_serves_fallback(self):
+        self.server.mode = 'fail'
+        for i in range(3):
+            get_ai_response('neutral', f"failing turn {i}")
+        self.assertEqual(get_gemini_provider().breaker.state, OPEN)
+        
+        calls = self.server.requests
+        reply = get_ai_response('neutral', "are you there?")
+        self.assertTrue(reply)
+        self.assertEqual(self.server.requests, calls)
+    
+    def test_abandoned_stream_releases_the_half_open_probe(self):
+        metrics.reset()
+        provider = get_gemini_provider()
+        clock = FakeClock()
+        provider.breaker = CircuitBreaker(min_calls=1, open_seconds=30, clock=clock)
+        provider.breaker.record_failure(0.1)
+        clock.now += 30
+        
+        stream = provider.stream("Tell me something kind")
+        self.assertTrue(next(stream))
+        stream.close()
+        self.assertEqual(provider.breaker.state, HALF_OPEN)
+        self.assertTrue(provider.breaker.allow_request())
+        self.assertIn(f'llm_request_errors_total{{model="{provider.name}",error="GeneratorExit"}} 1', metrics.render())
+    
+    def test_stalled_provider_is_cut_off_by_timeout(self):
+        self.server.mode = 'stall'
+        start = time.monotonic()
+        for i in range(3):
+            get_ai_response('neutral', f"stalled turn {i}")
+        self.assertLess(time.monotonic() - start, 3)
+        self.assertEqual(get_gemini_provider().breaker.state, OPEN)
+
+
+@override_settings(METRICS_TOKEN='s3cret')
+class LLMMetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        caches[settings.AI_RESPONSE_CACHE].clear()
+    
+    def test_calls_and_fallbacks_are_exported(self):
+        with FakeGeminiServer(latency=0.0) as server, override_settings(
+                GEMINI_API_KEY='fake', GEMINI_TRANSPORT='rest', GEMINI_API_ENDPOINT=server.url):
+            get_ai_response('happy', "I passed my driving test today")
+            server.mode = 'fail'
+            get_ai_response('happy', "and I celebrated with friends")
+            body = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret').content.decode()
+            model = get_gemini_provider().name
+        
+        self.assertIn(f'llm_requests_total{{model="{model}",outcome="ok"}} 1', body)
+        self.assertIn(f'llm_request_errors_total{{model="{model}",error="InternalServerError"}} 1', body)
+        self.assertIn(f'llm_request_duration_seconds_count{{model="{model}"}} 2', body)
+        self.assertIn(f'llm_request_duration_seconds_bucket{{model="{model}",le="+Inf"}} 2', body)
+        self.assertIn('llm_fallback_replies_total{app="chat",reason="provider_error"} 1', body)
+        self.assertRegex(body, rf'llm_prompt_tokens_total{{model="{model}"}} [1-9]')
+    
+    @override_settings(GEMINI_API_KEY='')
+    def test_metrics_token_is_required(self):
+        get_ai_response('sad', "nobody is configured")
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertIn('llm_fallback_replies_total{app="chat",reason="no_api_key"} 1', response.content.decode())
+    
+    @override_settings(METRICS_TOKEN='')
+    def test_metrics_are_disabled_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 404)
+
+class CassetteReplayTests(TestCase):
+    def setUp(self):
+        caches[settings.AI_RESPONSE_CACHE].clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cassette.json')
+        self.history = [{'sender': 'user', 'content': "I miss my friend"}]
+    
+    def replay(self, **options):
+        caches[settings.AI_RESPONSE_CACHE].clear()
+        cassette = {'mode': 'replay', 'path': self.path, **options}
+        with override_settings(GEMINI_API_KEY='fake', GEMINI_API_ENDPOINT='127.0.0.1:9', LLM_CASSETTE=cassette):
+            return get_ai_response('sad', "I miss my friend", self.history)
+    
+    def test_recorded_turn_replays_offline_with_injected_latency_and_failures(self):
+        with FakeGeminiServer(latency=0.0) as server, override_settings(
+                GEMINI_API_KEY='fake', GEMINI_TRANSPORT='rest', GEMINI_API_ENDPOINT=server.url,
+                LLM_CASSETTE={'mode': 'record', 'path': self.path}):
+            recorded = get_ai_response('sad', "I miss my friend", self.history)
+        self.assertEqual(server.requests, 1)
+        
+        sleeps = []
+        self.assertEqual(self.replay(latency=0.25, sleep=sleeps.append), recorded)
+        self.assertEqual(sleeps, [0.25])
+        
+        # Every replayed call fails, so the turn gets a friendly fallback reply
+        self.assertNotEqual(self.replay(failure_rate=1.0, sleep=sleeps.append), recorded)
+    
+    def test_recorded_calls_are_written_on_flush(self):
+        cassette = Cassette(self.path)
+        for reply in ("First", "Second"):
+            cassette.record('gemini:test', [{'role': 'user', 'content': "hi"}], None, 0.1, response=reply)
+        self.assertFalse(os.path.exists(self.path))
+        
+        cassette.flush()
+        saved = Cassette(self.path)
+        self.assertEqual([entry['response'] for entry in saved.entries], ["First", "Second"])
+
+class FakeProvider:
+    def __init__(self, name, latency=0.0, error=None):
+        self.name = name
+        self.latency = latency
+        self.error = error
+        self.calls = 0
+    
+    def complete(self, messages, max_tokens=None):
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.error:
+            raise self.error
+        return f"Reply from {self.name}"
+
+class RouterTests(TestCase):
+    messages = [{'role': 'user', 'content': "I feel a bit lost today"}]
+    
+    def test_short_turns_go_to_the_fast_model(self):
+        primary, fast = FakeProvider('primary'), FakeProvider('fast')
+        router = Router(primary, fast=fast, short_turn_tokens=40)
+        self.assertEqual(router.complete(self.messages, size=10), "Reply from fast")
+        self.assertEqual(router.complete(self.messages, size=400), "Reply from primary")
+        self.assertEqual((router.stats['calls'], router.stats['fast_routed']), (2, 1))
+    
+    def test_slow_call_is_hedged_and_the_first_reply_wins(self):
+        router = Router(FakeProvider('primary', latency=1.0), hedge=FakeProvider('hedge'),
+                        min_hedge_delay=0.05, max_hedge_delay=0.05)
+        start = time.monotonic()
+        self.assertEqual(router.complete(self.messages), "Reply from hedge")
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual((router.stats['hedged'], router.stats['hedge_wins']), (1, 1))
+    
+    def test_failed_call_fails_over_to_the_backup(self):
+        primary, hedge = FakeProvider('primary', error=RuntimeError("down")), FakeProvider('hedge')
+        router = Router(primary, hedge=hedge)
+        self.assertEqual(router.complete(self.messages), "Reply from hedge")
+        self.assertEqual((router.stats['failovers'], router.stats['hedged']), (1, 0))
+        
+        hedge.error = RuntimeError("also down")
+        with self.assertRaises(RuntimeError):
+            router.complete(self.messages)
+    
+    def test_time_queued_for_a_thread_does_not_trigger_a_hedge(self):
+        hedge = FakeProvider('hedge')
+        router = Router(FakeProvider('primary', latency=0.1), hedge=hedge, max_workers=2,
+                        min_hedge_delay=0.3, max_hedge_delay=0.3)
+        # Both pool threads are busy for longer than the hedge delay
+        for _ in range(2):
+            router._executor.submit(time.sleep, 0.5)
+        self.assertEqual(router.complete(self.messages), "Reply from primary")
+        self.assertEqual((router.stats['hedged'], hedge.calls), (0, 0))
+    
+    @override_settings(GEMINI_API_KEY='fake', AI_ADMISSION={'max_concurrent': 7, 'max_queue': 10, 'max_wait': 1.0})
+    def test_chat_router_pool_fits_a_hedge_per_admitted_turn(self):
+        self.assertEqual(get_chat_router()._executor._max_workers, 14)
+    
+    def test_shared_gemini_provider_calls_have_a_deadline(self):
+        with mock.patch.object(llm_providers, 'genai') as genai:
+            genai.GenerativeModel.return_value.generate_content.return_value.text = " Hello "
+            provider = llm_providers.GeminiProvider('key', timeout=3.0)
+            self.assertEqual(provider.complete(self.messages), "Hello")
+        _, kwargs = genai.GenerativeModel.return_value.generate_content.call_args
+        self.assertEqual(kwargs['request_options'], {'timeout': 3.0})
+
+class AdmissionControllerTests(TestCase):
+    def test_sheds_when_queue_is_full(self):
+        admission = AdmissionController(max_concurrent=1, max_queue=0, max_wait=1.0)
+        self.assertTrue(admission.acquire())
+        self.assertFalse(admission.acquire())
+        admission.release(0.5)
+        self.assertTrue(admission.acquire())
+        self.assertEqual(admission.snapshot()['admitted'], 2)
+        self.assertEqual(admission.snapshot()['shed'], 1)
+    
+    def test_sheds_when_expected_wait_exceeds_deadline(self):
+        admission = AdmissionController(max_concurrent=1, max_queue=10, max_wait=2.0)
+        self.assertTrue(admission.acquire())
+        admission.release(10.0)
+        self.assertTrue(admission.acquire())
+        # One turn ahead taking ~10s: waiting would blow the 2s deadline
+        self.assertFalse(admission.acquire())
+    
+    def test_queued_turn_is_shed_after_max_wait(self):
+        admission = AdmissionController(max_concurrent=1, max_queue=10, max_wait=0.05)
+        self.assertTrue(admission.acquire())
+        self.assertFalse(admission.acquire())
+        self.assertEqual(admission.snapshot()['waiting'], 0)
+    
+    def test_queued_turns_are_granted_round_robin_across_users(self):
+        admission = AdmissionController(max_concurrent=1, max_queue=10, max_wait=5.0)
+        self.assertTrue(admission.acquire('holder'))
+        order = []
+        
+        def turn(user):
+            if admission.acquire(user):
+                order.append(user)
+        
+        threads = []
+        for user in ['heavy'] * 4 + ['light']:
+            thread = threading.Thread(target=turn, args=(user,))
+            thread.start()
+            threads.append(thread)
+            while admission.snapshot()['waiting'] < len(threads):
+                time.sleep(0.001)
+        
+        for granted in range(1, 6):
+            admission.release(0.0)
+            while len(order) < granted:
+                time.sleep(0.001)
+        for thread in threads:
+            thread.join()
+        # FIFO would serve 'light' last, behind all of the heavy user's turns
+        self.assertEqual(order, ['heavy', 'light', 'heavy', 'heavy', 'heavy'])
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.clock = FakeClock()
+        self.bucket = TokenBucket(cache, rate=1.0, capacity=3, clock=self.clock)
+    
+    def test_each_user_gets_burst_then_refill_rate(self):
+        results = {user: [self.bucket.consume(user)[0] for _ in range(5)] for user in range(200)}
+        self.assertTrue(all(r == [True, True, True, False, False] for r in results.values()))
+        
+        allowed, retry_after = self.bucket.consume(7)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 1.0)
+        
+        self.clock.now += 2.5
+        self.assertEqual([self.bucket.consume(7)[0] for _ in range(3)], [True, True, False])
+        # A long idle period refills only up to capacity
+        self.clock.now += 3600
+        self.assertEqual(sum(self.bucket.consume(7)[0] for _ in range(10)), 3)
+    
+    def test_heavy_user_cannot_use_up_everyone_elses_quota(self):
+        served = {'heavy': 0, 'light': 0}
+        for second in range(60):
+            self.clock.now = float(second)
+            for _ in range(50):
+                served['heavy'] += self.bucket.consume('heavy')[0]
+            served['light'] += self.bucket.consume('light')[0]
+        self.assertEqual(served['heavy'], 3 + 59)
+        self.assertEqual(served['light'], 60)
+    
+    @override_settings(AI_RATE_LIMIT={'per_minute': 60, 'burst': 2, 'cache': 'default'})
+    def test_send_message_returns_429_before_calling_ai(self):
+        user = User.objects.create_user(username='sam', email='sam@example.com', password='pw')
+        session = ChatSession.objects.create(user=user, mood='neutral')
+        client = APIClient()
+        client.force_authenticate(user)
+        
+        with mock.patch('chat.views.aget_ai_response', return_value='Tell me more.') as ai, \
+                mock.patch('chat.views.schedule_summary_update'):
+            statuses = [
+                client.post(f'/api/chat/sessions/{session.id}/message/', {'message': 'hi'}, format='json')
+                for _ in range(3)
+            ]
+        self.assertEqual([r.status_code for r in statuses], [200, 200, 429])
+        self.assertEqual(statuses[2]['Retry-After'], '1')
+        self.assertEqual(ai.call_count, 2)
+        self.assertEqual(session.messages.count(), 4)
+
+class SessionListPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sam', email='sam@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def test_list_view_pages_by_cursor_without_messages(self):
+        sessions = [ChatSession.objects.create(user=self.user, mood='neutral') for _ in range(5)]
+        sessions[0].add_messages(('user', 'hello'))
+        other = User.objects.create_user(username='alex', email='alex@example.com', password='pw')
+        ChatSession.objects.create(user=other, mood='sad')
+        
+        page = self.client.get('/api/chat/sessions/', {'view': 'list', 'page_size': 2}).data
+        self.assertNotIn('messages', page['results'][0])
+        seen = [s['id'] for s in page['results']]
+        # A session started mid-scroll must not shift later pages
+        ChatSession.objects.create(user=self.user, mood='happy')
+        while page['next']:
+            page = self.client.get(page['next']).data
+            seen += [s['id'] for s in page['results']]
+        
+        self.assertEqual(seen, [sessions[0].id] + [s.id for s in reversed(sessions[1:])])
+        self.assertEqual(len(self.client.get('/api/chat/sessions/').data), 6)
+
+class SessionMetadataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='sam', email='sam@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def test_add_messages_maintains_metadata(self):
+        session = ChatSession.objects.create(user=self.user, mood='happy')
+        _, bot = session.add_messages(('user', 'I got the job!'), ('bot', 'That is wonderful news!'))
+        session.refresh_from_db()
+        self.assertEqual(session.message_count, 2)
+        self.assertEqual(session.last_message_preview, 'That is wonderful news!')
+        self.assertEqual(session.last_activity_at, bot.timestamp)
+    
+    def test_session_list_is_one_query_ordered_by_activity(self):
+        older = ChatSession.objects.create(user=self.user, mood='sad')
+        newer = ChatSession.objects.create(user=self.user, mood='happy')
+        older.add_messages(('user', 'still here'))
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/chat/sessions/', {'view': 'list'})
+        self.assertEqual(len(queries), 1)
+        self.assertEqual([s['id'] for s in response.data['results']], [older.id, newer.id])
+        self.assertEqual(response.data['results'][0]['last_message'], 'still here')
+
+class SessionMessageSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sam', email='sam@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.session = ChatSession.objects.create(user=self.user, mood='neutral')
+        self.ids = [m.id for m in self.session.add_messages(*[('user', f'message {i}') for i in range(10)])]
+        self.url = f'/api/chat/sessions/{self.session.id}/'
+    
+    def test_session_messages_keyset_pages(self):
+        latest = self.client.get(self.url, {'page_size': 3})
+        self.assertEqual([m['id'] for m in latest.data['messages']], self.ids[-3:])
+        self.assertEqual(latest['X-Has-Newer'], 'false')
+        self.assertEqual(latest['X-Has-Older'], 'true')
+        
+        older = self.client.get(self.url, {'before_id': self.ids[-3], 'page_size': 3})
+        self.assertEqual([m['id'] for m in older.data['messages']], self.ids[-6:-3])
+        
+        with CaptureQueriesContext(connection) as queries:
+            delta = self.client.get(self.url, {'after_id': self.ids[4], 'page_size': 3})
+        self.assertEqual([m['id'] for m in delta.data['messages']], self.ids[5:8])
+        self.assertEqual(delta['X-Has-Newer'], 'true')
+        self.assertLessEqual(len(queries), 3)
+        
+        self.assertEqual(self.client.get(self.url, {'after_id': 'x'}).status_code, 400)
+        self.assertEqual(len(self.client.get(self.url).data['messages']), 10)
+    
+    def test_after_and_before_ids_bound_the_page_together(self):
+        gap = self.client.get(self.url, {'after_id': self.ids[2], 'before_id': self.ids[6], 'page_size': 10})
+        self.assertEqual([m['id'] for m in gap.data['messages']], self.ids[3:6])
+        self.assertEqual((gap.data['has_older'], gap.data['has_newer']), (True, True))
+        
+        partial = self.client.get(self.url, {'after_id': self.ids[2], 'before_id': self.ids[6], 'page_size': 2})
+        self.assertEqual([m['id'] for m in partial.data['messages']], self.ids[3:5])
+        
+        inverted = self.client.get(self.url, {'after_id': self.ids[6], 'before_id': self.ids[2]})
+        self.assertEqual(inverted.status_code, 400)
+
+class ChatWebSocketTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches[settings.AI_RESPONSE_CACHE].clear()
+        self.user = User.objects.create_user(username='sam', email='sam@example.com', password='pw')
+        self.token = Token.objects.create(user=self.user)
+        self.session = ChatSession.objects.create(user=self.user, mood='sad')
+        patcher = mock.patch('chat.consumers.schedule_summary_update')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    async def connect(self, token=None, session_id=None):
+        path = f'/ws/chat/sessions/{session_id or self.session.id}/?token={token or self.token.key}'
+        communicator = WebsocketCommunicator(TokenAuthMiddleware(URLRouter(websocket_urlpatterns)), path)
+        connected, code = await communicator.connect()
+        return communicator, connected, code
+    
+    async def test_bad_token_and_other_users_session_are_rejected(self):
+        _, connected, code = await self.connect(token='not-a-token')
+        self.assertFalse(connected)
+        self.assertEqual(code, 4401)
+        
+        other = await User.objects.acreate(username='alex', email='alex@example.com')
+        other_session = await ChatSession.objects.acreate(user=other, mood='happy')
+        _, connected, code = await self.connect(session_id=other_session.id)
+        self.assertFalse(connected)
+        self.assertEqual(code, 4404)
+    
+    async def test_message_streams_chunks_then_saved_bot_message(self):
+        with FakeGeminiServer(latency=0.0) as server, override_settings(
+                GEMINI_API_KEY='fake', GEMINI_TRANSPORT='rest', GEMINI_API_ENDPOINT=server.url):
+            communicator, connected, _ = await self.connect()
+            self.assertTrue(connected)
+            await communicator.send_json_to({'message': 'I had a rough day'})
+            
+            user_event = await communicator.receive_json_from(timeout=5)
+            chunks = []
+            while (event := await communicator.receive_json_from(timeout=5))['type'] == 'chunk':
+                chunks.append(event['content'])
+            await communicator.disconnect()
+        
+        self.assertEqual(user_event['type'], 'user_message')
+        self.assertEqual(user_event['message']['content'], 'I had a rough day')
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(event['type'], 'bot_message')
+        self.assertEqual(event['message']['content'], ''.join(chunks).strip())
+        self.assertEqual(event['message']['content'], server.reply)
+        senders = [m.sender async for m in self.session.messages.order_by('id')]
+        self.assertEqual(senders, ['user', 'bot'])
+    
+    async def test_crisis_resources_are_sent_even_if_the_turn_cannot_be_saved(self):
+        communicator, _, _ = await self.connect()
+        with mock.patch.object(ChatSession, 'record_turn', side_effect=DatabaseError("disk full")), \
+                self.assertLogs('chat.models', 'ERROR'):
+            await communicator.send_json_to({'message': "I want to end my life"})
+            user_event = await communicator.receive_json_from(timeout=5)
+            bot_event = await communicator.receive_json_from(timeout=5)
+        await communicator.disconnect()
+        
+        self.assertEqual(user_event['message']['content'], "I want to end my life")
+        self.assertEqual((bot_event['type'], bot_event['message']['content']), ('bot_message', CRISIS_RESPONSE))
+    
+    @override_settings(AI_RATE_LIMIT={'per_minute': 60, 'burst': 1, 'cache': 'default'}, GEMINI_API_KEY='')
+    async def test_empty_and_rate_limited_messages_get_error_events(self):
+        communicator, _, _ = await self.connect()
+        await communicator.send_json_to({'message': ''})
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'error', 'error': 'Message is required'})
+        
+        await communicator.send_json_to({'message': 'hello'})
+        while (await communicator.receive_json_from())['type'] != 'bot_message':
+            pass
+        await communicator.send_json_to({'message': 'hello again'})
+        error = await communicator.receive_json_from()
+        await communicator.disconnect()
+        self.assertEqual(error, {'type': 'error', 'error': 'Too many messages', 'retry_after': 1})
+        self.assertEqual(await self.session.messages.acount(), 2)
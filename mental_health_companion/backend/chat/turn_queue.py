@@ -0,0 +1,96 @@
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Exists, F, Min, OuterRef
+from django.utils import timezone
+from .ai_service import get_ai_response
+from .models import ChatSession, ChatTurn
+from .summary import update_session_summary
+
+logger = logging.getLogger(__name__)
+
+def claim_next_turn():
+    """Claim the oldest pending turn, or return None when the queue is empty.
+    
+    Only the oldest pending turn of each session is a candidate, and a claim
+    succeeds only while its session has no running turn, so each
+    conversation's replies are generated one at a time and in order. Any
+    number of worker processes can poll the same table.
+    """
+    config = settings.CHAT_TURN_WORKERS
+    now = timezone.now()
+    
+    # Hand back turns whose worker died mid-call, unless they already used up their attempts
+    expired = ChatTurn.objects.filter(
+        status=ChatTurn.RUNNING, claimed_at__lt=now - timedelta(seconds=config['lease_seconds'])
+    )
+    failed = expired.filter(attempts__gte=config['max_attempts']).update(status=ChatTurn.FAILED)
+    if failed:
+        logger.error("%d chat turns timed out on their last attempt and failed", failed)
+    expired.update(status=ChatTurn.PENDING)
+    
+    busy = ChatTurn.objects.filter(status=ChatTurn.RUNNING).values('session_id')
+    candidates = list(
+        ChatTurn.objects.filter(status=ChatTurn.PENDING).exclude(session_id__in=busy)
+        .values('session_id').annotate(first_id=Min('id')).order_by('first_id')
+        .values_list('first_id', 'session_id')[:10]
+    )
+    for turn_id, session_id in candidates:
+        if _claim(turn_id, session_id, now):
+            return ChatTurn.objects.select_related('session', 'user_message').get(id=turn_id)
+    return None
+
+def _claim(turn_id, session_id, now):
+    """Move one pending turn to running, unless its session got a running turn meanwhile"""
+    running = ChatTurn.objects.filter(session_id=OuterRef('session_id'), status=ChatTurn.RUNNING)
+    with transaction.atomic():
+        # Serializes claims within a session where rows can be locked; SQLite serializes all writes anyway
+        list(ChatSession.objects.select_for_update().filter(id=session_id).values_list('id', flat=True))
+        return ChatTurn.objects.filter(id=turn_id, status=ChatTurn.PENDING).filter(~Exists(running)).update(
+            status=ChatTurn.RUNNING, claimed_at=now, attempts=F('attempts') + 1
+        )
+
+def process_turn(turn):
+    """Generate and save the bot reply for a claimed turn"""
+    session = turn.session
+    try:
+        history = list(session.history_window(until_id=turn.user_message_id))[::-1]
+        reply = get_ai_response(session.mood, turn.user_message.content, history, session.summary, session.user_id)
+    except Exception:
+        logger.exception("Chat turn %s failed", turn.id)
+        retry = turn.attempts < settings.CHAT_TURN_WORKERS['max_attempts']
+        ChatTurn.objects.filter(id=turn.id, status=ChatTurn.RUNNING, claimed_at=turn.claimed_at).update(
+            status=ChatTurn.PENDING if retry else ChatTurn.FAILED
+        )
+        return False
+    
+    # Only the current lease holder may finish the turn
+    if session.complete_turn(turn, reply) is None:
+        logger.warning("Chat turn %s lost its lease, dropping the reply", turn.id)
+        return False
+    
+    try:
+        update_session_summary(session.id)
+    except Exception:
+        logger.exception("Updating summary for chat session %s failed", session.id)
+    return True
+
+def run_worker(poll_interval=None, once=False):
+    """Drain the turn queue until interrupted, or until it is empty when `once`.
+    
+    Returns the number of turns processed.
+    """
+    poll_interval = poll_interval or settings.CHAT_TURN_WORKERS['poll_interval']
+    processed = 0
+    while True:
+        close_old_connections()
+        turn = claim_next_turn()
+        if turn is None:
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            continue
+        if process_turn(turn):
+            processed += 1
@@ -7,4 +7,6 @@ urlpatterns = [
     path('sessions/<int:session_id>/', views.get_session, name='get_session'),
     path('sessions/<int:session_id>/message/', views.send_message, name='send_message'),
     path('sessions/<int:session_id>/delete/', views.delete_session, name='delete_session'),
+    path('turns/<int:turn_id>/', views.get_turn, name='get_turn'),
+    path('ai/stats/', views.ai_stats, name='ai_stats'),
 ]
@@ -1,20 +1,38 @@
+import asyncio
+import math
+import time
+from adrf.decorators import api_view
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from llm_router import CRISIS_RESPONSE, detect_crisis
+from llm_router.metrics import metrics as llm_metrics
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import permission_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from .models import ChatSession, Message
-from .serializers import ChatSessionSerializer, MessageSerializer
-from .ai_service import get_ai_response
+from .models import ChatSession, ChatTurn
+from .pagination import SessionCursorPagination
+from .serializers import ChatSessionListSerializer, ChatSessionSerializer, MessageSerializer
+from .ai_service import aget_ai_response
+from .summary import schedule_summary_update
+from .response_cache import response_cache_stats
+from .providers import get_chat_router, get_gemini_provider
+from .admission import check_rate_limit, get_admission_controller
+from .circuit_breaker import CLOSED
+from mood.analytics_cache import analytics_cache_stats
 from mood.models import MoodEntry
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def create_session(request):
+async def create_session(request):
     mood = request.data.get('mood', 'neutral')
-    session = ChatSession.objects.create(user=request.user, mood=mood)
+    session = await ChatSession.objects.acreate(user=request.user, mood=mood)
     
     # Create mood entry for tracking
-    MoodEntry.objects.create(
+    await MoodEntry.objects.acreate(
         user=request.user,
         mood=mood,
         notes=f"Started chat session with {mood} mood"
@@ -22,30 +40,86 @@ def create_session(request):
     
     # Initial greeting from bot
     greeting = f"Hello! I'm here to support you. I understand you're feeling {mood}. How can I help you today?"
-    Message.objects.create(session=session, sender='bot', content=greeting)
+    await session.aadd_messages(('bot', greeting))
     
-    return Response(ChatSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+    data = await sync_to_async(lambda: ChatSessionSerializer(session).data)()
+    return Response(data, status=status.HTTP_201_CREATED)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_sessions(request):
     sessions = ChatSession.objects.filter(user=request.user)
-    return Response(ChatSessionSerializer(sessions, many=True).data)
+    if request.query_params.get('view') != 'list':
+        return Response(ChatSessionSerializer(sessions, many=True).data)
+    
+    # Lightweight sidebar list: one indexed scan per page over the denormalized metadata
+    sessions = sessions.only(
+        'id', 'mood', 'created_at', 'updated_at', 'message_count', 'last_message_preview', 'last_activity_at'
+    )
+    paginator = SessionCursorPagination()
+    page = paginator.paginate_queryset(sessions, request)
+    return paginator.get_paginated_response(ChatSessionListSerializer(page, many=True).data)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_session(request, session_id):
     try:
         session = ChatSession.objects.get(id=session_id, user=request.user)
-        return Response(ChatSessionSerializer(session).data)
     except ChatSession.DoesNotExist:
         return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    params = request.query_params
+    if not any(key in params for key in ('after_id', 'before_id', 'page_size')):
+        return Response(ChatSessionSerializer(session).data)
+    
+    # Delta sync: keyset pages of messages by id instead of the whole conversation
+    try:
+        after_id = int(params['after_id']) if 'after_id' in params else None
+        before_id = int(params['before_id']) if 'before_id' in params else None
+        page_size = int(params.get('page_size', settings.CHAT_MESSAGE_PAGE_SIZE))
+    except ValueError:
+        return Response({'error': 'after_id, before_id and page_size must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if after_id is not None and before_id is not None and after_id >= before_id:
+        return Response({'error': 'after_id must be less than before_id'}, status=status.HTTP_400_BAD_REQUEST)
+    page_size = max(1, min(page_size, settings.CHAT_MESSAGE_PAGE_MAX))
+    
+    messages = session.messages.all()
+    if after_id is not None:
+        # Oldest first from after_id, up to before_id when both are given
+        if before_id is not None:
+            messages = messages.filter(id__lt=before_id)
+        page = list(messages.filter(id__gt=after_id).order_by('id')[:page_size + 1])
+        has_newer = len(page) > page_size
+        page = page[:page_size]
+        if not has_newer and before_id is not None:
+            has_newer = session.messages.filter(id__gte=before_id).exists()
+        has_older = after_id > 0 and session.messages.filter(id__lte=after_id).exists()
+    else:
+        if before_id is not None:
+            messages = messages.filter(id__lt=before_id)
+        page = list(messages.order_by('-id')[:page_size + 1])
+        has_older = len(page) > page_size
+        page = page[:page_size][::-1]
+        has_newer = before_id is not None and session.messages.filter(id__gte=before_id).exists()
+    
+    response = Response({
+        'id': session.id,
+        'mood': session.mood,
+        'created_at': session.created_at,
+        'updated_at': session.updated_at,
+        'messages': MessageSerializer(page, many=True).data,
+        'has_newer': has_newer,
+        'has_older': has_older,
+    })
+    response['X-Has-Newer'] = 'true' if has_newer else 'false'
+    response['X-Has-Older'] = 'true' if has_older else 'false'
+    return response
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def send_message(request, session_id):
+async def send_message(request, session_id):
     try:
-        session = ChatSession.objects.get(id=session_id, user=request.user)
+        session = await ChatSession.objects.aget(id=session_id, user=request.user)
     except ChatSession.DoesNotExist:
         return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
     
@@ -53,22 +127,106 @@ def send_message(request, session_id):
     if not user_message:
         return Response({'error': 'Message is required'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Save user message
-    Message.objects.create(session=session, sender='user', content=user_message)
+    # A retried turn returns the stored exchange instead of calling the AI again
+    idempotency_key = request.headers.get('Idempotency-Key') or None
+    if idempotency_key and len(idempotency_key) > 255:
+        return Response({'error': 'Idempotency-Key is too long'}, status=status.HTTP_400_BAD_REQUEST)
+    if idempotency_key:
+        turn = await session.afind_turn(idempotency_key)
+        if turn is not None:
+            return _turn_response(turn, replayed=True)
+    
+    # Crisis language gets the resources at once: no rate limit, queue or AI call
+    crisis_phrase = detect_crisis(user_message)
+    if crisis_phrase:
+        llm_metrics.record_fallback('chat', 'crisis')
+        user_msg, bot_message, replayed = await session.arecord_crisis_turn(
+            user_message, CRISIS_RESPONSE, crisis_phrase, idempotency_key
+        )
+        return _message_response(user_msg, bot_message, replayed, crisis=True)
     
-    # Get conversation history
-    history = list(session.messages.values('sender', 'content'))
+    # Per-user token bucket in front of the AI call
+    allowed, retry_after = await sync_to_async(check_rate_limit)(request.user.id)
+    if not allowed:
+        response = Response({'error': 'Too many messages, please slow down'}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        response['Retry-After'] = str(math.ceil(retry_after))
+        return response
+    
+    # Queue mode: a run_turn_workers process makes the AI call
+    if settings.CHAT_TURN_QUEUE:
+        turn, replayed = await session.aenqueue_turn(user_message, idempotency_key)
+        return _turn_response(turn, replayed)
+    
+    # Save the user message, and claim the turn under its key, before the AI call:
+    # a concurrent retry then waits for this turn instead of calling the AI too
+    turn, replayed = await session.aenqueue_turn(user_message, idempotency_key, running=True)
+    if replayed:
+        return _turn_response(turn, replayed=True)
+    
+    # Conversation history, ending with the new message
+    history = [msg async for msg in session.history_window(until_id=turn.user_message_id)][::-1]
     
     # Generate AI response
-    ai_response = get_ai_response(session.mood, user_message, history)
+    try:
+        ai_response = await aget_ai_response(session.mood, user_message, history, session.summary, request.user.id)
+    except BaseException:
+        # Also on client disconnect; the user message stays saved
+        await ChatTurn.objects.filter(id=turn.id, status=ChatTurn.RUNNING).aupdate(status=ChatTurn.FAILED)
+        raise
     
-    # Save bot message
-    bot_message = Message.objects.create(session=session, sender='bot', content=ai_response)
+    await session.acomplete_turn(turn, ai_response)
     
-    return Response({
-        'user_message': MessageSerializer(session.messages.filter(sender='user').last()).data,
-        'bot_message': MessageSerializer(bot_message).data
+    # Fold older turns into the rolling summary off the request path
+    schedule_summary_update(session.id)
+    
+    return _turn_response(turn)
+
+def _message_response(user_msg, bot_message, replayed=False, **extra):
+    response = Response({
+        'user_message': MessageSerializer(user_msg).data,
+        'bot_message': MessageSerializer(bot_message).data if bot_message else None,
+        **extra,
     })
+    if replayed:
+        response['Idempotent-Replayed'] = 'true'
+    return response
+
+def _turn_response(turn, replayed=False):
+    """200 with both messages once the turn is done, 202 while it is queued, 503 if it failed"""
+    extra = {'turn_id': turn.id, 'status': turn.status}
+    if turn.status == ChatTurn.FAILED:
+        extra['error'] = "Sorry, I couldn't reply to that message. Please try sending it again."
+    response = _message_response(turn.user_message, turn.bot_message, replayed, **extra)
+    if turn.status in (ChatTurn.PENDING, ChatTurn.RUNNING):
+        response.status_code = status.HTTP_202_ACCEPTED
+        response['Location'] = reverse('get_turn', args=[turn.id])
+    elif turn.status == ChatTurn.FAILED:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def get_turn(request, turn_id):
+    """Long-poll a queued turn: waits up to ?wait= seconds for the bot reply"""
+    try:
+        wait = float(request.query_params.get('wait', 0))
+    except ValueError:
+        wait = math.nan
+    # nan would never reach the deadline and hold the worker forever
+    if not math.isfinite(wait) or wait < 0:
+        return Response({'error': 'wait must be a non-negative number of seconds'}, status=status.HTTP_400_BAD_REQUEST)
+    wait = min(wait, settings.CHAT_TURN_POLL_MAX)
+    
+    turns = ChatTurn.objects.select_related('user_message', 'bot_message')
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            turn = await turns.aget(id=turn_id, session__user=request.user)
+        except ChatTurn.DoesNotExist:
+            return Response({'error': 'Turn not found'}, status=status.HTTP_404_NOT_FOUND)
+        if turn.status in (ChatTurn.DONE, ChatTurn.FAILED) or time.monotonic() >= deadline:
+            return _turn_response(turn)
+        await asyncio.sleep(settings.CHAT_TURN_WORKERS['poll_interval'])
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
@@ -79,3 +237,59 @@ def delete_session(request, session_id):
         return Response({'message': 'Session deleted'}, status=status.HTTP_204_NO_CONTENT)
     except ChatSession.DoesNotExist:
         return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def ai_stats(request):
+    # Without a key every turn gets a fallback reply and no provider is ever built
+    configured = bool(settings.GEMINI_API_KEY)
+    return Response({
+        'response_cache': response_cache_stats(),
+        'gemini_breaker': get_gemini_provider().breaker.snapshot() if configured else None,
+        'admission': get_admission_controller().snapshot(),
+        'routing': get_chat_router().snapshot() if configured else None,
+    })
+
+def metrics(request):
+    """Prometheus text metrics: LLM call latency, tokens, errors and fallbacks, plus chat and cache gauges.
+    
+    Needs `Authorization: Bearer <METRICS_TOKEN>`; with no token configured
+    the endpoint is disabled, since ALLOWED_HOSTS does not keep it internal.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+    if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    
+    cache_stats = response_cache_stats()
+    admission = get_admission_controller().snapshot()
+    analytics = analytics_cache_stats()
+    lines = [
+        '# TYPE chat_response_cache_hits_total counter',
+        f"chat_response_cache_hits_total {cache_stats['hits']}",
+        '# TYPE chat_response_cache_coalesced_total counter',
+        f"chat_response_cache_coalesced_total {cache_stats['coalesced']}",
+        '# TYPE chat_admission_active gauge',
+        f"chat_admission_active {admission['active']}",
+        '# TYPE chat_admission_waiting gauge',
+        f"chat_admission_waiting {admission['waiting']}",
+        '# TYPE chat_admission_shed_total counter',
+        f"chat_admission_shed_total {admission['shed']}",
+        '# TYPE analytics_cache_hits_total counter',
+        f"analytics_cache_hits_total {analytics['hits']}",
+        '# TYPE analytics_cache_misses_total counter',
+        f"analytics_cache_misses_total {analytics['misses']}",
+        '# TYPE analytics_cache_invalidations_total counter',
+        f"analytics_cache_invalidations_total {analytics['invalidations']}",
+    ]
+    if settings.GEMINI_API_KEY:
+        breaker = get_gemini_provider().breaker.snapshot()
+        lines += [
+            '# TYPE gemini_circuit_open gauge',
+            f"gemini_circuit_open {int(breaker['state'] != CLOSED)}",
+            '# TYPE gemini_timeout_seconds gauge',
+            f"gemini_timeout_seconds {breaker['timeout']}",
+        ]
+    body = llm_metrics.render() + '\n'.join(lines) + '\n'
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
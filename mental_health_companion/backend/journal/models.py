@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from mood.models import MoodDrift
 
 class JournalEntry(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -13,6 +14,14 @@ class JournalEntry(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+    
+    def save(self, *args, **kwargs):
+        """A new entry's mood also feeds the user's MoodDrift, in the same transaction"""
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            MoodDrift.record(self.user_id, self.mood, self.created_at)
 
 class MeditationSession(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
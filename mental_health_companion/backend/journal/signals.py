@@ -0,0 +1,9 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from mood.analytics_cache import bump_version_on_commit
+from .models import JournalEntry, MeditationSession
+
+@receiver([post_save, post_delete], sender=JournalEntry)
+@receiver([post_save, post_delete], sender=MeditationSession)
+def invalidate_journal_analytics(sender, instance, **kwargs):
+    bump_version_on_commit(instance.user_id)
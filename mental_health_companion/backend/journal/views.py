@@ -3,6 +3,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.utils import timezone
+from mood.analytics_cache import cached_user_response
 from .models import JournalEntry, MeditationSession, SelfCareActivity
 from .serializers import JournalEntrySerializer, MeditationSessionSerializer, SelfCareActivitySerializer
 
@@ -64,15 +65,20 @@ def meditation_sessions(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def meditation_stats(request):
-    sessions = MeditationSession.objects.filter(user=request.user)
+    return Response(cached_user_response(
+        request.user.id, 'meditation_stats', {}, lambda: _meditation_stats(request.user)
+    ))
+
+def _meditation_stats(user):
+    sessions = MeditationSession.objects.filter(user=user)
     total_sessions = sessions.count()
     total_minutes = sum(s.duration for s in sessions) // 60
     
-    return Response({
+    return {
         'total_sessions': total_sessions,
         'total_minutes': total_minutes,
         'recent_sessions': MeditationSessionSerializer(sessions[:5], many=True).data
-    })
+    }
 
 # Self-Care Views
 @api_view(['GET', 'POST'])
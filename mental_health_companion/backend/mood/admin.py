@@ -1,4 +1,9 @@
 from django.contrib import admin
-from .models import MoodEntry
+from .models import MoodDriftEvent, MoodEntry
 
 admin.site.register(MoodEntry)
+
+@admin.register(MoodDriftEvent)
+class MoodDriftEventAdmin(admin.ModelAdmin):
+    list_display = ('user', 'kind', 'ewma', 'baseline', 'created_at', 'processed_at')
+    list_filter = ('kind', 'processed_at')
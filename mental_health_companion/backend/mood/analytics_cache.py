@@ -0,0 +1,80 @@
+"""Per-user versioned cache for dashboard analytics.
+
+Each user has a data version in the `analytics` cache alias. Analytic
+responses are cached under (user, endpoint, params, version), so a repeat
+dashboard load is two cache reads and no queries. Saving or deleting any of
+the user's mood entries, journal entries or meditation sessions bumps the
+version (see mood.signals and journal.signals), which orphans every cached
+response for that user at once; orphans age out with the TTL.
+
+The version lives in the cache, so with several worker processes the alias
+must be a shared backend (Redis, Memcached) for writes in one process to
+reach the others.
+"""
+import hashlib
+import json
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+_stats_lock = threading.Lock()
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+def _cache():
+    return caches[settings.ANALYTICS_CACHE]
+
+def _version_key(user_id):
+    return f'analytics-version:{user_id}'
+
+def _new_version():
+    # Not 1: if the version was evicted, a fresh one must not match old responses
+    return time.time_ns()
+
+def data_version(user_id):
+    cache = _cache()
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = _new_version()
+        if not cache.add(_version_key(user_id), version, None):
+            version = cache.get(_version_key(user_id), version)
+    return version
+
+def bump_version(user_id):
+    """Invalidate every cached analytic response for `user_id`"""
+    cache = _cache()
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), _new_version(), None)
+    _count('invalidations')
+
+def bump_version_on_commit(user_id):
+    """Bump once the current transaction commits, so readers cannot cache the old rows under the new version"""
+    transaction.on_commit(lambda: bump_version(user_id))
+
+def cached_user_response(user_id, endpoint, params, compute):
+    """Return compute()'s JSON-ready data for this user, endpoint and params, from the cache when current"""
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+    key = f'analytics:{user_id}:{endpoint}:{data_version(user_id)}:{digest}'
+    cache = _cache()
+    data = cache.get(key)
+    if data is not None:
+        _count('hits')
+        return data
+    _count('misses')
+    data = compute()
+    cache.set(key, data)
+    return data
+
+def analytics_cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    return stats
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class MoodConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'mood'
+    
+    def ready(self):
+        # Connects the receivers that invalidate cached analytics
+        from . import signals
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from mood.models import MoodDailyCount, MoodEntry
+
+class Command(BaseCommand):
+    help = "Recompute the MoodDailyCount rollup table from MoodEntry rows"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="Only rebuild this user's counts")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per bulk insert")
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        entries = MoodEntry.objects.order_by()
+        counts = MoodDailyCount.objects.all()
+        if options['user'] is not None:
+            entries = entries.filter(user_id=options['user'])
+            counts = counts.filter(user_id=options['user'])
+        # Days use the current time zone, as MoodEntry.save() does
+        rows = entries.annotate(day=TruncDate('created_at')).values('user_id', 'day', 'mood').annotate(count=Count('id'))
+        
+        created = 0
+        batch = []
+        with transaction.atomic():
+            counts.delete()
+            for row in rows.iterator():
+                batch.append(MoodDailyCount(**row))
+                if len(batch) >= batch_size:
+                    created += len(MoodDailyCount.objects.bulk_create(batch))
+                    batch = []
+            created += len(MoodDailyCount.objects.bulk_create(batch))
+        
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} daily mood counts"))
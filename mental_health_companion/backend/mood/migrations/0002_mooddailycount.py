@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('mood', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MoodDailyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('mood', models.CharField(choices=[('happy', 'Happy'), ('sad', 'Sad'), ('anxious', 'Anxious'), ('angry', 'Angry'), ('stressed', 'Stressed'), ('neutral', 'Neutral')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-day', 'mood'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='mooddailycount',
+            constraint=models.UniqueConstraint(fields=('user', 'day', 'mood'), name='mood_daily_user_day_mood_uniq'),
+        ),
+    ]
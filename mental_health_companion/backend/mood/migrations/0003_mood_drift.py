@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('mood', '0002_mooddailycount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MoodDrift',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('ewma', models.FloatField(default=0.0)),
+                ('baseline', models.FloatField(default=0.0)),
+                ('variance', models.FloatField(default=0.0)),
+                ('observations', models.PositiveIntegerField(default=0)),
+                ('last_seen', models.DateTimeField(blank=True, null=True)),
+                ('alerted', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MoodDriftEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('worsening', 'Worsening')], max_length=20)),
+                ('ewma', models.FloatField()),
+                ('baseline', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['processed_at', 'id'], name='mood_drift_outbox_idx')],
+            },
+        ),
+    ]
@@ -1,5 +1,21 @@
-from django.db import models
+import math
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.conf import settings
+from django.utils import timezone
+
+# How pleasant each mood is, from -1 to 1 (journal moods included); trends
+# average this per entry and MoodDrift tracks it per user
+MOOD_VALENCE = {
+    'happy': 1.0,
+    'grateful': 0.75,
+    'peaceful': 0.5,
+    'neutral': 0.0,
+    'stressed': -0.5,
+    'anxious': -0.5,
+    'angry': -0.75,
+    'sad': -1.0,
+}
 
 class MoodEntry(models.Model):
     MOOD_CHOICES = [
@@ -18,3 +34,136 @@ class MoodEntry(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+    
+    def save(self, *args, **kwargs):
+        """Insert the entry and count it in MoodDailyCount in one transaction"""
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        # No savepoint when nested: a failure here aborts the caller's transaction too
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            MoodDailyCount.increment(self.user_id, timezone.localdate(self.created_at), self.mood)
+            MoodDrift.record(self.user_id, self.mood, self.created_at)
+
+class MoodDailyCount(models.Model):
+    """Per-user, per-day, per-mood MoodEntry counts, maintained by MoodEntry.save().
+    
+    Deleted entries are subtracted by a post_delete receiver (mood.signals).
+    Entries edited afterwards (e.g. in the admin) or changed with
+    queryset.update() are not; rebuild_mood_rollups recomputes the table
+    from MoodEntry.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    day = models.DateField()
+    mood = models.CharField(max_length=20, choices=MoodEntry.MOOD_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-day', 'mood']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day', 'mood'], name='mood_daily_user_day_mood_uniq'),
+        ]
+    
+    @classmethod
+    def increment(cls, user_id, day, mood):
+        counts = cls.objects.filter(user_id=user_id, day=day, mood=mood)
+        if counts.update(count=F('count') + 1):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(user_id=user_id, day=day, mood=mood, count=1)
+        except IntegrityError:
+            # Another request created today's row first
+            counts.update(count=F('count') + 1)
+    
+    @classmethod
+    def decrement(cls, user_id, day, mood):
+        cls.objects.filter(user_id=user_id, day=day, mood=mood, count__gt=0).update(count=F('count') - 1)
+
+class MoodDrift(models.Model):
+    """Exponentially weighted mood state for one user, updated in O(1) per recorded mood.
+    
+    `ewma` follows recent valence quickly and `baseline` slowly; `variance`
+    is the weighted variance of valence around the baseline. When `ewma`
+    falls well below the baseline (by at least MOOD_DRIFT['min_drop'] and by
+    MOOD_DRIFT['z'] standard deviations of the fast average) a MoodDriftEvent
+    is written, once, until the user recovers.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True)
+    ewma = models.FloatField(default=0.0)
+    baseline = models.FloatField(default=0.0)
+    variance = models.FloatField(default=0.0)
+    observations = models.PositiveIntegerField(default=0)
+    last_seen = models.DateTimeField(null=True, blank=True)
+    alerted = models.BooleanField(default=False)
+    
+    def observe(self, valence, at, config=None):
+        """Fold one valence reading into the state; returns True if it crossed into a worsening drift"""
+        config = config or settings.MOOD_DRIFT
+        if not self.observations:
+            self.ewma = self.baseline = valence
+        else:
+            if self.last_seen and (at - self.last_seen).total_seconds() > config['stale_days'] * 86400:
+                # Readings from before a long gap say little about today
+                self.ewma = self.baseline
+            deviation = valence - self.baseline
+            # Plain running mean until there are enough readings for the slow weight
+            slow = max(config['slow_alpha'], 1 / (self.observations + 1))
+            self.baseline += slow * deviation
+            self.variance = (1 - slow) * (self.variance + slow * deviation * deviation)
+            self.ewma += config['fast_alpha'] * (valence - self.ewma)
+        self.observations += 1
+        self.last_seen = at
+        
+        drop = self.baseline - self.ewma
+        if self.alerted:
+            # Hysteresis: re-arm only once most of the drop has recovered
+            self.alerted = drop >= config['min_drop'] / 2
+            return False
+        # Standard deviation of the fast average itself, not of single readings
+        fast = config['fast_alpha']
+        spread = math.sqrt(self.variance * fast / (2 - fast))
+        if (self.observations >= config['min_observations'] and drop >= config['min_drop']
+                and drop >= config['z'] * spread):
+            self.alerted = True
+            return True
+        return False
+    
+    @classmethod
+    def record(cls, user_id, mood, at):
+        """Update the user's state for a recorded `mood`, emitting a MoodDriftEvent on a crossing"""
+        valence = MOOD_VALENCE.get(mood)
+        if valence is None:
+            return
+        with transaction.atomic(savepoint=False):
+            state = cls.objects.select_for_update().filter(user_id=user_id).first()
+            if state is None:
+                try:
+                    with transaction.atomic():
+                        state = cls.objects.create(user_id=user_id)
+                except IntegrityError:
+                    state = cls.objects.select_for_update().get(user_id=user_id)
+            if state.observe(valence, at):
+                MoodDriftEvent.objects.create(user_id=user_id, kind=MoodDriftEvent.WORSENING,
+                                              ewma=state.ewma, baseline=state.baseline)
+            state.save()
+
+class MoodDriftEvent(models.Model):
+    """Outbox of drift crossings, for a follow-up job to pick up and mark processed"""
+    WORSENING = 'worsening'
+    KIND_CHOICES = [
+        (WORSENING, 'Worsening'),
+    ]
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    ewma = models.FloatField()
+    baseline = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['processed_at', 'id'], name='mood_drift_outbox_idx'),
+        ]
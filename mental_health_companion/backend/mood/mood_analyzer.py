@@ -1,22 +1,60 @@
 import re
 
+# Each keyword with the inflected and derived forms that should count for it
 MOOD_KEYWORDS = {
-    'happy': ['happy', 'joy', 'excited', 'great', 'wonderful', 'amazing', 'good', 'cheerful'],
-    'sad': ['sad', 'depressed', 'down', 'unhappy', 'miserable', 'crying', 'tears'],
-    'anxious': ['anxious', 'worried', 'nervous', 'panic', 'fear', 'scared', 'stress'],
-    'angry': ['angry', 'mad', 'furious', 'irritated', 'frustrated', 'annoyed'],
-    'stressed': ['stressed', 'overwhelmed', 'pressure', 'tired', 'exhausted', 'busy'],
+    'happy': ['happy', 'happier', 'happiest', 'happiness', 'joy', 'joyful', 'excited', 'exciting', 'excitement',
+              'great', 'wonderful', 'amazing', 'amazed', 'good', 'cheerful'],
+    'sad': ['sad', 'sadder', 'saddest', 'sadness', 'depressed', 'depressing', 'depression', 'down', 'unhappy',
+            'unhappiness', 'miserable', 'misery', 'cry', 'cries', 'cried', 'crying', 'tears', 'tearful'],
+    'anxious': ['anxious', 'anxiety', 'worried', 'worry', 'worries', 'worrying', 'nervous', 'nervousness',
+                'panic', 'panics', 'panicked', 'panicking', 'fear', 'fears', 'feared', 'fearful',
+                'scared', 'scare', 'scares', 'scary', 'stress'],
+    'angry': ['angry', 'angrier', 'anger', 'angered', 'mad', 'furious', 'fury', 'irritated', 'irritating',
+              'irritation', 'frustrated', 'frustrating', 'frustration', 'annoyed', 'annoying', 'annoyance'],
+    'stressed': ['stressed', 'stressful', 'overwhelmed', 'overwhelming', 'pressure', 'pressured', 'tired',
+                 'exhausted', 'exhausting', 'exhaustion', 'busy'],
 }
 
+# Score order; ties go to the earlier mood
+MOODS = list(MOOD_KEYWORDS)
+
+# Every keyword form mapped to its mood's column
+_KEYWORD_MOOD = {}
+for _column, _keywords in enumerate(MOOD_KEYWORDS.values()):
+    for _keyword in _keywords:
+        _KEYWORD_MOOD.setdefault(_keyword, _column)
+_KEYWORD_SET = frozenset(_KEYWORD_MOOD)
+# Unicode word characters, so "good…" and "happy—" split like "good," does
+_WORD_RE = re.compile(r"\w+")
+# Fast path for ASCII text, equivalent to _WORD_RE there: one bytes translate
+# lowercases letters and turns every non-word byte into a space
+_ASCII_WORD_CHARS = bytes(range(ord('0'), ord('9') + 1)) + b'_' + bytes(range(ord('a'), ord('z') + 1))
+_ASCII_TOKENIZE = bytes(
+    byte + 32 if ord('A') <= byte <= ord('Z') else byte if byte in _ASCII_WORD_CHARS else ord(' ')
+    for byte in range(256)
+)
+_ASCII_KEYWORD_MOOD = {keyword.encode(): column for keyword, column in _KEYWORD_MOOD.items()}
+_ASCII_KEYWORD_SET = frozenset(_ASCII_KEYWORD_MOOD)
+
 def analyze_mood_from_text(text):
-    """Analyze text to determine mood"""
-    text_lower = text.lower()
-    mood_scores = {mood: 0 for mood in MOOD_KEYWORDS}
-    
-    for mood, keywords in MOOD_KEYWORDS.items():
-        for keyword in keywords:
-            if keyword in text_lower:
-                mood_scores[mood] += 1
-    
-    max_mood = max(mood_scores, key=mood_scores.get)
-    return max_mood if mood_scores[max_mood] > 0 else 'neutral'
+    """Analyze text to determine mood.
+
+    Keywords match as whole words ("good" does not match "goodbye"); each
+    distinct form counts once, and ties go to the earlier mood.
+    """
+    if text.isascii():
+        moods = _ASCII_KEYWORD_MOOD
+        hits = _ASCII_KEYWORD_SET.intersection(text.encode().translate(_ASCII_TOKENIZE).split())
+    else:
+        moods = _KEYWORD_MOOD
+        hits = _KEYWORD_SET.intersection(_WORD_RE.findall(text.lower()))
+    if not hits:
+        return 'neutral'
+    scores = [0] * len(MOODS)
+    for word in hits:
+        scores[moods[word]] += 1
+    return MOODS[max(range(len(MOODS)), key=scores.__getitem__)]
+
+def analyze_batch(texts):
+    """Analyze many texts at once; returns one mood per text, as analyze_mood_from_text would"""
+    return [analyze_mood_from_text(text) for text in texts]
@@ -0,0 +1,16 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .analytics_cache import bump_version_on_commit
+from .models import MoodDailyCount, MoodEntry
+
+@receiver(post_delete, sender=MoodEntry)
+def uncount_mood_entry(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, get_user_model()):
+        return  # The user's rollup rows are being deleted with them
+    MoodDailyCount.decrement(instance.user_id, timezone.localdate(instance.created_at), instance.mood)
+
+@receiver([post_save, post_delete], sender=MoodEntry)
+def invalidate_mood_analytics(sender, instance, **kwargs):
+    bump_version_on_commit(instance.user_id)
@@ -0,0 +1,192 @@
+from datetime import date, timedelta
+from io import StringIO
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from authentication.models import User
+from journal.models import JournalEntry
+from .analytics_cache import analytics_cache_stats
+from .models import MoodDailyCount, MoodDrift, MoodDriftEvent, MoodEntry
+from .mood_analyzer import analyze_batch, analyze_mood_from_text
+from .trends import mood_buckets
+
+class MoodAnalyzerTests(TestCase):
+    TEXTS = [
+        "Said goodbye to everyone, then took the bus home.",
+        "Had a GOOD day, honestly great!",
+        "So stressed and tired, but not scared.",
+        "Feeling down... tears all evening; sad.",
+        "",
+    ]
+    
+    def test_keywords_match_whole_words(self):
+        self.assertEqual(analyze_mood_from_text(self.TEXTS[0]), 'neutral')
+        self.assertEqual(analyze_mood_from_text(self.TEXTS[1]), 'happy')
+        self.assertEqual(analyze_mood_from_text(self.TEXTS[2]), 'stressed')
+        self.assertEqual(analyze_mood_from_text("Panics, fears and scares"), 'anxious')
+    
+    def test_unicode_punctuation_and_derived_forms(self):
+        self.assertEqual(analyze_mood_from_text("Feeling good…"), 'happy')
+        self.assertEqual(analyze_mood_from_text("I’m so happy—really"), 'happy')
+        self.assertEqual(analyze_mood_from_text("I keep worrying and panicking"), 'anxious')
+        self.assertEqual(analyze_mood_from_text("Such sadness today"), 'sad')
+        self.assertEqual(analyze_mood_from_text("A stressful week"), 'stressed')
+        self.assertEqual(analyze_mood_from_text("I feel fearful"), 'anxious')
+    
+    def test_batch_matches_single_text_analysis(self):
+        expected = ['neutral', 'happy', 'stressed', 'sad', 'neutral']
+        self.assertEqual(analyze_batch(self.TEXTS), expected)
+        self.assertEqual(analyze_batch(iter(self.TEXTS)), expected)
+        self.assertEqual(analyze_batch([]), [])
+    
+    def test_ascii_and_unicode_text_split_the_same_way(self):
+        for text in ("So_tired\tand\x00busy", "Happy-ish, but STRESSED!"):
+            self.assertEqual(analyze_mood_from_text(text), analyze_mood_from_text(text + " …"), text)
+
+class MoodRollupTests(TestCase):
+    def setUp(self):
+        caches[settings.ANALYTICS_CACHE].clear()
+        self.user = User.objects.create_user(username='sam', email='sam@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def distribution(self, days):
+        response = self.client.get('/api/mood/analytics/', {'days': days})
+        return response.data['total_entries'], {row['mood']: row['count'] for row in response.data['mood_distribution']}
+    
+    def test_entries_are_counted_per_day_as_they_are_saved(self):
+        self.client.post('/api/mood/track/', {'mood': 'sad'}, format='json')
+        self.client.post('/api/mood/track/', {'notes': 'so sad and crying today'}, format='json')
+        self.client.post('/api/chat/sessions/create/', {'mood': 'happy'}, format='json')
+        old = MoodEntry.objects.create(user=self.user, mood='sad')
+        MoodEntry.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=40))
+        MoodDailyCount.objects.filter(day=timezone.localdate(), mood='sad').update(count=7)
+        call_command('rebuild_mood_rollups', stdout=StringIO())
+        
+        self.assertEqual(MoodDailyCount.objects.get(day=timezone.localdate(), mood='sad').count, 2)
+        self.assertEqual(self.distribution(30), (3, {'sad': 2, 'happy': 1}))
+        self.assertEqual(self.distribution(365), (4, {'sad': 3, 'happy': 1}))
+    
+    def test_analytics_reads_the_rollup_not_the_entries(self):
+        for _ in range(3):
+            MoodEntry.objects.create(user=self.user, mood='anxious')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.distribution(7), (3, {'anxious': 3}))
+        self.assertFalse(any('mood_moodentry' in q['sql'] for q in queries))
+
+class MoodTrendsTests(TestCase):
+    def setUp(self):
+        caches[settings.ANALYTICS_CACHE].clear()
+        self.user = User.objects.create_user(username='sam', email='sam@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        today = timezone.localdate()
+        # Two-day run ten days ago, then a three-day run ending yesterday
+        for days_ago, mood in [(10, 'sad'), (9, 'sad'), (3, 'happy'), (2, 'happy'), (1, 'happy'), (1, 'sad')]:
+            MoodDailyCount.increment(self.user.id, today - timedelta(days=days_ago), mood)
+    
+    def test_buckets_moving_average_and_streaks(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/mood/trends/', {'days': 14})
+        self.assertLessEqual(len(queries), 4)
+        data = response.data
+        
+        self.assertEqual([(b['entries'], b['valence']) for b in data['buckets']],
+                         [(1, -1.0), (1, -1.0), (1, 1.0), (1, 1.0), (2, 0.0)])
+        self.assertEqual(data['buckets'][-1]['moods'], {'happy': 1, 'sad': 1})
+        self.assertEqual(len(data['moving_average']), 14)
+        # Yesterday's window holds three happy days and one sad entry
+        self.assertEqual(data['moving_average'][-2]['valence'], 0.5)
+        self.assertIsNone(data['moving_average'][0]['valence'])
+        self.assertEqual(data['streaks'], {'current': 3, 'longest': 3})
+    
+    def test_weekly_buckets_and_validation(self):
+        weeks = self.client.get('/api/mood/trends/', {'days': 28, 'bucket': 'week'}).data['buckets']
+        self.assertEqual(sum(b['entries'] for b in weeks), 6)
+        self.assertTrue(all(b['start'].weekday() == 0 for b in weeks))
+        self.assertEqual(self.client.get('/api/mood/trends/', {'bucket': 'year'}).status_code, 400)
+    
+    def test_first_bucket_covers_its_whole_week_or_month(self):
+        # 2021-03-08 is a Monday; the range starts two days later
+        for day in (date(2021, 3, 1), date(2021, 3, 8), date(2021, 3, 10)):
+            MoodDailyCount.increment(self.user.id, day, 'happy')
+        start_day = date(2021, 3, 10)
+        
+        weeks = mood_buckets(self.user, start_day, 'week')
+        self.assertEqual((weeks[0]['start'], weeks[0]['entries']), (date(2021, 3, 8), 2))
+        months = mood_buckets(self.user, start_day, 'month')
+        self.assertEqual((months[0]['start'], months[0]['entries']), (date(2021, 3, 1), 3))
+        days = mood_buckets(self.user, start_day, 'day')
+        self.assertEqual((days[0]['start'], days[0]['entries']), (start_day, 1))
+
+class MoodDriftTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sam', email='sam@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def test_worsening_mood_emits_one_outbox_event(self):
+        for mood in ['happy', 'neutral'] * 10:
+            self.client.post('/api/mood/track/', {'mood': mood}, format='json')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post('/api/mood/track/', {'mood': 'sad'}, format='json')
+        # Constant work per write: lock the state row, then update it
+        self.assertEqual(sum('"mood_mooddrift"' in q['sql'] for q in queries), 2)
+        self.assertFalse(MoodDriftEvent.objects.exists())
+        
+        self.client.post('/api/chat/sessions/create/', {'mood': 'sad'}, format='json')
+        for _ in range(4):
+            JournalEntry.objects.create(user=self.user, title='Rough day', content='...', mood='sad')
+        
+        event = MoodDriftEvent.objects.get()
+        self.assertEqual((event.user_id, event.kind, event.processed_at), (self.user.id, 'worsening', None))
+        self.assertLess(event.ewma, event.baseline)
+        state = MoodDrift.objects.get(user=self.user)
+        self.assertEqual(state.observations, 26)
+        self.assertTrue(state.alerted)
+    
+    def test_state_rearms_after_recovery(self):
+        state = MoodDrift(user=self.user)
+        now = timezone.now()
+        readings = [1.0, 0.0] * 10 + [-1.0] * 6 + [1.0, 0.0] * 8 + [-1.0] * 6
+        crossings = [i for i, valence in enumerate(readings) if state.observe(valence, now + timedelta(hours=i))]
+        self.assertEqual(crossings, [23, 46])
+
+class AnalyticsCacheTests(TestCase):
+    def setUp(self):
+        caches[settings.ANALYTICS_CACHE].clear()
+        self.user = User.objects.create_user(username='sam', email='sam@example.com', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def dashboard(self):
+        return [self.client.get(url).data for url in
+                ('/api/mood/analytics/', '/api/mood/history/', '/api/journal/meditation/stats/')]
+    
+    def test_repeat_loads_are_served_without_queries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/mood/track/', {'mood': 'happy'}, format='json')
+        first = self.dashboard()
+        before = analytics_cache_stats()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.dashboard(), first)
+        self.assertEqual(len(queries), 0)
+        after = analytics_cache_stats()
+        self.assertEqual((after['hits'] - before['hits'], after['misses'] - before['misses']), (3, 0))
+    
+    def test_writes_and_deletes_invalidate_the_users_responses(self):
+        self.dashboard()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/mood/track/', {'mood': 'sad'}, format='json')
+            self.client.post('/api/journal/meditation/', {'session_type': 'breathing', 'duration': 600}, format='json')
+        analytics, history, meditation = self.dashboard()
+        self.assertEqual((analytics['total_entries'], len(history), meditation['total_minutes']), (1, 1, 10))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            MoodEntry.objects.get().delete()
+        self.assertEqual(self.dashboard()[0]['total_entries'], 0)
@@ -0,0 +1,101 @@
+from datetime import timedelta
+from django.db.models import Case, F, FloatField, Sum, Value, When
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from .models import MOOD_VALENCE, MoodDailyCount
+
+BUCKETS = ('day', 'week', 'month')
+MOVING_AVERAGE_DAYS = 7
+
+_VALENCE = Case(
+    *(When(mood=mood, then=Value(valence)) for mood, valence in MOOD_VALENCE.items()),
+    default=Value(0.0),
+    output_field=FloatField(),
+)
+
+def _average(valence, entries):
+    return round(valence / entries, 3) if entries else None
+
+def bucket_start(day, bucket):
+    """First day of the day/week/month bucket holding `day`; weeks start on Monday, as Trunc does"""
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+def mood_buckets(user, start_day, bucket):
+    """Entry counts per mood and mean valence for each day/week/month since `start_day`.
+
+    `start_day` is moved back to the start of its bucket, so the first bucket
+    covers the whole week or month its `start` label names.
+    """
+    start_day = bucket_start(start_day, bucket)
+    # The rollup is already daily, so only weeks and months need truncating
+    start = F('day') if bucket == 'day' else Trunc('day', bucket)
+    rows = (MoodDailyCount.objects.filter(user=user, day__gte=start_day)
+            .annotate(start=start).values('start', 'mood')
+            .annotate(count=Sum('count')).order_by('start'))
+    buckets = {}
+    for row in rows:
+        current = buckets.setdefault(row['start'], {'start': row['start'], 'entries': 0, 'valence': 0.0, 'moods': {}})
+        current['entries'] += row['count']
+        current['valence'] += row['count'] * MOOD_VALENCE.get(row['mood'], 0.0)
+        current['moods'][row['mood']] = row['count']
+    for current in buckets.values():
+        current['valence'] = _average(current['valence'], current['entries'])
+    return list(buckets.values())
+
+def moving_average(user, start_day, end_day, window=MOVING_AVERAGE_DAYS):
+    """Entry-weighted mean valence over the `window` days ending on each day from start_day to end_day.
+
+    Days with no entries in their window get None.
+    """
+    first = start_day - timedelta(days=window - 1)
+    days = (end_day - first).days + 1
+    entries = [0] * days
+    valence = [0.0] * days
+    for row in (MoodDailyCount.objects.filter(user=user, day__gte=first, day__lte=end_day)
+                .values('day').annotate(entries=Sum('count'), valence=Sum(F('count') * _VALENCE)).order_by()):
+        offset = (row['day'] - first).days
+        entries[offset] = row['entries']
+        valence[offset] = row['valence']
+
+    # Running sums over the dense day array
+    points = []
+    entries_sum = valence_sum = 0
+    for offset in range(days):
+        entries_sum += entries[offset]
+        valence_sum += valence[offset]
+        if offset >= window:
+            entries_sum -= entries[offset - window]
+            valence_sum -= valence[offset - window]
+        if offset >= window - 1:
+            points.append({'day': first + timedelta(days=offset), 'valence': _average(valence_sum, entries_sum)})
+    return points
+
+def streaks(user, today):
+    """Current and longest runs of consecutive days with at least one entry.
+
+    The current streak is still alive if the last entry was yesterday.
+    """
+    days = MoodDailyCount.objects.filter(user=user).values_list('day', flat=True).distinct().order_by('day')
+    longest = run = 0
+    previous = None
+    for day in days:
+        run = run + 1 if previous is not None and (day - previous).days == 1 else 1
+        longest = max(longest, run)
+        previous = day
+    current = run if previous is not None and (today - previous).days <= 1 else 0
+    return {'current': current, 'longest': longest}
+
+def mood_trends(user, days, bucket='day'):
+    today = timezone.localdate()
+    start_day = today - timedelta(days=days - 1)
+    return {
+        'bucket': bucket,
+        'period_days': days,
+        'buckets': mood_buckets(user, start_day, bucket),
+        'moving_average': moving_average(user, start_day, today),
+        'streaks': streaks(user, today),
+    }
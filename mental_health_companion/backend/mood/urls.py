@@ -5,4 +5,5 @@ urlpatterns = [
     path('track/', views.track_mood, name='track_mood'),
     path('history/', views.mood_history, name='mood_history'),
     path('analytics/', views.mood_analytics, name='mood_analytics'),
+    path('trends/', views.mood_trends_view, name='mood_trends'),
 ]
@@ -2,11 +2,15 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Count
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
 from datetime import datetime, timedelta
-from .models import MoodEntry
+from .analytics_cache import cached_user_response
+from .models import MoodDailyCount, MoodEntry
 from .serializers import MoodEntrySerializer
 from .mood_analyzer import analyze_mood_from_text
+from .trends import BUCKETS, mood_trends
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -29,24 +33,36 @@ def track_mood(request):
 @permission_classes([IsAuthenticated])
 def mood_history(request):
     days = int(request.query_params.get('days', 30))
+    return Response(cached_user_response(
+        request.user.id, 'mood_history', {'days': days}, lambda: _mood_history(request.user, days)
+    ))
+
+def _mood_history(user, days):
     start_date = datetime.now() - timedelta(days=days)
     
     entries = MoodEntry.objects.filter(
-        user=request.user,
+        user=user,
         created_at__gte=start_date
     )
-    return Response(MoodEntrySerializer(entries, many=True).data)
+    return MoodEntrySerializer(entries, many=True).data
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def mood_analytics(request):
     days = int(request.query_params.get('days', 30))
-    start_date = datetime.now() - timedelta(days=days)
+    return Response(cached_user_response(
+        request.user.id, 'mood_analytics', {'days': days}, lambda: _mood_analytics(request.user, days)
+    ))
+
+def _mood_analytics(user, days):
+    # The last `days` calendar days, today included, from the daily rollup:
+    # at most one small row per day and mood, however long the history is
+    start_day = timezone.localdate() - timedelta(days=days - 1)
     
-    mood_counts = MoodEntry.objects.filter(
-        user=request.user,
-        created_at__gte=start_date
-    ).values('mood').annotate(count=Count('mood'))
+    mood_counts = MoodDailyCount.objects.filter(
+        user=user,
+        day__gte=start_day
+    ).values('mood').annotate(count=Sum('count')).order_by()
     
     total = sum(item['count'] for item in mood_counts)
     
@@ -63,4 +79,20 @@ def mood_analytics(request):
         'period_days': days
     }
     
-    return Response(analytics)
+    return analytics
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def mood_trends_view(request):
+    """Day/week/month buckets, a 7-day moving average of valence and check-in streaks"""
+    try:
+        days = int(request.query_params.get('days', 90))
+    except ValueError:
+        return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    bucket = request.query_params.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        return Response({'error': f"bucket must be one of {', '.join(BUCKETS)}"}, status=status.HTTP_400_BAD_REQUEST)
+    days = max(1, min(days, settings.MOOD_TRENDS_MAX_DAYS))
+    return Response(cached_user_response(
+        request.user.id, 'mood_trends', {'days': days, 'bucket': bucket}, lambda: mood_trends(request.user, days, bucket)
+    ))
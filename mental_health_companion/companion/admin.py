@@ -1,6 +1,6 @@
 # companion/admin.py
 from django.contrib import admin
-from .models import Message
+from .models import CrisisFlag, Message
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
@@ -12,3 +12,10 @@ class MessageAdmin(admin.ModelAdmin):
     def text_preview(self, obj):
         return obj.text[:50] + '...' if len(obj.text) > 50 else obj.text
     text_preview.short_description = 'Message'
+
+@admin.register(CrisisFlag)
+class CrisisFlagAdmin(admin.ModelAdmin):
+    list_display = ('matched_phrase', 'message', 'reviewed', 'created_at')
+    list_filter = ('reviewed', 'created_at')
+    list_editable = ('reviewed',)
+    readonly_fields = ('message', 'matched_phrase', 'created_at')
@@ -2,7 +2,11 @@
 import os
 import json
 import logging
+import threading
+import time
 from typing import Optional
+from llm_router import GeminiProvider, OpenAIProvider, Router, cassette_provider
+from llm_router.metrics import estimate_tokens, metrics
 
 try:
     from openai import OpenAI
@@ -23,6 +27,62 @@ def _get_openai_client() -> Optional[object]:
         logging.info("Could not initialize OpenAI client: %s", e)
         return None
 
+_router = None
+_router_lock = threading.Lock()
+
+# Per-call deadline for every routed provider, so a stalled call cannot hold a turn
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+
+def _cassette_options() -> dict:
+    """LLM_CASSETTE / LLM_CASSETTE_MODE settings for llm_router.cassette_provider"""
+    options = {"mode": os.getenv("LLM_CASSETTE_MODE", ""), "path": os.getenv("LLM_CASSETTE", "")}
+    if options["mode"] == "replay":
+        latency = os.getenv("LLM_REPLAY_LATENCY")
+        options.update(
+            latency=float(latency) if latency else None,
+            latency_scale=float(os.getenv("LLM_REPLAY_LATENCY_SCALE", "1.0")),
+            failure_rate=float(os.getenv("LLM_REPLAY_FAILURE_RATE", "0.0")),
+            seed=int(os.getenv("LLM_REPLAY_SEED", "0")),
+        )
+    return options
+
+def _build_provider(factory, api_key, model):
+    if not model:
+        return None
+    options = _cassette_options()
+    # Replayed providers answer from the cassette and need no API key
+    if not api_key and options["mode"] != "replay":
+        return None
+
+    def create():
+        try:
+            return factory(api_key, model, timeout=LLM_TIMEOUT)
+        except Exception as e:
+            logging.info("Could not initialize %s provider: %s", factory.__name__, e)
+            return None
+
+    return cassette_provider(f"{factory.kind}:{model}", create, **options)
+
+def _get_router() -> Optional[Router]:
+    """Return the shared provider router, or None if no provider is configured.
+    OpenAI is the primary; OPENAI_FAST_MODEL takes short turns and Gemini (if
+    GEMINI_API_KEY is set) answers when OpenAI is slow or failing.
+    """
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                openai_key = os.getenv("OPENAI_API_KEY")
+                primary = _build_provider(OpenAIProvider, openai_key, os.getenv("OPENAI_MODEL", "gpt-4o-mini"))
+                fast = _build_provider(OpenAIProvider, openai_key, os.getenv("OPENAI_FAST_MODEL"))
+                hedge = _build_provider(GeminiProvider, os.getenv("GEMINI_API_KEY"), os.getenv("GEMINI_MODEL", "models/gemini-2.0-flash"))
+                if primary is None:
+                    primary, hedge = hedge, None
+                if primary is None:
+                    return None
+                _router = Router(primary, fast=fast, hedge=hedge)
+    return _router
+
 # Try to load Hugging Face sentiment pipeline (optional, may be heavy)
 sentiment_pipeline = None
 try:
@@ -49,6 +109,7 @@ def analyze_mood(user_input: str) -> dict:
             "Return strictly JSON like: {\"label\": \"Positive\", \"score\": 0.83}\n\n"
             f"Text: \"{user_input}\""
         )
+        start = time.monotonic()
         try:
             resp = client.chat.completions.create(
                 model="gpt-4o-mini",
@@ -57,13 +118,24 @@ def analyze_mood(user_input: str) -> dict:
                 temperature=0.0
             )
             content = resp.choices[0].message.content.strip()
-            parsed = json.loads(content)
-            return {
-                "label": parsed.get("label", "Neutral"),
-                "score": float(parsed.get("score", 0.0))
-            }
         except Exception as e:
             logging.info("OpenAI sentiment classification failed: %s", e)
+            metrics.record_call("openai:gpt-4o-mini", time.monotonic() - start, estimate_tokens(prompt), error=e)
+        else:
+            usage = getattr(resp, "usage", None)
+            metrics.record_call(
+                "openai:gpt-4o-mini", time.monotonic() - start,
+                getattr(usage, "prompt_tokens", None) or estimate_tokens(prompt),
+                getattr(usage, "completion_tokens", None) or estimate_tokens(content),
+            )
+            try:
+                parsed = json.loads(content)
+                return {
+                    "label": parsed.get("label", "Neutral"),
+                    "score": float(parsed.get("score", 0.0))
+                }
+            except Exception as e:
+                logging.info("OpenAI sentiment classification failed: %s", e)
 
     # last-resort naive parse
     text = user_input.lower()
@@ -90,25 +162,21 @@ def generate_response(user_input: str, conversation_history: list = None, max_to
         messages.extend(conversation_history)
     messages.append({"role": "user", "content": user_input})
 
-    client = _get_openai_client()
-    if client is None:
-        # No OpenAI client available: return a safe, empathetic fallback response.
+    router = _get_router()
+    if router is None:
+        # No provider available: return a safe, empathetic fallback response.
+        metrics.record_fallback("companion", "no_provider")
         return (
             "Thanks for sharing — I'm here to listen. "
             "It sounds like you're going through something important. Can you tell me more?"
         )
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            max_tokens=max_tokens,
-            temperature=0.7,
-        )
-        ai_text = response.choices[0].message.content.strip()
-        return ai_text
+        # Short turns may go to the fast model; slow calls are hedged to the backup provider
+        return router.complete(messages, max_tokens=max_tokens, size=len(user_input) // 4)
     except Exception as e:
-        logging.info("OpenAI generate_response failed: %s", e)
+        logging.info("generate_response failed: %s", e)
+        metrics.record_fallback("companion", "provider_error")
         return (
             "I'm having trouble generating a detailed response right now, "
             "but I'm here to listen. Could you say a bit more about how you're feeling?"
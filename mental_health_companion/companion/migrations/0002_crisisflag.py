@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companion', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='message',
+            options={'ordering': ['created_at']},
+        ),
+        migrations.CreateModel(
+            name='CrisisFlag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('matched_phrase', models.CharField(max_length=50)),
+                ('reviewed', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='crisis_flags', to='companion.message')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
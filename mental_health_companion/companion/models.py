@@ -16,3 +16,16 @@ class Message(models.Model):
 
     def __str__(self):
         return f"{self.sender}: {self.text[:40]}"
+
+class CrisisFlag(models.Model):
+    """A message that matched the crisis lexicon, kept for human follow-up"""
+    message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name="crisis_flags")
+    matched_phrase = models.CharField(max_length=50)
+    reviewed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.matched_phrase}: {self.message.text[:40]}"
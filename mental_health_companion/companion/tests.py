@@ -0,0 +1,70 @@
+# companion/tests.py
+import json
+from unittest import mock
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from llm_router import CRISIS_RESPONSE
+from . import views
+from .models import CrisisFlag, Message
+
+
+class ChatApiTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.analyze_mood = self.patch("analyze_mood", return_value={"label": "Neutral", "score": 0.5})
+        self.generate_response = self.patch("generate_response", return_value="Tell me more.")
+
+    def patch(self, name, **kwargs):
+        patcher = mock.patch.object(views, name, **kwargs)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def send(self, message):
+        return self.client.post("/chat/", json.dumps({"message": message}), content_type="application/json")
+
+
+class CrisisReplyTests(ChatApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.limiter = self.patch("_get_rate_limiter")
+
+    def test_crisis_message_gets_resources_without_the_model(self):
+        response = self.send("I don't want to live, I want to end my life")
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data["ai_response"], data["crisis"]), (CRISIS_RESPONSE, True))
+        flag = CrisisFlag.objects.get()
+        self.assertEqual((flag.matched_phrase, flag.message.sender), ("end my life", "user"))
+        self.assertEqual(list(Message.objects.values_list("sender", flat=True)), ["user", "ai"])
+        self.analyze_mood.assert_not_called()
+        self.generate_response.assert_not_called()
+        self.limiter.assert_not_called()
+
+    def test_resources_are_returned_when_the_flag_cannot_be_saved(self):
+        with mock.patch.object(CrisisFlag.objects, "create", side_effect=DatabaseError("disk full")), \
+                self.assertLogs("companion.views", "ERROR"):
+            response = self.send("I want to end my life")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["ai_response"], response.json()["crisis"]), (CRISIS_RESPONSE, True))
+        self.assertFalse(Message.objects.exists())
+        self.generate_response.assert_not_called()
+
+
+@override_settings(AI_RATE_LIMIT_PER_MINUTE=60, AI_RATE_LIMIT_BURST=1)
+class RateLimitTests(ChatApiTestCase):
+    def setUp(self):
+        super().setUp()
+        # Build a limiter from the overridden settings, not the process-wide one
+        self.patch("_rate_limiter", new=None)
+
+    def test_client_over_the_limit_gets_429(self):
+        self.assertEqual(self.send("hello").status_code, 200)
+        response = self.send("hello again")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertIn("error", response.json())
+        self.assertEqual(self.generate_response.call_count, 1)
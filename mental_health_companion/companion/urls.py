@@ -5,4 +5,5 @@ from . import views
 urlpatterns = [
     path("", views.chat_page, name="chat_page"),
     path("chat/", views.chat_api, name="chat_api"),
+    path("metrics", views.metrics, name="metrics"),
 ]
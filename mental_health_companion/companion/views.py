@@ -1,15 +1,45 @@
 # companion/views.py
 import json
 import logging
+import math
+import threading
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
 from django.shortcuts import render
 from django.views.decorators.http import require_http_methods
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from .ai import analyze_mood, generate_response
-from .models import Message
+from .models import CrisisFlag, Message
+from llm_router import CRISIS_RESPONSE, TokenBucket, detect_crisis
+from llm_router.metrics import metrics as llm_metrics
 
 logger = logging.getLogger(__name__)
 
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def _get_rate_limiter():
+    """Return the shared per-client TokenBucket, or None if rate limiting is disabled"""
+    global _rate_limiter
+    if not settings.AI_RATE_LIMIT_PER_MINUTE:
+        return None
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = TokenBucket(
+                    cache, settings.AI_RATE_LIMIT_PER_MINUTE / 60, settings.AI_RATE_LIMIT_BURST, prefix="companion-ai"
+                )
+    return _rate_limiter
+
+def _client_key(request):
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
 @require_http_methods(["GET"])
 def chat_page(request):
     """Render the chat UI"""
@@ -36,6 +66,20 @@ def chat_api(request):
         if len(user_message) > 2000:
             return JsonResponse({"error": "Message too long. Please keep it under 2000 characters."}, status=400)
 
+        # Crisis language skips the rate limit, sentiment analysis and the model entirely
+        phrase = detect_crisis(user_message)
+        if phrase:
+            return _crisis_reply(user_message, phrase)
+
+        # Keep one client from using up the shared OpenAI/Gemini quota
+        limiter = _get_rate_limiter()
+        if limiter is not None:
+            allowed, retry_after = limiter.consume(_client_key(request))
+            if not allowed:
+                response = JsonResponse({"error": "You're sending messages very quickly. Please wait a moment."}, status=429)
+                response["Retry-After"] = str(math.ceil(retry_after))
+                return response
+
         # Analyze mood
         mood = analyze_mood(user_message)
 
@@ -66,3 +110,34 @@ def chat_api(request):
         return JsonResponse({
             "error": "An error occurred while processing your message. Please try again."
         }, status=500)
+
+def _crisis_reply(user_message, phrase):
+    """Store the exchange with a CrisisFlag for follow-up and return the crisis resources"""
+    llm_metrics.record_fallback("companion", "crisis")
+    mood = {"label": "Negative", "score": 1.0}
+    try:
+        with transaction.atomic():
+            message = Message.objects.create(
+                sender="user", text=user_message, mood_label=mood["label"], mood_score=mood["score"]
+            )
+            CrisisFlag.objects.create(message=message, matched_phrase=phrase)
+            Message.objects.create(sender="ai", text=CRISIS_RESPONSE)
+    except Exception as e:
+        # The resources still go out even if the flag could not be saved
+        logger.error(f"Could not save crisis flag: {str(e)}", exc_info=True)
+    return JsonResponse({
+        "user_message": user_message,
+        "ai_response": CRISIS_RESPONSE,
+        "mood": mood,
+        "crisis": True,
+    })
+
+@require_http_methods(["GET"])
+def metrics(request):
+    """Prometheus text metrics for LLM calls; needs `Authorization: Bearer <METRICS_TOKEN>`, disabled if that is unset"""
+    token = settings.METRICS_TOKEN
+    if not token:
+        return HttpResponse(status=404)
+    if not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=401)
+    return HttpResponse(llm_metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -4,6 +4,9 @@ import { chatAPI } from '../services/api';
 import Navbar from '../components/Navbar';
 import './Chat.css';
 
+// Each poll long-waits up to 25s on the server, so this gives up after about 5 minutes
+const MAX_TURN_POLLS = 12;
+
 function Chat() {
   const { sessionId } = useParams();
   const navigate = useNavigate();
@@ -97,9 +100,19 @@ function Chat() {
     setLoading(true);
 
     try {
-      const response = await chatAPI.sendMessage(sessionId, userMsg);
+      let response = await chatAPI.sendMessage(sessionId, userMsg);
+      // Queue mode: the reply is generated by a worker, long-poll until it is ready
+      for (let polls = 0; response.status === 202 && polls < MAX_TURN_POLLS; polls++) {
+        response = await chatAPI.getTurn(response.data.turn_id);
+      }
+      if (response.status === 202) {
+        const pendingMessage = response.data.user_message;
+        setMessages(prevMessages => [...prevMessages, pendingMessage].filter(Boolean));
+        alert('The reply is taking longer than usual. Please reload this conversation in a moment.');
+        return;
+      }
       // Use functional update to ensure we have the latest state
-      setMessages(prevMessages => [...prevMessages, response.data.user_message, response.data.bot_message]);
+      setMessages(prevMessages => [...prevMessages, response.data.user_message, response.data.bot_message].filter(Boolean));
       
       // Auto-speak bot response if enabled
       if (autoSpeak && response.data.bot_message?.content) {
@@ -112,6 +125,10 @@ function Chat() {
         localStorage.removeItem('user');
         alert('Your session has expired. Please login again.');
         window.location.href = '/login';
+      } else if (err.response?.data?.status === 'failed') {
+        // The message was saved but no reply could be generated
+        setMessages(prevMessages => [...prevMessages, err.response.data.user_message].filter(Boolean));
+        alert(err.response.data.error);
       } else {
         alert('Failed to send message. Please try again.');
       }
@@ -26,10 +26,17 @@ export const authAPI = {
 
 export const chatAPI = {
   getSessions: () => api.get('/chat/sessions/'),
+  listSessions: (cursor) => api.get('/chat/sessions/', { params: { view: 'list', cursor } }),
   createSession: (mood) => api.post('/chat/sessions/create/', { mood }),
   getSession: (id) => api.get(`/chat/sessions/${id}/`),
-  sendMessage: (sessionId, message) => api.post(`/chat/sessions/${sessionId}/message/`, { message }),
+  getSessionMessages: (id, params) => api.get(`/chat/sessions/${id}/`, { params }),
+  sendMessage: (sessionId, message, idempotencyKey) => api.post(
+    `/chat/sessions/${sessionId}/message/`,
+    { message },
+    idempotencyKey ? { headers: { 'Idempotency-Key': idempotencyKey } } : undefined,
+  ),
   deleteSession: (id) => api.delete(`/chat/sessions/${id}/delete/`),
+  getTurn: (turnId, wait = 25) => api.get(`/chat/turns/${turnId}/`, { params: { wait } }),
 };
 
 export const moodAPI = {
@@ -0,0 +1,20 @@
+"""Provider routing shared by the companion app and the backend chat app.
+
+Both apps describe a turn as chat messages and hand them to a Router, which
+picks a fast or primary provider by turn size and hedges slow calls to a
+second provider. Providers only need a `name` and a
+`complete(messages, max_tokens=None)` method returning the reply text.
+TokenBucket limits how often each user may reach the providers at all, and
+cassette_provider() records or replays provider calls for offline benchmarks.
+detect_crisis() spots crisis language so the apps can skip the model entirely.
+"""
+from .cassette import Cassette, ReplayProvider, RecordingProvider, cassette_provider, get_cassette
+from .crisis import CRISIS_RESPONSE, detect_crisis
+from .router import LatencyTracker, Router
+from .providers import GeminiProvider, OpenAIProvider
+from .rate_limit import TokenBucket
+
+__all__ = [
+    'CRISIS_RESPONSE', 'Cassette', 'GeminiProvider', 'LatencyTracker', 'OpenAIProvider', 'RecordingProvider',
+    'ReplayProvider', 'Router', 'TokenBucket', 'cassette_provider', 'detect_crisis', 'get_cassette',
+]
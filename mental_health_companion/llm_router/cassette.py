@@ -0,0 +1,197 @@
+"""Record and replay provider calls for offline, repeatable benchmarks.
+
+In record mode a RecordingProvider wraps a real provider and appends every
+call (messages, max_tokens, reply or error class, and latency) to a JSON
+cassette, which is written out by flush() and when the process exits. In
+replay mode a ReplayProvider answers from the cassette instead of the
+network, sleeping for the recorded latency (or a scaled or fixed one) and
+optionally failing a fraction of calls, so routing, hedging and fallback
+paths can be measured deterministically in CI.
+"""
+import atexit
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from .metrics import estimate_tokens, metrics
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+class CassetteMiss(LookupError):
+    """The cassette has no recorded call for this request"""
+
+class InjectedFailure(RuntimeError):
+    """A failure raised on purpose by a ReplayProvider"""
+
+def request_key(messages, max_tokens=None):
+    payload = json.dumps([messages, max_tokens], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class Cassette:
+    """Recorded provider calls, stored as one JSON file.
+    
+    Calls are looked up by provider name and request; if that provider never
+    saw the request, a recording from any provider is used. Repeated
+    identical requests replay their recordings in order, then the last one.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.entries = []
+        self._lock = threading.Lock()
+        self._by_provider = defaultdict(list)
+        self._by_request = defaultdict(list)
+        self._served = defaultdict(int)
+        self._unsaved = 0
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for entry in json.load(f)['calls']:
+                    self._index(entry)
+    
+    def _index(self, entry):
+        self.entries.append(entry)
+        self._by_provider[(entry['provider'], entry['key'])].append(entry)
+        self._by_request[entry['key']].append(entry)
+    
+    def record(self, provider, messages, max_tokens, latency, response=None, error=None):
+        entry = {
+            'provider': provider,
+            'key': request_key(messages, max_tokens),
+            'messages': messages,
+            'max_tokens': max_tokens,
+            'response': response,
+            'error': error,
+            'latency': round(latency, 4),
+        }
+        with self._lock:
+            self._index(entry)
+            if not self._unsaved:
+                # Rewriting the whole file per call is quadratic; write once at exit instead
+                atexit.register(self.flush)
+            self._unsaved += 1
+    
+    def lookup(self, provider, messages, max_tokens=None):
+        key = request_key(messages, max_tokens)
+        with self._lock:
+            for index_key, entries in (((provider, key), self._by_provider[(provider, key)]),
+                                       (key, self._by_request[key])):
+                if entries:
+                    served = self._served[index_key]
+                    self._served[index_key] = served + 1
+                    return entries[min(served, len(entries) - 1)]
+        return None
+    
+    def rewind(self):
+        with self._lock:
+            self._served.clear()
+    
+    def flush(self):
+        """Write the cassette if calls were recorded since the last write"""
+        with self._lock:
+            if not self._unsaved:
+                return
+            atexit.unregister(self.flush)
+            self._unsaved = 0
+            self.save()
+    
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'calls': self.entries}, f, indent=1, ensure_ascii=False)
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+def get_cassette(path):
+    """Return the process-wide Cassette for `path`, shared by all providers"""
+    path = os.path.abspath(path)
+    with _cassettes_lock:
+        if path not in _cassettes:
+            _cassettes[path] = Cassette(path)
+        return _cassettes[path]
+
+class RecordingProvider:
+    """Pass calls through to `provider` and record them to `cassette`"""
+    
+    def __init__(self, provider, cassette):
+        self.provider = provider
+        self.cassette = cassette
+        self.name = provider.name
+    
+    def complete(self, messages, max_tokens=None):
+        start = time.monotonic()
+        try:
+            text = self.provider.complete(messages, max_tokens=max_tokens)
+        except Exception as e:
+            self.cassette.record(self.name, messages, max_tokens, time.monotonic() - start, error=type(e).__name__)
+            raise
+        self.cassette.record(self.name, messages, max_tokens, time.monotonic() - start, response=text)
+        return text
+
+class ReplayProvider:
+    """Answer calls from `cassette` without touching the network.
+    
+    Each call sleeps for `latency` seconds if given, otherwise for the
+    recorded latency times `latency_scale`. A `failure_rate` fraction of calls
+    (drawn from a generator seeded with `seed`) raise InjectedFailure after
+    that delay, as do calls that failed when they were recorded. Requests
+    that were never recorded raise CassetteMiss.
+    """
+    
+    def __init__(self, cassette, name, latency=None, latency_scale=1.0, failure_rate=0.0, seed=None,
+                 sleep=time.sleep):
+        self.cassette = cassette
+        self.name = name
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.failure_rate = failure_rate
+        self.sleep = sleep
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'misses': 0, 'injected_failures': 0}
+    
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+    
+    def complete(self, messages, max_tokens=None):
+        self._count('calls')
+        entry = self.cassette.lookup(self.name, messages, max_tokens)
+        if entry is None:
+            self._count('misses')
+            raise CassetteMiss(f"No recorded call for {self.name}")
+        
+        latency = self.latency if self.latency is not None else entry['latency'] * self.latency_scale
+        self.sleep(latency)
+        prompt_tokens = sum(estimate_tokens(msg['content']) for msg in messages)
+        with self._lock:
+            inject = self.failure_rate and self._random.random() < self.failure_rate
+        if inject or entry['error']:
+            self._count('injected_failures')
+            error = entry['error'] or InjectedFailure.__name__
+            metrics.record_call(self.name, latency, prompt_tokens, error=error)
+            raise InjectedFailure(entry['error'] or f"Injected failure for {self.name}")
+        metrics.record_call(self.name, latency, prompt_tokens, estimate_tokens(entry['response']))
+        return entry['response']
+
+def cassette_provider(name, factory, mode='', path='', **replay_options):
+    """Build the provider called `name` for the given cassette mode.
+    
+    `factory` creates the real provider and is not called when replaying, so
+    replay works without API keys or provider packages. With no mode (or no
+    path) the real provider is returned unchanged.
+    """
+    if not mode or not path:
+        return factory()
+    if mode == REPLAY:
+        return ReplayProvider(get_cassette(path), name, **replay_options)
+    if mode == RECORD:
+        provider = factory()
+        return RecordingProvider(provider, get_cassette(path)) if provider is not None else None
+    raise ValueError(f"Unknown cassette mode {mode!r}; use {RECORD!r} or {REPLAY!r}")
@@ -0,0 +1,45 @@
+"""Crisis-language detection that runs before any model call.
+
+A message mentioning suicide or self-harm should not wait on sentiment
+analysis or an LLM round-trip. Both apps check the user's text against one
+precompiled, word-boundary-aware pattern first and, on a match, answer
+immediately with CRISIS_RESPONSE. The lexicon errs on the side of matching:
+"I'm not suicidal" still gets the resources, which is the safe mistake.
+"""
+import re
+
+# Matched case-insensitively as whole words; a space in a phrase matches any
+# run of whitespace or hyphens, so "self harm" also covers "self-harm"
+CRISIS_PHRASES = (
+    'suicide', 'suicidal', 'kill myself', 'killing myself', 'end my life', 'ending my life',
+    'end it all', 'take my own life', 'taking my own life', 'want to die', 'wanna die',
+    'better off dead', 'no reason to live', 'not worth living', 'self harm', 'selfharm',
+    'self harming', 'hurt myself', 'hurting myself', 'cut myself', 'cutting myself',
+    'overdose', 'overdosed', 'overdosing', 'hang myself', 'kms',
+)
+
+def _phrase_pattern(phrase):
+    return r'[\s\-]+'.join(re.escape(word) for word in phrase.split())
+
+# Longest phrases first so the reported match is the most specific one
+_CRISIS_RE = re.compile(
+    r'\b(?:' + '|'.join(_phrase_pattern(p) for p in sorted(CRISIS_PHRASES, key=len, reverse=True)) + r')\b',
+    re.IGNORECASE,
+)
+
+CRISIS_RESPONSE = (
+    "I'm really glad you told me, and I'm so sorry you're feeling this way. You don't have to go through "
+    "this alone, and you deserve support right now.\n\n"
+    "If you are in immediate danger, please call your local emergency number (911 in the US, 112 in the EU, "
+    "999 in the UK).\n"
+    "• US: call or text 988 (Suicide & Crisis Lifeline)\n"
+    "• UK & Ireland: call 116 123 (Samaritans)\n"
+    "• Elsewhere: find a free, confidential helpline at https://findahelpline.com\n\n"
+    "If you can, reach out to someone you trust and let them know how you're feeling. "
+    "I'm still here to listen. Would you like to tell me what's going on?"
+)
+
+def detect_crisis(text):
+    """Return the crisis phrase found in `text` (lowercased), or None"""
+    match = _CRISIS_RE.search(text) if text else None
+    return match.group(0).lower() if match else None
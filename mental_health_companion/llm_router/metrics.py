@@ -0,0 +1,122 @@
+"""In-process metrics for LLM calls, rendered in the Prometheus text format.
+
+Providers call record_call() once per request with its latency, token
+counts and error class; the apps call record_fallback() whenever a user
+gets a canned reply instead of a model reply, with the reason. Updates are
+a few dict operations under one lock. Each worker process keeps its own
+numbers, so scrape every process (or aggregate in Prometheus).
+"""
+import bisect
+import re
+import threading
+from collections import defaultdict
+
+# Upper bounds in seconds, chosen around the chat timeouts (2s to 20s)
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 12.0, 20.0, 30.0)
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+def estimate_tokens(text):
+    """Approximate the token count without a network round trip, for APIs that report none.
+    
+    Punctuation and emoji count as one token each and words as one token per
+    four characters, which errs slightly high against SentencePiece counts.
+    """
+    if not text:
+        return 0
+    count = 0
+    for match in _TOKEN_RE.finditer(text):
+        count += (len(match.group()) + 3) // 4
+    return count
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class LLMMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.latency = defaultdict(Histogram)
+            self.requests = defaultdict(int)
+            self.errors = defaultdict(int)
+            self.prompt_tokens = defaultdict(int)
+            self.output_tokens = defaultdict(int)
+            self.fallbacks = defaultdict(int)
+
+    def record_call(self, model, latency, prompt_tokens=0, output_tokens=0, error=None):
+        """Record one provider request; `error` is the exception (or its class name) if it failed"""
+        if error is not None and not isinstance(error, str):
+            error = type(error).__name__
+        with self._lock:
+            self.latency[model].observe(latency)
+            self.requests[(model, 'error' if error else 'ok')] += 1
+            if error:
+                self.errors[(model, error)] += 1
+            self.prompt_tokens[model] += prompt_tokens
+            self.output_tokens[model] += output_tokens
+
+    def record_fallback(self, app, reason):
+        """Record a user-facing fallback reply served by `app` because of `reason`"""
+        with self._lock:
+            self.fallbacks[(app, reason)] += 1
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format"""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            family('llm_request_duration_seconds', 'histogram', 'LLM provider request latency')
+            for model, histogram in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'llm_request_duration_seconds_bucket{_labels(model=model, le=bound)} {cumulative}')
+                lines.append(f'llm_request_duration_seconds_sum{_labels(model=model)} {histogram.sum:.6f}')
+                lines.append(f'llm_request_duration_seconds_count{_labels(model=model)} {histogram.count}')
+
+            family('llm_requests_total', 'counter', 'LLM provider requests by outcome')
+            for (model, outcome), value in sorted(self.requests.items()):
+                lines.append(f'llm_requests_total{_labels(model=model, outcome=outcome)} {value}')
+
+            family('llm_request_errors_total', 'counter', 'Failed LLM provider requests by error class')
+            for (model, error), value in sorted(self.errors.items()):
+                lines.append(f'llm_request_errors_total{_labels(model=model, error=error)} {value}')
+
+            family('llm_prompt_tokens_total', 'counter', 'Prompt tokens sent (reported by the API or estimated)')
+            for model, value in sorted(self.prompt_tokens.items()):
+                lines.append(f'llm_prompt_tokens_total{_labels(model=model)} {value}')
+
+            family('llm_output_tokens_total', 'counter', 'Output tokens received (reported by the API or estimated)')
+            for model, value in sorted(self.output_tokens.items()):
+                lines.append(f'llm_output_tokens_total{_labels(model=model)} {value}')
+
+            family('llm_fallback_replies_total', 'counter', 'Canned replies served instead of a model reply, by reason')
+            for (app, reason), value in sorted(self.fallbacks.items()):
+                lines.append(f'llm_fallback_replies_total{_labels(app=app, reason=reason)} {value}')
+        return '\n'.join(lines) + '\n'
+
+# Shared by every provider and app in the process
+metrics = LLMMetrics()
@@ -0,0 +1,93 @@
+import logging
+import time
+from .metrics import estimate_tokens, metrics
+
+try:
+    from openai import OpenAI
+except Exception:
+    OpenAI = None  # openai package may be unavailable in some environments
+
+try:
+    import google.generativeai as genai
+except Exception:
+    genai = None  # google-generativeai may be unavailable in some environments
+
+logger = logging.getLogger(__name__)
+
+class OpenAIProvider:
+    """OpenAI chat completions with one client (and connection pool) per provider"""
+    
+    kind = 'openai'
+    
+    def __init__(self, api_key, model='gpt-4o-mini', timeout=20.0, temperature=0.7, name=None):
+        if OpenAI is None:
+            raise RuntimeError("The openai package is not installed")
+        self.client = OpenAI(api_key=api_key, timeout=timeout, max_retries=0)
+        self.model = model
+        self.temperature = temperature
+        self.name = name or f'{self.kind}:{model}'
+    
+    def complete(self, messages, max_tokens=None):
+        start = time.monotonic()
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=max_tokens or 200,
+                temperature=self.temperature,
+            )
+            text = response.choices[0].message.content.strip()
+        except Exception as e:
+            metrics.record_call(self.name, time.monotonic() - start, _prompt_tokens(messages), error=e)
+            raise
+        usage = getattr(response, 'usage', None)
+        metrics.record_call(
+            self.name, time.monotonic() - start,
+            getattr(usage, 'prompt_tokens', None) or _prompt_tokens(messages),
+            getattr(usage, 'completion_tokens', None) or estimate_tokens(text),
+        )
+        return text
+
+def _prompt_tokens(messages):
+    return sum(estimate_tokens(msg['content']) for msg in messages)
+
+def messages_to_prompt(messages):
+    """Flatten chat messages into one text prompt for single-turn models"""
+    if len(messages) == 1:
+        return messages[0]['content']
+    labels = {'system': 'Instructions', 'user': 'User', 'assistant': 'Assistant'}
+    lines = [f"{labels.get(msg['role'], msg['role'])}: {msg['content']}" for msg in messages]
+    return "\n\n".join(lines) + "\n\nAssistant:"
+
+class GeminiProvider:
+    """Gemini model created once and reused for every call"""
+    
+    kind = 'gemini'
+    
+    def __init__(self, api_key, model='models/gemini-2.0-flash', timeout=20.0, temperature=0.7, name=None):
+        if genai is None:
+            raise RuntimeError("The google-generativeai package is not installed")
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model)
+        self.timeout = timeout
+        self.temperature = temperature
+        self.name = name or f'{self.kind}:{model}'
+    
+    def complete(self, messages, max_tokens=None):
+        prompt = messages_to_prompt(messages)
+        start = time.monotonic()
+        try:
+            response = self.model.generate_content(
+                prompt,
+                generation_config=genai.types.GenerationConfig(
+                    temperature=self.temperature,
+                    max_output_tokens=max_tokens or 200,
+                ),
+                request_options={'timeout': self.timeout},
+            )
+            text = response.text.strip()
+        except Exception as e:
+            metrics.record_call(self.name, time.monotonic() - start, estimate_tokens(prompt), error=e)
+            raise
+        metrics.record_call(self.name, time.monotonic() - start, estimate_tokens(prompt), estimate_tokens(text))
+        return text
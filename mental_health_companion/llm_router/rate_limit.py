@@ -0,0 +1,54 @@
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Per-key token buckets stored in a shared cache.
+    
+    `cache` is anything with Django's cache API (get/set/add/delete), so with
+    a shared backend the limit holds across worker processes. Each key earns
+    `rate` tokens per second up to `capacity`. Updates to one key are
+    serialized with a short cache.add() lock; if that lock cannot be taken
+    the request is allowed rather than blocked.
+    """
+    
+    def __init__(self, cache, rate, capacity, prefix='llm-bucket', clock=time.time,
+                 lock_timeout=2, lock_attempts=20, sleep=time.sleep):
+        if rate <= 0 or capacity < 1:
+            raise ValueError("TokenBucket needs a positive rate and a capacity of at least 1")
+        self.cache = cache
+        self.rate = rate
+        self.capacity = capacity
+        self.prefix = prefix
+        self.clock = clock
+        self.lock_timeout = lock_timeout
+        self.lock_attempts = lock_attempts
+        self.sleep = sleep
+        # An idle bucket is full again after this long, so its entry can expire
+        self.ttl = math.ceil(capacity / rate) + 1
+    
+    def consume(self, key, cost=1):
+        """Take `cost` tokens for `key`; returns (allowed, retry_after_seconds)"""
+        bucket_key = f'{self.prefix}:{key}'
+        lock_key = f'{bucket_key}:lock'
+        for _ in range(self.lock_attempts):
+            if self.cache.add(lock_key, 1, self.lock_timeout):
+                break
+            self.sleep(0.005)
+        else:
+            logger.warning("Token bucket %s is contended, letting the request through", bucket_key)
+            return True, 0.0
+        
+        try:
+            now = self.clock()
+            tokens, updated = self.cache.get(bucket_key) or (self.capacity, now)
+            tokens = min(self.capacity, tokens + max(now - updated, 0) * self.rate)
+            if tokens >= cost:
+                self.cache.set(bucket_key, (tokens - cost, now), self.ttl)
+                return True, 0.0
+            self.cache.set(bucket_key, (tokens, now), self.ttl)
+            return False, (cost - tokens) / self.rate
+        finally:
+            self.cache.delete(lock_key)
@@ -0,0 +1,130 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError, wait
+
+logger = logging.getLogger(__name__)
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per provider"""
+    
+    def __init__(self, window=100):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+    
+    def record(self, name, latency):
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(latency)
+    
+    def quantile(self, name, q, min_samples=10):
+        with self._lock:
+            samples = sorted(self._samples.get(name, ()))
+        if len(samples) < min_samples:
+            return None
+        return samples[max(math.ceil(q * len(samples)) - 1, 0)]
+
+class Router:
+    """Tiered, hedged routing of chat completions across providers.
+    
+    Turns of at most `short_turn_tokens` go to `fast` first (if configured)
+    and everything else to `primary`. If the first provider has not answered
+    within its observed `hedge_quantile` latency, the same turn is sent to the
+    backup provider and whichever reply arrives first wins. A provider error
+    moves to the backup immediately. The hedge delay counts from when the
+    first call starts running, so time spent queued for a pool thread never
+    triggers a hedge; size `max_workers` for two calls per concurrent turn.
+    """
+    
+    def __init__(self, primary, fast=None, hedge=None, short_turn_tokens=40, hedge_quantile=0.9,
+                 min_hedge_delay=0.5, max_hedge_delay=8.0, max_workers=32, latency_window=100):
+        if primary is None:
+            raise ValueError("Router needs a primary provider")
+        self.primary = primary
+        self.fast = fast
+        self.hedge = hedge
+        self.short_turn_tokens = short_turn_tokens
+        self.hedge_quantile = hedge_quantile
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.latencies = LatencyTracker(latency_window)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-hedge')
+        self._stats_lock = threading.Lock()
+        self.stats = {'calls': 0, 'fast_routed': 0, 'hedged': 0, 'hedge_wins': 0, 'failovers': 0}
+    
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+    
+    def plan(self, size):
+        """Return (first, backup) providers for a turn of `size` estimated tokens"""
+        if self.fast is not None and size <= self.short_turn_tokens:
+            return self.fast, self.primary
+        backup = self.hedge if self.hedge is not None else self.fast
+        return self.primary, backup
+    
+    def hedge_delay(self, provider):
+        delay = self.latencies.quantile(provider.name, self.hedge_quantile)
+        if delay is None:
+            return self.max_hedge_delay
+        return min(max(delay, self.min_hedge_delay), self.max_hedge_delay)
+    
+    def _call(self, provider, messages, max_tokens, started=None):
+        if started is not None:
+            started.set()
+        start = time.monotonic()
+        text = provider.complete(messages, max_tokens=max_tokens)
+        self.latencies.record(provider.name, time.monotonic() - start)
+        return text
+    
+    def complete(self, messages, max_tokens=None, size=None):
+        """Return the first successful reply for `messages`"""
+        if size is None:
+            size = sum(len(msg['content']) for msg in messages) // 4
+        first, backup = self.plan(size)
+        self._count('calls')
+        if first is self.fast:
+            self._count('fast_routed')
+        if backup is None:
+            return self._call(first, messages, max_tokens)
+        
+        started = threading.Event()
+        first_future = self._executor.submit(self._call, first, messages, max_tokens, started)
+        pending = {first_future}
+        started.wait()
+        try:
+            return first_future.result(timeout=self.hedge_delay(first))
+        except TimeoutError:
+            self._count('hedged')
+            logger.info("Hedging %s turn to %s", first.name, backup.name)
+        except Exception as e:
+            self._count('failovers')
+            logger.warning(f"{first.name} failed ({type(e).__name__}), failing over to {backup.name}")
+            return self._call(backup, messages, max_tokens)
+        
+        hedge_future = self._executor.submit(self._call, backup, messages, max_tokens)
+        pending.add(hedge_future)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    text = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if future is hedge_future:
+                    self._count('hedge_wins')
+                return text
+        raise error
+    
+    def snapshot(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        providers = [p for p in (self.primary, self.fast, self.hedge) if p is not None]
+        stats['p90_latency'] = {
+            p.name: self.latencies.quantile(p.name, 0.9, min_samples=1) for p in providers
+        }
+        return stats
@@ -141,6 +141,15 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 #ENTER API KEY HERE
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Per-client token bucket in front of chat_api: AI_RATE_LIMIT_BURST messages at
+# once, refilled at AI_RATE_LIMIT_PER_MINUTE (0 disables). Stored in the default
+# cache, so configure a shared cache when running several workers.
+AI_RATE_LIMIT_PER_MINUTE = float(os.getenv("AI_RATE_LIMIT_PER_MINUTE", "20"))
+AI_RATE_LIMIT_BURST = int(os.getenv("AI_RATE_LIMIT_BURST", "5"))
+
+# Bearer token required by /metrics (empty: the endpoint is disabled)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 # Logging configuration
 LOGGING = {
     'version': 1,